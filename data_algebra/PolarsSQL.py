@@ -48,4 +48,6 @@ class PolarsSQLModel(data_algebra.sql_model.SQLModel):
             op_replacements=op_replacements,
             float_type="DOUBLE PRECISION",
             supports_with=False,
+            # Polars SQL does not run the nested selects hoisting produces
+            hoist_common_subexpressions=False,
         )
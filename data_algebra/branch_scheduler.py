@@ -0,0 +1,123 @@
+"""
+Concurrent evaluation of independent parts of operator DAGs.
+"""
+
+import concurrent.futures
+from typing import Any, Callable, Dict, List, Set
+
+import data_algebra.eval_state
+
+
+def task_roots(op, consumer_counts: Dict[int, int]) -> List:
+    """
+    Nodes an operator DAG is cut into concurrent tasks at: the root, nodes with more than one
+    consumer, and the sources of multi-source steps (joins, row concatenations). Each task
+    evaluates the nodes below its root down to (not including) other task roots.
+
+    :param op: root of operator DAG
+    :param consumer_counts: result of count_consumers(op)
+    :return: list of task root nodes, in evaluation order (sources before consumers)
+    """
+    evaluation_order = list(reversed(data_algebra.eval_state.topological_order(op)))
+    roots = set()
+    for node in evaluation_order:
+        if consumer_counts.get(id(node), 0) > 1:
+            roots.add(id(node))
+        if len(node.sources) > 1:
+            roots.update([id(s) for s in node.sources])
+    roots.add(id(op))
+    return [node for node in evaluation_order if id(node) in roots]
+
+
+def task_dependencies(root, roots: Set[int]) -> Set[int]:
+    """
+    Task roots a task reads results from.
+
+    :param root: task root node
+    :param roots: set of id(node) of all task roots
+    :return: set of id(node) of the task roots below root's task
+    """
+    deps = set()
+    visited = set()
+    visit_stack = list(root.sources)
+    while len(visit_stack) > 0:
+        cursor = visit_stack.pop()
+        if id(cursor) in visited:
+            continue
+        visited.add(id(cursor))
+        if id(cursor) in roots:
+            deps.add(id(cursor))
+        else:
+            visit_stack.extend(cursor.sources)
+    return deps
+
+
+class BranchScheduler:
+    """
+    Evaluates an operator DAG as a set of tasks (see task_roots()) on a thread pool.
+    A task is submitted once all tasks it reads from are done, ready tasks in evaluation
+    order, so no worker ever waits on another task. The root's task is run by the calling
+    thread, so DAGs without joins, row concatenations or shared results do not use the pool.
+    """
+
+    def __init__(self, executor: concurrent.futures.Executor):
+        """
+        :param executor: thread pool to run tasks on
+        """
+        self._executor = executor
+
+    def evaluate(
+        self,
+        op,
+        evaluate: Callable[[Any], Any],
+        *,
+        store: Callable[[Any, Any], None],
+        consumer_counts: Dict[int, int],
+    ):
+        """
+        Evaluate op.
+
+        :param op: root of operator DAG
+        :param evaluate: function evaluating a task root node (taking its task's inputs from store)
+        :param store: function storing a task's result for its consumers
+        :param consumer_counts: result of count_consumers(op)
+        :return: result of evaluate(op)
+        """
+        roots = task_roots(op, consumer_counts)
+        position = {id(node): i for i, node in enumerate(roots)}
+        consumers = {id(node): [] for node in roots}
+        waiting_on = dict()
+        for node in roots:
+            deps = task_dependencies(node, set(position.keys()))
+            waiting_on[id(node)] = len(deps)
+            for d in deps:
+                consumers[d].append(node)
+        running = dict()
+
+        def _submit(nodes):
+            for node in sorted(nodes, key=lambda n: position[id(n)]):
+                if node is not op:
+                    running[self._executor.submit(evaluate, node)] = node
+
+        _submit([node for node in roots if waiting_on[id(node)] == 0])
+        try:
+            while waiting_on[id(op)] > 0:
+                done, _ = concurrent.futures.wait(
+                    running.keys(), return_when=concurrent.futures.FIRST_COMPLETED
+                )
+                ready = []
+                for future in done:
+                    node = running.pop(future)
+                    store(node, future.result())
+                    for c in consumers[id(node)]:
+                        waiting_on[id(c)] = waiting_on[id(c)] - 1
+                        if waiting_on[id(c)] == 0:
+                            ready.append(c)
+                _submit(ready)
+        finally:
+            for future in running.keys():
+                future.cancel()
+            # let started tasks finish before their inputs are released
+            concurrent.futures.wait(running.keys())
+        # every other task is below the root, so all are done
+        return evaluate(op)
@@ -0,0 +1,149 @@
+"""
+Planning evaluation of operator DAGs over a stream of data frame chunks.
+"""
+
+from typing import Iterable, NamedTuple, Optional
+
+import data_algebra.eval_state
+import data_algebra.expr_rep
+from data_algebra.view_representations import ViewRepresentation, TableDescription
+
+# aggregates whose partial results are merged with another aggregate
+_partial_merge_ops = {
+    "sum": "sum",
+    "min": "min",
+    "max": "max",
+    "any_value": "any_value",
+    "count": "sum",
+    "size": "sum",
+    "_count": "sum",
+    "_size": "sum",
+}
+
+
+def is_chunk_local(node, *, excluded_fn_names: Iterable[str] = ()) -> bool:
+    """
+    Return True if node's result on a concatenation of chunks is the concatenation
+    of its results on each chunk (row-local steps, see
+    data_algebra.eval_state.is_row_local_step(), and row-to-block record conversion).
+
+    :param node: operator node
+    :param excluded_fn_names: function names to treat as not row-local (such as user functions)
+    :return: True if node can be applied chunk by chunk
+    """
+    if node.node_name == "MapColumnsNode":
+        return True
+    if node.node_name == "ConvertRecordsNode":
+        return node.record_map.blocks_in is None
+    return data_algebra.eval_state.is_row_local_step(
+        node, excluded_fn_names=excluded_fn_names
+    )
+
+
+class ChunkedPlan(NamedTuple):
+    """
+    Plan for evaluating an operator DAG chunk by chunk.
+    per_chunk is applied to each chunk (as table table_name). If combine is not None, the
+    concatenated per_chunk results (as table partials_table_name) are re-aggregated
+    by combine (into the same form), and finalize maps combine's result to the final result.
+    """
+
+    table_name: str
+    per_chunk: ViewRepresentation
+    partials_table_name: Optional[str]
+    combine: Optional[ViewRepresentation]
+    finalize: Optional[ViewRepresentation]
+
+
+def plan_chunked_eval(
+    op: ViewRepresentation, *, excluded_fn_names: Iterable[str] = ()
+) -> ChunkedPlan:
+    """
+    Plan evaluating op over chunks of its one table. op must be made of chunk-local
+    steps (see is_chunk_local()), optionally ending with a project (aggregation)
+    step of column sum, count, size, min, max, mean or any_value aggregates.
+
+    :param op: operator DAG to plan
+    :param excluded_fn_names: function names to treat as not row-local (such as user functions)
+    :return: ChunkedPlan
+    """
+    assert isinstance(op, ViewRepresentation)
+    tables = op.get_tables()
+    if len(tables) != 1:
+        raise ValueError("chunked evaluation requires an ops-dag with one table def")
+    table_name = list(tables.keys())[0]
+    project = None
+    cursor = op
+    if op.node_name == "ProjectNode":
+        project = op
+        cursor = op.sources[0]
+    while cursor.node_name != "TableDescription":
+        if not is_chunk_local(cursor, excluded_fn_names=excluded_fn_names):
+            raise ValueError(
+                f"{cursor.node_name} can not be evaluated chunk by chunk: "
+                + str(cursor)
+            )
+        cursor = cursor.sources[0]
+    if project is None:
+        return ChunkedPlan(
+            table_name=table_name,
+            per_chunk=op,
+            partials_table_name=None,
+            combine=None,
+            finalize=None,
+        )
+    partial_ops = dict()
+    combine_ops = dict()
+    mean_ops = dict()
+    for k, opk in project.ops.items():
+        if len(opk.args) > 0:
+            if (len(opk.args) != 1) or (
+                not isinstance(opk.args[0], data_algebra.expr_rep.ColumnReference)
+            ):
+                raise ValueError(
+                    f"aggregate {k}: {opk} is not a single column aggregate"
+                )
+        if opk.op == "mean":
+            sum_name = f"_data_algebra_partial_sum_{len(mean_ops)}"
+            count_name = f"_data_algebra_partial_count_{len(mean_ops)}"
+            partial_ops[sum_name] = opk.args[0].sum()
+            partial_ops[count_name] = opk.args[0].count()
+            combine_ops[sum_name] = data_algebra.expr_rep.ColumnReference(
+                sum_name
+            ).sum()
+            combine_ops[count_name] = data_algebra.expr_rep.ColumnReference(
+                count_name
+            ).sum()
+            mean_ops[k] = data_algebra.expr_rep.ColumnReference(
+                sum_name
+            ) / data_algebra.expr_rep.ColumnReference(count_name)
+        elif opk.op in _partial_merge_ops.keys():
+            partial_ops[k] = opk
+            combine_ops[k] = data_algebra.expr_rep.Expression(
+                _partial_merge_ops[opk.op],
+                [data_algebra.expr_rep.ColumnReference(k)],
+                method=True,
+            )
+        else:
+            raise ValueError(f"aggregate {k}: {opk} can not be merged from partials")
+    group_by = list(project.group_by)
+    per_chunk = project.sources[0].project(partial_ops, group_by=group_by)
+    partials_table_name = "partials"
+    combine = TableDescription(
+        table_name=partials_table_name,
+        column_names=per_chunk.column_names,
+    ).project(combine_ops, group_by=group_by)
+    finalize = TableDescription(
+        table_name=partials_table_name,
+        column_names=combine.column_names,
+    )
+    if len(mean_ops) > 0:
+        finalize = finalize.extend(mean_ops)
+    finalize = finalize.select_columns(project.column_names)
+    return ChunkedPlan(
+        table_name=table_name,
+        per_chunk=per_chunk,
+        partials_table_name=partials_table_name,
+        combine=combine,
+        finalize=finalize,
+    )
@@ -5,7 +5,9 @@ Interface for realizing the data algebra as a sequence of steps over an object.
 
 import abc
 import re
-from typing import Any, Dict, Iterable, List
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+import data_algebra.eval_profile
 
 
 class DataModel(abc.ABC):
@@ -104,6 +106,65 @@ class DataModel(abc.ABC):
         :return: data frame result
         """
 
+    def profile_eval(
+        self, op, *, data_map: Dict[str, Any], trace_memory: bool = False
+    ) -> Tuple[Any, data_algebra.eval_profile.EvalProfile]:
+        """
+        Evaluate op, recording statistics. Models without per-node instrumentation
+        record the whole evaluation against the root node.
+
+        :param op: ViewRepresentation to evaluate
+        :param data_map: dictionary mapping table and view names to data frames
+        :param trace_memory: if True also record bytes allocated (slows evaluation)
+        :return: data frame result, EvalProfile
+        """
+        profile = data_algebra.eval_profile.EvalProfile(trace_memory=trace_memory)
+        profile.start()
+        try:
+            profile.enter(op)
+            res = self.eval(op, data_map=data_map)
+            profile.exit(
+                op, rows_out=res.shape[0], columns_out=res.shape[1], bytes_out=0
+            )
+        finally:
+            profile.stop()
+        return res, profile
+
+    def prepare_eval(self, op) -> Callable[[Dict[str, Any]], Any]:
+        """
+        Do any per-DAG work for evaluating op once, for repeated evaluations.
+
+        :param op: ViewRepresentation to evaluate
+        :return: function mapping a data_map to the evaluation result
+        """
+
+        def evaluate(data_map: Dict[str, Any]):
+            return self.eval(op, data_map=data_map)
+
+        return evaluate
+
+    def prepare_records_eval(self, op) -> Callable[[List[Dict[str, Any]]], Any]:
+        """
+        Do any per-DAG work for evaluating op over batches of records once, for repeated evaluations.
+
+        :param op: ViewRepresentation to evaluate, using exactly one table
+        :return: function mapping a list of records (dictionaries of column names to values)
+                 to the evaluation result
+        """
+        tables = op.get_tables()
+        assert len(tables) == 1
+        table_name = list(tables.keys())[0]
+        column_names = list(tables[table_name].column_names)
+        evaluate = self.prepare_eval(op)
+
+        def evaluate_records(records: List[Dict[str, Any]]):
+            X = self.data_frame(
+                {c: [record[c] for record in records] for c in column_names}
+            )
+            return evaluate({table_name: X})
+
+        return evaluate_records
+
     # cdata transform methods
 
     @abc.abstractmethod
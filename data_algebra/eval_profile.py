@@ -0,0 +1,246 @@
+"""
+Per-node timing and size statistics for in-memory evaluations of operator DAGs.
+"""
+
+import re
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import data_algebra.eval_state
+
+
+class NodeProfile(NamedTuple):
+    """
+    Statistics for one operator node of an evaluation. Times exclude time spent evaluating
+    the node's sources. Steps fused into this node's evaluation are listed in fused_node_names.
+    """
+
+    node_name: str
+    calls: int
+    wall_seconds: float
+    cpu_seconds: float
+    rows_in: int
+    rows_out: int
+    columns_out: int
+    bytes_out: int
+    bytes_allocated: Optional[int]
+    fused_node_names: List[str]
+
+
+class EvalProfile:
+    """
+    Collects a NodeProfile for each operator node evaluated. Attach to an EvalState
+    (as eval_state.profile) to turn on collection. Also carries the bytes the evaluation
+    copied to isolate its steps (filled in by profile_eval()).
+    """
+
+    trace_memory: bool
+    entries: Dict[int, NodeProfile]
+    bytes_copied: int
+
+    def __init__(self, *, trace_memory: bool = False):
+        """
+        :param trace_memory: if True also record bytes allocated (by tracemalloc, slows evaluation)
+        """
+        assert isinstance(trace_memory, bool)
+        self.trace_memory = trace_memory
+        self.entries = dict()
+        self.bytes_copied = 0
+        self.fused_into = dict()
+        self._local = threading.local()
+        self._started_tracing = False
+
+    def start(self) -> None:
+        """
+        Start of evaluation.
+        """
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+
+    def stop(self) -> None:
+        """
+        End of evaluation.
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    def _stack(self) -> List[List[float]]:
+        try:
+            return self._local.stack
+        except AttributeError:
+            self._local.stack = []
+            return self._local.stack
+
+    def enter(self, node) -> None:
+        """
+        Start of evaluation of node.
+        """
+        memory = 0
+        if self.trace_memory:
+            memory = tracemalloc.get_traced_memory()[0]
+        # start times and memory, then totals for nested (source) evaluations
+        self._stack().append(
+            [time.perf_counter(), time.thread_time(), memory, 0.0, 0.0, 0]
+        )
+
+    def abandon(self) -> None:
+        """
+        Evaluation of the most recently entered node failed.
+        """
+        self._stack().pop()
+
+    def exit(
+        self,
+        node,
+        *,
+        rows_out: int,
+        columns_out: int,
+        bytes_out: int,
+        fused: Optional[List] = None,
+    ) -> None:
+        """
+        End of evaluation of node.
+
+        :param node: node evaluated
+        :param rows_out: number of rows of result
+        :param columns_out: number of columns of result
+        :param bytes_out: size of result in bytes
+        :param fused: nodes evaluated as part of node's evaluation
+        """
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        memory = 0
+        if self.trace_memory:
+            memory = tracemalloc.get_traced_memory()[0]
+        stack = self._stack()
+        start_wall, start_cpu, start_memory, child_wall, child_cpu, child_memory = (
+            stack.pop()
+        )
+        wall = wall - start_wall
+        cpu = cpu - start_cpu
+        memory = memory - start_memory
+        if len(stack) > 0:
+            stack[-1][3] += wall
+            stack[-1][4] += cpu
+            stack[-1][5] += memory
+        if fused is None:
+            fused = []
+        for f in fused:
+            self.fused_into[id(f)] = id(node)
+        input_node = node if len(fused) < 1 else fused[-1]
+        rows_in = sum(
+            [
+                self.entries[id(s)].rows_out
+                for s in input_node.sources
+                if id(s) in self.entries
+            ]
+        )
+        if len(input_node.sources) < 1:
+            rows_in = rows_out
+        entry = NodeProfile(
+            node_name=node.node_name,
+            calls=1,
+            wall_seconds=wall - child_wall,
+            cpu_seconds=cpu - child_cpu,
+            rows_in=rows_in,
+            rows_out=rows_out,
+            columns_out=columns_out,
+            bytes_out=bytes_out,
+            bytes_allocated=(memory - child_memory) if self.trace_memory else None,
+            fused_node_names=[f.node_name for f in fused],
+        )
+        previous = self.entries.get(id(node), None)
+        if previous is not None:
+            # evaluated more than once (for example composed on each path to it)
+            entry = entry._replace(
+                calls=previous.calls + 1,
+                wall_seconds=previous.wall_seconds + entry.wall_seconds,
+                cpu_seconds=previous.cpu_seconds + entry.cpu_seconds,
+                bytes_allocated=(
+                    (previous.bytes_allocated + entry.bytes_allocated)
+                    if self.trace_memory
+                    else None
+                ),
+            )
+        self.entries[id(node)] = entry
+
+    def records(self, op) -> List[Dict[str, Any]]:
+        """
+        Statistics as a list of dictionaries, one per node of op's DAG evaluated, in evaluation order
+        (suitable for building a data frame).
+
+        :param op: operator DAG that was evaluated
+        :return: list of dictionaries
+        """
+        nodes = list(reversed(data_algebra.eval_state.topological_order(op)))
+        res = []
+        for i, node in enumerate(nodes):
+            entry = self.entries.get(id(node), None)
+            if entry is None:
+                continue
+            record = {"step": i}
+            record.update(entry._asdict())
+            res.append(record)
+        return res
+
+    def explain(self, op) -> str:
+        """
+        Render op's steps, one per line in evaluation order, each annotated with its statistics
+        (in the manner of an EXPLAIN ANALYZE). Sources are referred to by step number.
+
+        :param op: operator DAG that was evaluated
+        :return: report text
+        """
+        nodes = list(reversed(data_algebra.eval_state.topological_order(op)))
+        step_number = {id(node): i for i, node in enumerate(nodes)}
+        lines = []
+        for i, node in enumerate(nodes):
+            lines.append(f"[{i}] " + step_text(node, step_number))
+            if id(node) in self.fused_into.keys():
+                lines.append(
+                    f"    -- fused into step [{step_number[self.fused_into[id(node)]]}]"
+                )
+                continue
+            entry = self.entries.get(id(node), None)
+            if entry is None:
+                lines.append("    -- not evaluated")
+                continue
+            note = (
+                f"    -- {1000 * entry.wall_seconds:.3f} ms wall,"
+                + f" {1000 * entry.cpu_seconds:.3f} ms cpu,"
+                + f" rows {entry.rows_in} -> {entry.rows_out},"
+                + f" {entry.columns_out} columns,"
+                + f" {entry.bytes_out} bytes"
+            )
+            if entry.bytes_allocated is not None:
+                note = note + f", {entry.bytes_allocated} bytes allocated"
+            if entry.calls > 1:
+                note = note + f", {entry.calls} calls"
+            lines.append(note)
+        return "\n".join(lines) + "\n"
+
+
+def step_text(node, step_number: Dict[int, int]) -> str:
+    """
+    One line description of a node's step, with sources referred to by step number.
+
+    :param node: operator node
+    :param step_number: map from id() of each node to its step number
+    :return: step description
+    """
+    text = node.to_python_src_(indent=-1, strict=False, print_sources=False)
+    text = " ".join(text.split())
+    text = re.sub(r"([(\[{]) ", r"\1", text)
+    if len(node.sources) > 0:
+        if text.startswith("_0."):
+            text = text[len("_0.") :]
+        text = f"[{step_number[id(node.sources[0])]}]" + text
+        for j in range(1, len(node.sources)):
+            text = re.sub(
+                r"\b_" + str(j) + r"\b", f"[{step_number[id(node.sources[j])]}]", text
+            )
+    return text
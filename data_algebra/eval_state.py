@@ -0,0 +1,280 @@
+"""
+Per-evaluation bookkeeping for in-memory realizations of operator DAGs.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import threading
+
+import data_algebra.expr_rep
+
+
+def topological_order(op) -> List:
+    """
+    List the distinct nodes of an operator DAG, each node appearing before any of its sources.
+
+    :param op: root of operator DAG
+    :return: list of nodes
+    """
+    post_order = []
+    visited = set()
+    visit_stack = [(op, False)]
+    while len(visit_stack) > 0:
+        cursor, sources_done = visit_stack.pop()
+        if sources_done:
+            post_order.append(cursor)
+            continue
+        if id(cursor) in visited:
+            continue
+        visited.add(id(cursor))
+        visit_stack.append((cursor, True))
+        for s in cursor.sources:
+            if id(s) not in visited:
+                visit_stack.append((s, False))
+    post_order.reverse()
+    return post_order
+
+
+def is_row_local_step(node, *, excluded_fn_names: Iterable[str] = ()) -> bool:
+    """
+    Return True if node computes each result row from the matching input row alone
+    (extend with only row-local expressions, select rows with a row-local condition,
+    select columns, drop columns, rename columns), so it gives the same result rows on
+    any subset of its input rows.
+
+    :param node: operator node
+    :param excluded_fn_names: function names to treat as not row-local (such as user functions)
+    :return: True if node is row-local
+    """
+    if node.node_name in {"SelectColumnsNode", "DropColumnsNode", "RenameColumnsNode"}:
+        return True
+    if node.node_name == "ExtendNode":
+        if (
+            node.windowed_situation
+            or (len(node.partition_by) > 0)
+            or (len(node.order_by) > 0)
+        ):
+            return False
+    elif node.node_name != "SelectRowsNode":
+        return False
+    return all(
+        [
+            data_algebra.expr_rep.is_row_local_expression(
+                term, excluded_fn_names=excluded_fn_names
+            )
+            for term in node.ops.values()
+        ]
+    )
+
+
+def columns_needed(op) -> Dict[int, Set[str]]:
+    """
+    Compute which columns of each node's result are used by later steps (projection push-down).
+    All columns of the root are needed. A node none of whose columns are used keeps its first column,
+    so in-memory frames keep their row counts.
+
+    :param op: root of operator DAG
+    :return: dictionary mapping id(node) to set of needed column names
+    """
+    needed = {id(op): set(op.column_names)}
+    for node in topological_order(op):
+        using = needed[id(node)]
+        if len(using) <= 0:
+            using.add(node.column_names[0])
+        cols_used = node.columns_used_from_sources(set(using))
+        for s, cols in zip(node.sources, cols_used):
+            try:
+                needed[id(s)].update(cols)
+            except KeyError:
+                needed[id(s)] = set(cols)
+    return needed
+
+
+def columns_wanted(op, eval_state: Optional["EvalState"]) -> List[str]:
+    """
+    Columns of op's result that are needed, in op's column order.
+
+    :param op: operator node
+    :param eval_state: per-evaluation state, or None for all columns
+    :return: list of column names
+    """
+    if eval_state is None:
+        return op.columns_produced()
+    needed = eval_state.columns_needed[id(op)]
+    return [c for c in op.column_names if c in needed]
+
+
+def count_consumers(op) -> Dict[int, int]:
+    """
+    Count how many times each node of an operator DAG is consumed as a source.
+    Nodes are identified by object identity. The root is counted as consumed once (by the caller).
+
+    :param op: root of operator DAG
+    :return: dictionary mapping id(node) to number of consumers
+    """
+    counts = {id(op): 1}
+    visited = set()
+    visit_stack = [op]
+    while len(visit_stack) > 0:
+        cursor = visit_stack.pop()
+        if id(cursor) in visited:
+            continue
+        visited.add(id(cursor))
+        for s in cursor.sources:
+            counts[id(s)] = counts.get(id(s), 0) + 1
+            visit_stack.append(s)
+    return counts
+
+
+def consumer_positions(op) -> Dict[int, List[int]]:
+    """
+    For each node of an operator DAG, the positions (in evaluation order, sources before
+    consumers) of the nodes consuming it, one entry per use, ascending.
+
+    :param op: root of operator DAG
+    :return: dictionary mapping id(node) to list of positions
+    """
+    res = dict()
+    for i, node in enumerate(reversed(topological_order(op))):
+        for s in node.sources:
+            res.setdefault(id(s), []).append(i)
+    return res
+
+
+class EvalState:
+    """
+    Result table for one evaluation of an operator DAG.
+    Results of nodes reached by more than one path are computed once, and
+    released when their last consumer has taken them.
+    Also carries which columns of each node's result later steps need,
+    an estimate of the bytes defensively copied during the evaluation
+    (copies Pandas defers under copy on write are not counted),
+    which nodes must be evaluated one step at a time (not fused),
+    an optional profile collecting per-node statistics, and
+    an optional table recording each node's composed plan (for explaining evaluations), and
+    whether composed plans of shared nodes must be marked for caching (for lazy plans
+    collected without common sub-plan elimination).
+    The result table may be used from several threads at once.
+    """
+
+    consumer_counts: Dict[int, int]
+    remaining_uses: Dict[int, int]
+    results: Dict[int, Any]
+    columns_needed: Dict[int, Set[str]]
+    bytes_copied: int
+    not_fused: Set[int]
+    profile: Optional[Any]
+    plans: Optional[Dict[int, Any]]
+    cache_shared: bool
+
+    def __init__(self, op):
+        self.consumer_counts = count_consumers(op)
+        self.remaining_uses = self.consumer_counts.copy()
+        self.results = dict()
+        self.columns_needed = columns_needed(op)
+        self.bytes_copied = 0
+        self.not_fused = set()
+        self.profile = None
+        self.plans = None
+        self.cache_shared = False
+        self._lock = threading.Lock()
+
+    def fresh_copy(self) -> "EvalState":
+        """
+        New, empty, EvalState for another evaluation of the same operator DAG, reusing
+        this state's DAG analysis (which must not have been altered by put_back()).
+        """
+        res = EvalState.__new__(EvalState)
+        res.consumer_counts = self.consumer_counts.copy()
+        res.remaining_uses = self.consumer_counts.copy()
+        res.results = dict()
+        res.columns_needed = self.columns_needed
+        res.bytes_copied = 0
+        res.not_fused = set()
+        res.profile = None
+        res.plans = None
+        res.cache_shared = self.cache_shared
+        res._lock = threading.Lock()
+        return res
+
+    def note_copy(self, n_bytes: int) -> None:
+        """
+        Record that a copy of n_bytes was made.
+        """
+        with self._lock:
+            self.bytes_copied = self.bytes_copied + int(n_bytes)
+
+    def is_needed(self, node, column_name: str) -> bool:
+        """
+        Return True if column_name of node's result is used by later steps.
+        """
+        return column_name in self.columns_needed[id(node)]
+
+    def is_shared(self, node) -> bool:
+        """
+        Return True if node is consumed more than once in the DAG.
+        """
+        return self.consumer_counts.get(id(node), 0) > 1
+
+    def has_result(self, node) -> bool:
+        """
+        Return True if a result for node is stored.
+        """
+        with self._lock:
+            return id(node) in self.results
+
+    def store(self, node, value) -> None:
+        """
+        Store a computed result for node.
+        """
+        with self._lock:
+            self.results[id(node)] = value
+
+    def take(self, node) -> Tuple[Any, bool]:
+        """
+        Fetch stored result for node, counting one use. Raises KeyError if not present.
+
+        :param node: operator node
+        :return: (value, True if this was the last use, and the table no longer holds the value)
+        """
+        k = id(node)
+        with self._lock:
+            value = self.results[k]
+            self.remaining_uses[k] = self.remaining_uses[k] - 1
+            if self.remaining_uses[k] <= 0:
+                del self.results[k]
+                return value, True
+            return value, False
+
+    def next_use(self, key: int, positions: Dict[int, List[int]]) -> int:
+        """
+        Evaluation order position of the next consumer of a stored result, assuming
+        consumers take results in evaluation order. A result handed back by put_back()
+        is about to be taken again, and is reported at position -1.
+
+        :param key: id() of node
+        :param positions: result of consumer_positions() for the DAG
+        :return: position of next consumer
+        """
+        # not locked: called back by the result table while it is being updated under the lock
+        node_positions = positions.get(key, [])
+        n_used = self.consumer_counts.get(key, 0) - self.remaining_uses.get(key, 0)
+        if (n_used < 0) or (n_used >= len(node_positions)):
+            return -1
+        return node_positions[n_used]
+
+    def put_back(self, node, value) -> None:
+        """
+        Store value as node's result for one more consumer, so the next evaluation of node takes
+        it instead of recomputing it. Used to hand back a result taken (or computed) for a step
+        that is then re-run.
+        """
+        k = id(node)
+        with self._lock:
+            if k not in self.results:
+                self.results[k] = value
+            if self.is_shared(node):
+                self.remaining_uses[k] = self.remaining_uses[k] + 1
+            else:
+                # mark as shared, so the next consumer takes the stored value
+                self.consumer_counts[k] = 2
+                self.remaining_uses[k] = 1
@@ -3,7 +3,7 @@ Represent data processing expressions.
 """
 
 import abc
-from typing import List, Set, Union
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple, Union
 
 import data_algebra.util
 from data_algebra.expression_walker import ExpressionWalker
@@ -106,6 +106,97 @@ fn_names_not_allowed_in_project = {
 }.union(fn_names_that_imply_ordered_windowed_situation)
 
 
+# functions whose value on each row depends only on their arguments' values on that row
+# (so they give the same results on any subset of rows)
+# noinspection SpellCheckingInspection
+fn_names_that_are_row_local = {
+    "==",
+    "=",
+    "!=",
+    "<>",
+    "<",
+    "<=",
+    ">",
+    ">=",
+    "+",
+    "-",
+    "neg",
+    "*",
+    "/",
+    "//",
+    "%/%",
+    "%",
+    "**",
+    "and",
+    "&",
+    "or",
+    "|",
+    "xor",
+    "^",
+    "not",
+    "_uniform",
+    "abs",
+    "arccos",
+    "arccosh",
+    "arcsin",
+    "arcsinh",
+    "arctan",
+    "arctan2",
+    "arctanh",
+    "around",
+    "as_int64",
+    "as_str",
+    "base_Sunday",
+    "ceil",
+    "coalesce",
+    "concat",
+    "cos",
+    "cosh",
+    "date_diff",
+    "datetime_to_date",
+    "dayofmonth",
+    "dayofweek",
+    "dayofyear",
+    "exp",
+    "expm1",
+    "floor",
+    "fmax",
+    "fmin",
+    "format_date",
+    "format_datetime",
+    "if_else",
+    "is_bad",
+    "is_in",
+    "is_inf",
+    "is_nan",
+    "is_null",
+    "log",
+    "log10",
+    "log1p",
+    "mapv",
+    "maximum",
+    "minimum",
+    "mod",
+    "month",
+    "parse_date",
+    "parse_datetime",
+    "quarter",
+    "remainder",
+    "round",
+    "sign",
+    "sin",
+    "sinh",
+    "sqrt",
+    "tan",
+    "tanh",
+    "timestamp_diff",
+    "trimstr",
+    "weekofyear",
+    "where",
+    "year",
+}
+
+
 # fns that don't have consistent windowed implementations we want to support
 fn_names_that_contradict_windowed_situation = set()
 
@@ -1451,6 +1542,249 @@ def get_columns_used(parsed_exprs) -> Set[str]:
     return columns_seen
 
 
+def term_key(
+    term: PreTerm, *, _keys: Optional[Dict[int, Tuple[PreTerm, Hashable]]] = None
+) -> Hashable:
+    """
+    Structural key of an expression: terms with equal keys compute the same values
+    (hash-consing). Stricter than is_equal(), as literal types and call forms are
+    also compared.
+
+    :param term: expression to key
+    :return: hashable key
+    """
+    if _keys is None:
+        _keys = dict()
+    try:
+        return _keys[id(term)][1]
+    except KeyError:
+        pass
+    if isinstance(term, Value):
+        key = (
+            "Value",
+            data_algebra.util.map_type_to_canonical(type(term.value)),
+            term.value,
+        )
+    elif isinstance(term, ColumnReference):
+        key = ("ColumnReference", term.column_name)
+    elif isinstance(term, ListTerm):
+        key = ("ListTerm", repr(term.value))
+    elif isinstance(term, DictTerm):
+        key = ("DictTerm", repr(term.value))
+    elif isinstance(term, Expression):
+        params_key = None
+        if term.params is not None:
+            params_key = tuple(sorted([(k, repr(v)) for k, v in term.params.items()]))
+        key = (
+            "Expression",
+            term.op,
+            term.inline,
+            term.method,
+            params_key,
+            tuple([term_key(a, _keys=_keys) for a in term.args]),
+        )
+    else:
+        key = ("id", id(term))  # unknown terms are never merged
+    _keys[id(term)] = (term, key)  # holding term, so its id() is not re-used
+    return key
+
+
+# conditional forms, and the position of their first argument that is only evaluated
+# on some rows (databases evaluate these branches under a CASE)
+_conditional_branch_start = {
+    "if_else": 1,
+    "where": 1,
+    "coalesce": 1,
+}
+
+
+def _can_hoist(term: PreTerm, hoistable: Dict[int, Tuple[PreTerm, bool]]) -> bool:
+    # row by row, deterministic, non-trivial expressions
+    try:
+        return hoistable[id(term)][1]
+    except KeyError:
+        pass
+    res = False
+    if isinstance(term, Expression):
+        res = (
+            (len(term.args) > 0)
+            and (term.op not in fn_names_that_imply_windowed_situation)
+            and (term.op not in fn_names_that_imply_ordered_windowed_situation)
+            and all(
+                [
+                    (not isinstance(a, Expression)) or _can_hoist(a, hoistable)
+                    for a in term.args
+                ]
+            )
+        )
+    hoistable[id(term)] = (term, res)
+    return res
+
+
+def _term_depth(term: PreTerm, depths: Dict[int, Tuple[PreTerm, int]]) -> int:
+    # 0 for columns and values, else one more than the deepest argument
+    try:
+        return depths[id(term)][1]
+    except KeyError:
+        pass
+    res = 0
+    if isinstance(term, Expression):
+        res = 1 + max([_term_depth(a, depths) for a in term.args] + [0])
+    depths[id(term)] = (term, res)
+    return res
+
+
+def factor_common_subexpressions(
+    ops: Dict[str, PreTerm],
+    *,
+    reserved_names: Iterable[str],
+    name_prefix: str = "_da_cse_",
+    min_depth: int = 1,
+) -> List[Dict[str, PreTerm]]:
+    """
+    Split a dictionary of row by row expressions into stages, so sub-expressions that occur
+    more than once are computed once, into temporary columns. Each stage only uses the
+    temporary columns of earlier stages. The last stage has the keys of ops.
+    Temporary columns are computed for every row, so a sub-expression is only shared if it
+    occurs at least once outside the branches of a conditional (such as if_else()).
+
+    :param ops: dictionary of result names to expressions
+    :param reserved_names: names temporary columns must not use
+    :param name_prefix: prefix for temporary column names
+    :param min_depth: smallest expression depth to share (1 shares operations on columns
+                      and values such as x + y, 2 only expressions nesting other expressions)
+    :return: list of stages, a single stage (ops) if there is nothing to share
+    """
+    assert isinstance(min_depth, int)
+    assert min_depth > 0
+    reserved = set(reserved_names).union(ops.keys())
+    keys = dict()
+    hoistable = dict()
+    depths = dict()
+
+    def can_share(term) -> bool:
+        return _can_hoist(term, hoistable) and (_term_depth(term, depths) >= min_depth)
+
+    definitions = dict()  # term key to (temporary name, defining expression)
+    current = dict(ops)
+    while True:
+        counts = dict()
+        unguarded = set()  # keys of sub-expressions evaluated on every row
+
+        def count(term, guarded: bool):
+            if can_share(term):
+                k = term_key(term, _keys=keys)
+                counts[k] = counts.get(k, 0) + 1
+                if not guarded:
+                    unguarded.add(k)
+            if isinstance(term, Expression):
+                branch_start = _conditional_branch_start.get(term.op, len(term.args))
+                for i, a in enumerate(term.args):
+                    count(a, guarded or (i >= branch_start))
+
+        for term in current.values():
+            count(term, False)
+        shared = {k for k, v in counts.items() if (v > 1) and (k in unguarded)}
+        if len(shared) < 1:
+            break
+
+        def rewrite(term):
+            # replace outermost repeated sub-expressions
+            if can_share(term):
+                k = term_key(term, _keys=keys)
+                if k in shared:
+                    if k not in definitions.keys():
+                        name = f"{name_prefix}{len(definitions)}"
+                        while name in reserved:
+                            name = "_" + name
+                        reserved.add(name)
+                        definitions[k] = (name, term)
+                    return ColumnReference(definitions[k][0])
+            if isinstance(term, Expression):
+                new_args = [rewrite(a) for a in term.args]
+                if all([na is a for na, a in zip(new_args, term.args)]):
+                    return term
+                return Expression(
+                    term.op,
+                    new_args,
+                    params=term.params,
+                    inline=term.inline,
+                    method=term.method,
+                )
+            return term
+
+        def rewrite_inside(term):
+            # a definition is not replaced by a reference to itself
+            new_args = [rewrite(a) for a in term.args]
+            if all([na is a for na, a in zip(new_args, term.args)]):
+                return term
+            return Expression(
+                term.op,
+                new_args,
+                params=term.params,
+                inline=term.inline,
+                method=term.method,
+            )
+
+        # new definitions are added as written, their insides are shared on later passes
+        n_defined = len(definitions)
+        temp_names = {name for name, _ in definitions.values()}
+        current = {
+            k: rewrite_inside(v) if k in temp_names else rewrite(v)
+            for k, v in current.items()
+        }
+        for name, term in list(definitions.values())[n_defined:]:
+            current[name] = term
+    if len(definitions) < 1:
+        return [ops]
+    # order temporary columns into stages by dependence
+    temp_names = {name for name, _ in definitions.values()}
+    level = dict()
+
+    def find_level(name) -> int:
+        try:
+            return level[name]
+        except KeyError:
+            pass
+        used = set()
+        current[name].get_column_names(used)
+        lvl = 1 + max([find_level(u) for u in used if u in temp_names] + [-1])
+        level[name] = lvl
+        return lvl
+
+    stages = [dict() for _ in range(1 + max([find_level(n) for n in temp_names]))]
+    for name, _ in definitions.values():
+        stages[level[name]][name] = current[name]
+    stages.append({k: current[k] for k in ops.keys()})
+    return stages
+
+
+def is_row_local_expression(
+    term: PreTerm, *, excluded_fn_names: Iterable[str] = ()
+) -> bool:
+    """
+    Return True if term's value on each row depends only on column values of that row
+    (see fn_names_that_are_row_local). Whole-column functions (such as co_equalizer),
+    and functions not known to be row-local, are not.
+
+    :param term: expression to check
+    :param excluded_fn_names: function names to treat as not row-local (such as user functions)
+    :return: True if term is row-local
+    """
+    if isinstance(term, Expression):
+        if (term.op not in fn_names_that_are_row_local) or (
+            term.op in excluded_fn_names
+        ):
+            return False
+        return all(
+            [
+                is_row_local_expression(a, excluded_fn_names=excluded_fn_names)
+                for a in term.args
+            ]
+        )
+    return True
+
+
 # noinspection SpellCheckingInspection
 def implies_windowed(parsed_exprs: dict) -> bool:
     """
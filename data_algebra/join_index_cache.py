@@ -0,0 +1,113 @@
+"""
+Reusable join-key indexes, for repeated joins against the same (dimension) table.
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable, Tuple
+import threading
+import weakref
+
+
+class JoinIndexCache:
+    """
+    Least recently used cache of key indexes over data frames, under a memory budget.
+    Entries are keyed by frame identity and key columns. An entry is only reused while
+    the frame object is alive and its fingerprint (supplied by the caller, for example
+    shape, key column buffer addresses and a checksum of the key values) is unchanged.
+    The fingerprint must change when the keys are altered in place, else a stale index is used.
+    Safe to share between threads.
+    """
+
+    max_bytes: int
+    n_bytes: int
+    hits: int
+    misses: int
+    _entries: OrderedDict
+
+    def __init__(self, *, max_bytes: int):
+        """
+        :param max_bytes: memory budget for cached indexes, in bytes
+        """
+        assert isinstance(max_bytes, int)
+        assert max_bytes > 0
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """
+        Drop all entries.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.n_bytes = 0
+
+    def _evict(self, key) -> None:
+        with self._lock:
+            try:
+                entry = self._entries.pop(key)
+            except KeyError:
+                return
+            self.n_bytes = self.n_bytes - entry[3]
+
+    def get(
+        self,
+        frame,
+        key_columns: Iterable[str],
+        *,
+        fingerprint: Hashable,
+        build: Callable[[], Tuple[Any, int]],
+    ):
+        """
+        Return the index for frame and key_columns, building and caching it if needed.
+
+        :param frame: data frame being indexed
+        :param key_columns: columns the index is over
+        :param fingerprint: version information for frame, a cached entry with a different fingerprint is rebuilt
+        :param build: function returning (index, size of index in bytes)
+        :return: index
+        """
+        key = (id(frame), tuple(key_columns))
+        with self._lock:
+            try:
+                frame_ref, cached_fingerprint, index, _ = self._entries[key]
+                if (frame_ref() is frame) and (cached_fingerprint == fingerprint):
+                    self._entries.move_to_end(key)
+                    self.hits = self.hits + 1
+                    return index
+                self._evict(key)
+            except KeyError:
+                pass
+            self.misses = self.misses + 1
+        index, n_bytes = build()
+        n_bytes = int(n_bytes)
+        if n_bytes > self.max_bytes:
+            return index  # too large to keep
+        # drop the entry when the frame is collected, so a recycled id() can not match it
+        cache_ref = weakref.ref(self)
+
+        def _on_frame_collected(_, *, cache_ref=cache_ref, key=key):
+            cache = cache_ref()
+            if cache is not None:
+                cache._evict(key)
+
+        with self._lock:
+            self._evict(key)  # in case another thread built the same entry
+            while (len(self._entries) > 0) and (
+                self.n_bytes + n_bytes > self.max_bytes
+            ):
+                self._evict(next(iter(self._entries)))
+            self._entries[key] = (
+                weakref.ref(frame, _on_frame_collected),
+                fingerprint,
+                index,
+                n_bytes,
+            )
+            self.n_bytes = self.n_bytes + n_bytes
+        return index
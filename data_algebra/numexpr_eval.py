@@ -0,0 +1,208 @@
+"""
+Optional numexpr evaluation of arithmetic, comparison, logical and math expressions.
+"""
+
+import math
+from typing import Dict, Optional, Tuple
+
+import numpy
+
+import data_algebra.expr_rep
+
+have_numexpr = False
+try:
+    # noinspection PyUnresolvedReferences
+    import numexpr
+
+    have_numexpr = True
+except ImportError:
+    pass
+
+
+# column types numexpr evaluates the same way numpy does
+_numexpr_column_dtypes = {
+    numpy.dtype(bool): "b",
+    numpy.dtype("int32"): "i",
+    numpy.dtype("int64"): "i",
+    numpy.dtype("float64"): "f",
+}
+
+_arithmetic_ops = {"+": "+", "*": "*", "-": "-", "/": "/", "%/%": "/", "%": "%"}
+
+_comparison_ops = {
+    "==": "==",
+    "=": "==",
+    "!=": "!=",
+    "<>": "!=",
+    "<": "<",
+    "<=": "<=",
+    ">": ">",
+    ">=": ">=",
+}
+
+_logical_ops = {"and": "&", "&": "&", "or": "|", "|": "|", "xor": "^", "^": "^"}
+
+# single argument math functions returning floats
+_float_functions = {
+    "sqrt",
+    "exp",
+    "expm1",
+    "log",
+    "log10",
+    "log1p",
+    "sin",
+    "cos",
+    "tan",
+    "arcsin",
+    "arccos",
+    "arctan",
+    "sinh",
+    "cosh",
+    "tanh",
+    "arcsinh",
+    "arccosh",
+    "arctanh",
+}
+
+
+def _translate(
+    term, *, column_kinds: Dict[str, str], variables: Dict[str, str]
+) -> Optional[Tuple[str, str]]:
+    """
+    Translate a term into numexpr source text.
+
+    :param term: data_algebra.expr_rep.PreTerm to translate
+    :param column_kinds: map from column names to "b" (bool), "i" (integer) or "f" (float)
+    :param variables: map from column names to numexpr variable names, added to
+    :return: (numexpr text, kind of result), or None if term can not be translated
+    """
+    if isinstance(term, data_algebra.expr_rep.ColumnReference):
+        try:
+            kind = column_kinds[term.column_name]
+        except KeyError:
+            return None
+        try:
+            var_name = variables[term.column_name]
+        except KeyError:
+            var_name = f"_c{len(variables)}"
+            variables[term.column_name] = var_name
+        return var_name, kind
+    if isinstance(term, data_algebra.expr_rep.Value):
+        v = term.value
+        if isinstance(v, bool):
+            return repr(v), "b"
+        if isinstance(v, int) and (abs(v) < 2**31):
+            return repr(v), "i"
+        if isinstance(v, float) and math.isfinite(v):
+            return repr(v), "f"
+        return None
+    if not isinstance(term, data_algebra.expr_rep.Expression):
+        return None
+    sub = [
+        _translate(ai, column_kinds=column_kinds, variables=variables)
+        for ai in term.args
+    ]
+    if any([si is None for si in sub]):
+        return None
+    texts = ["(" + si[0] + ")" for si in sub]
+    kinds = [si[1] for si in sub]
+    op = term.op
+    if (op in ("-", "neg")) and (len(sub) == 1):
+        if kinds[0] == "b":
+            return None
+        return "-" + texts[0], kinds[0]
+    if (op in _arithmetic_ops) and (len(sub) >= 2):
+        if ("b" in kinds) or ((op not in ("+", "*")) and (len(sub) != 2)):
+            return None
+        if (op == "%") and ("f" not in kinds):
+            return None  # integer remainder by zero is not guarded in numexpr
+        kind = "f" if ("f" in kinds) or (_arithmetic_ops[op] == "/") else "i"
+        return f" {_arithmetic_ops[op]} ".join(texts), kind
+    if (op == "**") and (len(sub) == 2):
+        # numpy refuses negative integer powers of integers
+        if ("b" in kinds) or ("f" not in kinds):
+            return None
+        return f"{texts[0]} ** {texts[1]}", "f"
+    if (op in _comparison_ops) and (len(sub) == 2):
+        if ("b" in kinds) and (kinds[0] != kinds[1]):
+            return None
+        return f"{texts[0]} {_comparison_ops[op]} {texts[1]}", "b"
+    if (op in _logical_ops) and (len(sub) >= 2):
+        if any([k != "b" for k in kinds]) or ((op in ("xor", "^")) and (len(sub) != 2)):
+            return None
+        return f" {_logical_ops[op]} ".join(texts), "b"
+    if (op == "not") and (len(sub) == 1):
+        if kinds[0] != "b":
+            return None
+        return "~" + texts[0], "b"
+    if (op in ("where", "if_else")) and (len(sub) == 3):
+        if (kinds[0] != "b") or ((kinds[1] == "b") != (kinds[2] == "b")):
+            return None
+        kind = "f" if "f" in kinds[1:] else kinds[1]
+        return f"where({texts[0]}, {texts[1]}, {texts[2]})", kind
+    if (op in _float_functions) and (len(sub) == 1):
+        if kinds[0] == "b":
+            return None
+        return f"{op}({texts[0]})", "f"
+    if (op in ("abs", "floor", "ceil")) and (len(sub) == 1):
+        # numexpr computes these in floating point
+        if kinds[0] != "f":
+            return None
+        return f"{op}({texts[0]})", "f"
+    if (op == "arctan2") and (len(sub) == 2):
+        if "b" in kinds:
+            return None
+        return f"arctan2({texts[0]}, {texts[1]})", "f"
+    return None
+
+
+def translate_expression(
+    expr, *, column_dtypes: Dict[str, numpy.dtype]
+) -> Optional[Tuple[str, Dict[str, str]]]:
+    """
+    Translate an expression into numexpr source text, if all of it is supported.
+
+    :param expr: data_algebra.expr_rep.PreTerm to translate
+    :param column_dtypes: map from column names to dtypes
+    :return: (numexpr text, map from column names to numexpr variable names), or None
+    """
+    if not isinstance(expr, data_algebra.expr_rep.Expression):
+        return None  # nothing to gain
+    column_kinds = dict()
+    for k, v in column_dtypes.items():
+        try:
+            column_kinds[k] = _numexpr_column_dtypes[v]
+        except (KeyError, TypeError):
+            pass  # extension types and objects stay with the expression walker
+    variables: Dict[str, str] = dict()
+    translation = _translate(expr, column_kinds=column_kinds, variables=variables)
+    if (translation is None) or (len(variables) < 1):
+        return None
+    return translation[0], variables
+
+
+def evaluate_expression(expr, frame) -> Optional[numpy.ndarray]:
+    """
+    Evaluate expr over Pandas data frame frame in one blocked, multi-threaded numexpr call.
+
+    :param expr: data_algebra.expr_rep.PreTerm to evaluate
+    :param frame: Pandas data frame
+    :return: numpy array of results, or None if expression is not supported
+    """
+    if not have_numexpr:
+        return None
+    columns_used = set()
+    expr.get_column_names(columns_used)
+    try:
+        column_dtypes = {c: frame[c].dtype for c in columns_used}
+    except KeyError:
+        return None
+    translation = translate_expression(expr, column_dtypes=column_dtypes)
+    if translation is None:
+        return None
+    text, variables = translation
+    local_dict = {v: frame[c].to_numpy() for c, v in variables.items()}
+    try:
+        return numexpr.evaluate(text, local_dict=local_dict, global_dict={})
+    except Exception:
+        return None
@@ -3,11 +3,25 @@ Base class for adapters for Pandas-like APIs
 """
 
 from abc import ABC
-from typing import Any, Callable, Dict, Iterable, List, Optional
-import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
+import concurrent.futures
+import os
+import threading
 import types
 import numbers
 import warnings
+import weakref
+import zlib
 
 import numpy
 
@@ -16,9 +30,16 @@ import data_algebra.data_model
 import data_algebra.expr_rep
 import data_algebra.data_ops_types
 import data_algebra.connected_components
+import data_algebra.branch_scheduler
 import data_algebra.cdata
+import data_algebra.chunked_eval
+import data_algebra.partitioned_eval
+import data_algebra.spill
 import data_algebra.expression_walker
-
+import data_algebra.eval_state
+import data_algebra.eval_profile
+import data_algebra.join_index_cache
+import data_algebra.numexpr_eval
 
 # also possible, Dask, Nvidia Rapids, Modin, or Datatable versions
 
@@ -144,6 +165,86 @@ def _where_expr(*args):
     return numpy.where(cond, a, b)
 
 
+# implementations that give the same results on numpy arrays as on Pandas Series
+# (not floor division or modulo: on integer arrays numpy gives 0 for division by zero,
+# where Pandas gives inf and NaN)
+_array_safe_impl_ops = {
+    "==",
+    "=",
+    "!=",
+    "<>",
+    "<",
+    "<=",
+    ">",
+    ">=",
+    "+",
+    "-",
+    "neg",
+    "*",
+    "/",
+    "**",
+    "and",
+    "&",
+    "or",
+    "|",
+    "xor",
+    "^",
+    "not",
+    "where",
+}
+
+# elementwise functions taken from numpy (or matching Series methods, such as abs)
+_array_safe_numpy_ops = {
+    "abs",
+    "sqrt",
+    "exp",
+    "expm1",
+    "log",
+    "log10",
+    "log1p",
+    "sin",
+    "cos",
+    "tan",
+    "arcsin",
+    "arccos",
+    "arctan",
+    "arctan2",
+    "sinh",
+    "cosh",
+    "tanh",
+    "arcsinh",
+    "arccosh",
+    "arctanh",
+    "floor",
+    "ceil",
+    "sign",
+    "maximum",
+    "minimum",
+}
+
+
+class TermPlan(NamedTuple):
+    """
+    Expression compiled against a data model, with operators already resolved.
+    """
+
+    series_fn: Callable  # evaluates over a data frame
+    array_fn: Optional[
+        Callable
+    ]  # evaluates over a dictionary of numpy arrays, if possible
+    column_names: Tuple[str, ...]  # columns used
+
+
+class RowLocalPlan(NamedTuple):
+    """
+    Run of row-local steps over one table, compiled into one function of the table's columns.
+    """
+
+    table_name: str
+    column_names: Tuple[str, ...]  # table columns used
+    evaluate: Callable  # of (dictionary of columns, number of rows), returns data frame or None
+
+
 # base class for Pandas-like API realization
 class PandasModelBase(
     data_algebra.data_model.DataModel,
@@ -155,13 +256,40 @@ class PandasModelBase(
     """
 
     pd: types.ModuleType
+    use_trusted_keys: bool
+    join_index_cache: Optional[data_algebra.join_index_cache.JoinIndexCache]
+    use_numexpr: bool
+    numexpr_min_rows: int
+    _term_plans: Dict[int, Tuple[Any, TermPlan]]
+    _term_plans_user_fun_map: Dict[str, Callable]
+    _factored_ops: Dict[int, Tuple[Any, Tuple[str, ...], List[Dict[str, Any]]]]
     impl_map: Dict[str, Callable]
     transform_op_map: Dict[str, str]
     user_fun_map: Dict[str, Callable]
     _method_dispatch_table: Dict[str, Callable]
 
-    def __init__(self, *, pd: types.ModuleType, presentation_model_name: str):
+    def __init__(
+        self,
+        *,
+        pd: types.ModuleType,
+        presentation_model_name: str,
+        use_trusted_keys: bool = False,
+        join_index_cache_bytes: int = 0,
+        use_numexpr: bool = False,
+        numexpr_min_rows: int = 10000,
+        max_branch_workers: int = 1,
+        spill_budget_bytes: int = 0,
+        spill_directory: Optional[str] = None,
+    ):
         assert isinstance(pd, types.ModuleType)
+        assert isinstance(use_trusted_keys, bool)
+        assert isinstance(join_index_cache_bytes, int)
+        assert isinstance(use_numexpr, bool)
+        assert isinstance(numexpr_min_rows, int)
+        assert isinstance(max_branch_workers, int)
+        assert max_branch_workers > 0
+        assert isinstance(spill_budget_bytes, int)
+        assert (spill_directory is None) or isinstance(spill_directory, str)
         data_algebra.data_model.DataModel.__init__(
             self, presentation_model_name=presentation_model_name, module=pd
         )
@@ -169,9 +297,28 @@ class PandasModelBase(
             self,
         )
         self.pd = pd
+        self.use_trusted_keys = use_trusted_keys
+        self.join_index_cache = None
+        if join_index_cache_bytes > 0:
+            self.join_index_cache = data_algebra.join_index_cache.JoinIndexCache(
+                max_bytes=join_index_cache_bytes
+            )
+        # without numexpr installed, expressions are always evaluated by walking them
+        self.use_numexpr = use_numexpr and data_algebra.numexpr_eval.have_numexpr
+        self.numexpr_min_rows = numexpr_min_rows
+        self.max_branch_workers = max_branch_workers
+        self.spill_budget_bytes = spill_budget_bytes
+        self.spill_directory = spill_directory
         self.impl_map = self._populate_impl_map()
         self.transform_op_map = {"any_value": "first"}
         self.user_fun_map = dict()
+        # compiled expressions, by id() of live expression
+        self._term_plans = dict()
+        self._term_plans_user_fun_map = dict()
+        # common sub-expressions factored out of row by row steps, by id() of live node
+        self._factored_ops = dict()
+        # guards the above caches, which evaluation threads share
+        self._plans_lock = threading.RLock()
         self._method_dispatch_table = {
             "ConcatRowsNode": self._concat_rows_step,
             "ConvertRecordsNode": self._convert_records_step,
@@ -190,36 +337,49 @@ class PandasModelBase(
 
     # implementations
 
-    def _calc_date_diff(self, x0, x1):
+    def _as_datetime(self, x):
         # x is a pandas Series or list of datetime.date compatible types
-        x0 = self.pd.Series(x0)
-        x1 = self.pd.Series(x1)
-        x0_dates = self.pd.to_datetime(x0).dt.date.copy()
-        x1_dates = self.pd.to_datetime(x1).dt.date.copy()
-        deltas = [(x0_dates[i] - x1_dates[i]).days for i in range(len(x0_dates))]
-        return deltas
+        return self.pd.to_datetime(self.pd.Series(x))
+
+    def _as_day_start(self, x):
+        # midnight of the (local) date of each entry of x
+        res = self._as_datetime(x)
+        if res.dt.tz is not None:
+            # local wall clock times, so days are all 24 hours long
+            res = res.dt.tz_localize(None)
+        return res.dt.normalize()
+
+    def _calc_date_diff(self, x0, x1):
+        # whole days between the dates of x0 and x1
+        deltas = self._as_day_start(x0) - self._as_day_start(x1)
+        return deltas.dt.days
+
+    def _day_start_base_Sunday(self, day_starts):
+        # day_starts is a datetime Series normalized to midnight
+        days_since_Sunday = (day_starts.dt.dayofweek + 1) % 7
+        return day_starts - self.pd.to_timedelta(days_since_Sunday, unit="D")
 
     def _calc_base_Sunday(self, x):
-        # x is a pandas Series or list of datetime.date compatible types
-        x = self.pd.Series(x)
-        x_dates = self.pd.to_datetime(x).dt.date.copy()
-        res = [xi - datetime.timedelta(days=(xi.weekday() + 1) % 7) for xi in x_dates]
-        return res
+        res = self._day_start_base_Sunday(self._as_day_start(x))
+        return res.dt.date
 
     def _calc_week_of_Year(self, x):
-        # x is a pandas Series or list of datetime.date compatible types
-        # TODO: better impl
-        # Note was getting inconsistent results on vectorized methods
-        x = self.pd.Series(x)
-        x_dates = self.pd.to_datetime(x).dt.date.copy()
-        cur_dates = [datetime.date(dti.year, dti.month, dti.day) for dti in x_dates]
-        base_dates = [datetime.date(dti.year, 1, 1) for dti in x_dates]
-        base_dates = self._calc_base_Sunday(base_dates)
-        deltas = [(cur_dates[i] - base_dates[i]).days for i in range(len(cur_dates))]
-        res = [di // 7 for di in deltas]
+        # weeks since the Sunday on or before January 1st, counting the first partial week as week 1
+        cur_dates = self._as_day_start(x)
+        base_dates = cur_dates - self.pd.to_timedelta(
+            cur_dates.dt.dayofyear - 1, unit="D"
+        )
+        base_dates = self._day_start_base_Sunday(base_dates)
+        deltas = (cur_dates - base_dates).dt.days.to_numpy()
+        res = deltas // 7
         res = numpy.maximum(res, 1)
         return res
 
+    def _calc_timestamp_diff(self, c1, c2):
+        # seconds from c2 to c1
+        deltas = self._as_datetime(c1) - self._as_datetime(c2)
+        return deltas.dt.total_seconds()
+
     def _coalesce(self, a, b):
         a_is_series = isinstance(a, self.pd.Series)
         b_is_series = isinstance(b, self.pd.Series)
@@ -350,22 +510,14 @@ class PandasModelBase(
                 date_format=format
             ),
             "dayofweek": lambda x: 1
-            + ((self.pd.to_datetime(x).dt.dayofweek.astype("int64") + 1) % 7),
-            "dayofyear": lambda x: self.pd.to_datetime(x)
-            .dt.dayofyear.astype("int64")
-            .copy(),
+            + ((self._as_datetime(x).dt.dayofweek.astype("int64") + 1) % 7),
+            "dayofyear": lambda x: self._as_datetime(x).dt.dayofyear.astype("int64"),
             "weekofyear": lambda x: self._calc_week_of_Year(x),
-            "dayofmonth": lambda x: self.pd.to_datetime(x)
-            .dt.day.astype("int64")
-            .copy(),
-            "month": lambda x: self.pd.to_datetime(x).dt.month.astype("int64").copy(),
-            "quarter": lambda x: self.pd.to_datetime(x)
-            .dt.quarter.astype("int64")
-            .copy(),
-            "year": lambda x: self.pd.to_datetime(x).dt.year.astype("int64").copy(),
-            "timestamp_diff": lambda c1, c2: [
-                self.pd.Timedelta(c1[i] - c2[i]).total_seconds() for i in range(len(c1))
-            ],
+            "dayofmonth": lambda x: self._as_datetime(x).dt.day.astype("int64"),
+            "month": lambda x: self._as_datetime(x).dt.month.astype("int64"),
+            "quarter": lambda x: self._as_datetime(x).dt.quarter.astype("int64"),
+            "year": lambda x: self._as_datetime(x).dt.year.astype("int64"),
+            "timestamp_diff": lambda c1, c2: self._calc_timestamp_diff(c1, c2),
             "date_diff": lambda x0, x1: self._calc_date_diff(x0, x1),
             "base_Sunday": lambda x: self._calc_base_Sunday(x),
         }
@@ -400,6 +552,60 @@ class PandasModelBase(
         assert self.is_appropriate_data_instance(df)
         return df.reset_index(drop=True, inplace=False)
 
+    # noinspection PyMethodMayBeStatic
+    def frame_bytes(self, df) -> int:
+        """
+        Size in bytes of the column buffers of a data frame (object columns count references only).
+        """
+        dtypes = list(df.dtypes)
+        if all([isinstance(dt, numpy.dtype) for dt in dtypes]):
+            # object columns are arrays of references, so this matches memory_usage()
+            return int(df.shape[0] * sum([dt.itemsize for dt in dtypes]))
+        return int(df.memory_usage(index=False, deep=False).sum())
+
+    def copy_on_write_enabled(self) -> bool:
+        """
+        Return True if Pandas copy on write is on (it always is from Pandas 3.0).
+        """
+        if int(self.pd.__version__.split(".")[0]) >= 3:
+            return True
+        return self.pd.get_option("mode.copy_on_write") is True
+
+    def _clean_copy(self, df, *, eval_state=None):
+        """
+        clean_copy(), recording the bytes copied in eval_state.
+        """
+        res = self.clean_copy(df)
+        self._note_copied(res, df, eval_state=eval_state)
+        return res
+
+    def _note_copied(self, res, source, *, eval_state) -> None:
+        """
+        Record in eval_state the bytes of the columns of res that are copies of columns of source,
+        and do not share memory with them. Under Pandas copy on write the copies steps make to
+        isolate themselves are deferred until a column is written to (which steps do not do),
+        so they are not counted.
+        """
+        if eval_state is None:
+            return
+        n_bytes = 0
+        copy_on_write = None
+        for c in res.columns:
+            if c not in source.columns:
+                continue
+            v = res[c]
+            if isinstance(v.dtype, numpy.dtype):
+                if not numpy.may_share_memory(v.to_numpy(), source[c].to_numpy()):
+                    n_bytes = n_bytes + v.shape[0] * v.dtype.itemsize
+            else:
+                # extension arrays do not expose a buffer to compare
+                if copy_on_write is None:
+                    copy_on_write = self.copy_on_write_enabled()
+                if not copy_on_write:
+                    n_bytes = n_bytes + int(v.memory_usage(index=False, deep=False))
+        if n_bytes > 0:
+            eval_state.note_copy(n_bytes)
+
     def to_pandas(self, df):
         """
         Convert to Pandas
@@ -517,13 +723,29 @@ class PandasModelBase(
             return True
         if len(column_names) < 1:
             return False
-        counts = table.groupby(column_names, observed=True).size()
-        return max(counts) <= 1
+        keys = table.loc[:, column_names]
+        # as in groupby(), rows with a missing key value are not part of any group
+        keys = keys.loc[keys.notna().all(axis=1), :]
+        if keys.shape[0] < 2:
+            return True
+        # hash each row's key once, a repeated hash is either a duplicate key or a hash collision
+        end = data_algebra.util.first_repeated_hash(
+            keys.shape[0],
+            lambda start, end: self.pd.util.hash_pandas_object(
+                keys.iloc[start:end, :], index=False
+            ).to_numpy(),
+        )
+        if end is None:
+            return True
+        # confirm exactly, on the rows scanned so far and then (only on a collision) all rows
+        if keys.iloc[0:end, :].duplicated(keep="first").any():
+            return False
+        return not keys.duplicated(keep="first").any()
 
     # bigger stuff
 
     # noinspection PyMethodMayBeStatic,PyUnusedLocal
-    def _table_step(self, op, *, data_map: dict):
+    def _table_step(self, op, *, data_map: dict, eval_state=None):
         """
         Return a copy of data frame from table description and data_map.
         """
@@ -545,16 +767,18 @@ class PandasModelBase(
                     "Unnamed TableDescription stored was not the right type"
                 )
         # check all columns we expect are present
-        columns_using = op.column_names
-        missing = set(columns_using) - set(df.columns)
+        missing = set(op.column_names) - set(df.columns)
         if len(missing) > 0:
             raise ValueError("missing required columns: " + str(missing))
+        # only copy columns later steps use
+        columns_using = data_algebra.eval_state.columns_wanted(op, eval_state)
         # make an index-free copy of the data to isolate side-effects and not deal with indices
-        res = df.loc[:, columns_using]
-        res = self.clean_copy(res)
+        res = df.loc[:, columns_using]  # a copy (deferred under copy on write)
+        res.reset_index(drop=True, inplace=True)
+        self._note_copied(res, df, eval_state=eval_state)
         return res
 
-    def _sql_proxy_step(self, op, *, data_map: dict):
+    def _sql_proxy_step(self, op, *, data_map: dict, eval_state=None):
         """
         execute SQL
         """
@@ -647,36 +871,811 @@ class PandasModelBase(
             res[c] = transient_new_frame[c]
         return res
 
-    def eval(self, op, *, data_map: Dict[str, Any]):
+    def eval(
+        self,
+        op,
+        *,
+        data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
+    ):
         """
         Implementation of Pandas evaluation of operators
 
         :param op: ViewRepresentation to evaluate
         :param data_map: dictionary mapping table and view names to data frames or data sources
+        :param eval_state: optional EvalState(op) to collect statistics (such as bytes_copied) in
+        :return: data frame result
+        """
+        assert isinstance(data_map, Dict)
+        assert isinstance(op, data_algebra.data_ops_types.OperatorPlatform)
+        if eval_state is None:
+            eval_state = data_algebra.eval_state.EvalState(op)
+        assert isinstance(eval_state, data_algebra.eval_state.EvalState)
+        spilling_results = None
+        if (self.spill_budget_bytes > 0) and isinstance(eval_state.results, dict):
+            # results held for later consumers are kept under the budget
+            positions = data_algebra.eval_state.consumer_positions(op)
+            spilling_results = data_algebra.spill.SpillingResults(
+                max_bytes=self.spill_budget_bytes,
+                frame_bytes=self.frame_bytes,
+                directory=self.spill_directory,
+                next_use=lambda k: eval_state.next_use(k, positions),
+            )
+            for k, v in eval_state.results.items():
+                spilling_results[k] = v
+            eval_state.results = spilling_results
+        try:
+            if self.max_branch_workers > 1:
+                with concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.max_branch_workers
+                ) as executor:
+                    scheduler = data_algebra.branch_scheduler.BranchScheduler(executor)
+                    return scheduler.evaluate(
+                        op,
+                        lambda node: self._eval_step(
+                            node, data_map=data_map, eval_state=eval_state
+                        ),
+                        store=eval_state.store,
+                        consumer_counts=eval_state.consumer_counts,
+                    )
+            return self._eval_value_source(
+                s=op, data_map=data_map, eval_state=eval_state
+            )
+        finally:
+            if spilling_results is not None:
+                spilling_results.close()
+
+    def profile_eval(
+        self, op, *, data_map: Dict[str, Any], trace_memory: bool = False
+    ) -> Tuple[Any, data_algebra.eval_profile.EvalProfile]:
+        """
+        Evaluate op, recording per-node statistics and the bytes copied (see EvalProfile).
+
+        :param op: ViewRepresentation to evaluate
+        :param data_map: dictionary mapping table and view names to data frames or data sources
+        :param trace_memory: if True also record bytes allocated per node (slows evaluation)
+        :return: data frame result, EvalProfile
+        """
+        eval_state = data_algebra.eval_state.EvalState(op)
+        profile = data_algebra.eval_profile.EvalProfile(trace_memory=trace_memory)
+        eval_state.profile = profile
+        profile.start()
+        try:
+            res = self.eval(op, data_map=data_map, eval_state=eval_state)
+        finally:
+            profile.stop()
+        profile.bytes_copied = eval_state.bytes_copied
+        return res, profile
+
+    def prepare_eval(self, op) -> Callable[[Dict[str, Any]], Any]:
+        """
+        Analyze op's DAG and compile its expressions once, for repeated evaluations.
+        A DAG that is a run of row-local steps over one table is compiled into one
+        function of that table's columns (see _compile_row_local_plan()).
+
+        :param op: ViewRepresentation to evaluate
+        :return: function mapping a data_map to the evaluation result
+        """
+        return self._prepare(op)[0]
+
+    def prepare_records_eval(self, op) -> Callable[[List[Dict[str, Any]]], Any]:
+        """
+        Analyze op's DAG and compile its expressions once, for repeated evaluations over
+        batches of records. For a DAG that is a run of row-local steps the record values
+        are made into columns directly, without building a data frame.
+
+        :param op: ViewRepresentation to evaluate, using exactly one table
+        :return: function mapping a list of records (dictionaries of column names to values)
+                 to the evaluation result
+        """
+        tables = op.get_tables()
+        assert len(tables) == 1
+        table_name = list(tables.keys())[0]
+        column_names = list(tables[table_name].column_names)
+        evaluate, row_local_plan = self._prepare(op)
+
+        def evaluate_records(records: List[Dict[str, Any]]):
+            if (row_local_plan is not None) and (len(records) > 0):
+                res = row_local_plan.evaluate(
+                    {
+                        c: self._column_from_values([record[c] for record in records])
+                        for c in row_local_plan.column_names
+                    },
+                    len(records),
+                )
+                if res is not None:
+                    return res
+            X = self.data_frame(
+                {c: [record[c] for record in records] for c in column_names}
+            )
+            return evaluate({table_name: X})
+
+        return evaluate_records
+
+    def _prepare(
+        self, op
+    ) -> Tuple[Callable[[Dict[str, Any]], Any], Optional[RowLocalPlan]]:
+        """
+        Shared work of prepare_eval() and prepare_records_eval().
+
+        :param op: ViewRepresentation to evaluate
+        :return: function mapping a data_map to the evaluation result, compiled row-local plan (or None)
+        """
+        assert isinstance(op, data_algebra.data_ops_types.OperatorPlatform)
+        eval_state = data_algebra.eval_state.EvalState(op)
+        for node in data_algebra.eval_state.topological_order(op):
+            if (node.node_name == "ExtendNode") and not (
+                node.windowed_situation
+                or (len(node.partition_by) > 0)
+                or (len(node.order_by) > 0)
+            ):
+                # windowed extends are not evaluated through compiled plans
+                for opk in node.ops.values():
+                    self._term_plan(opk)
+            elif node.node_name == "SelectRowsNode":
+                self._term_plan(node.expr)
+        row_local_plan = self._compile_row_local_plan(op)
+
+        def evaluate(data_map: Dict[str, Any]):
+            if row_local_plan is not None:
+                frame = data_map.get(row_local_plan.table_name, None)
+                if (
+                    self.is_appropriate_data_instance(frame)
+                    and (frame.shape[0] > 0)
+                    and set(row_local_plan.column_names).issubset(frame.columns)
+                ):
+                    res = row_local_plan.evaluate(
+                        {
+                            c: self._column_from_series(frame[c])
+                            for c in row_local_plan.column_names
+                        },
+                        frame.shape[0],
+                    )
+                    if res is not None:
+                        return res
+            return self.eval(op, data_map=data_map, eval_state=eval_state.fresh_copy())
+
+        return evaluate, row_local_plan
+
+    def _column_from_series(self, v):
+        """
+        Column of a compiled row-local plan from a Series: a numpy array for numpy dtypes,
+        else the Series with a fresh row index.
+        """
+        if isinstance(v.dtype, numpy.dtype):
+            return v.to_numpy()
+        return v.reset_index(drop=True)
+
+    def _column_from_values(self, values: List):
+        """
+        Column of a compiled row-local plan from a list of values, typed as a data frame
+        built from the values would type it.
+        """
+        value_type = type(values[0])
+        if (value_type in (bool, int, float)) and all(
+            [type(v) is value_type for v in values]
+        ):
+            try:
+                res = numpy.array(values)
+            except OverflowError:
+                res = None
+            if (res is not None) and (
+                res.dtype in (numpy.bool_, numpy.int64, numpy.float64)
+            ):
+                return res
+        return self._column_from_series(self.pd.Series(values))
+
+    def _compile_row_local_plan(self, op) -> Optional[RowLocalPlan]:
+        """
+        Compile a DAG that is a run of row-local steps (see _is_row_local_step()) over one
+        table into one function of the table's columns. Per call this skips the DAG analysis,
+        step dispatch and input checks of eval(), and carries numpy typed columns as numpy
+        arrays instead of building Series and data frames for each step. The function returns
+        None when a call can not be evaluated this way (a row selection that is not a boolean
+        column, expression results not aligned with their inputs, user functions changed since
+        compiling, or numexpr evaluation applying), and the caller should then use eval().
+
+        :param op: ViewRepresentation to compile
+        :return: RowLocalPlan or None if op is not such a DAG
+        """
+        chain = []
+        cursor = op
+        while cursor.node_name != "TableDescription":
+            if not self._is_row_local_step(cursor):
+                return None
+            chain.append(cursor)
+            cursor = cursor.sources[0]
+        eval_state = data_algebra.eval_state.EvalState(op)
+        steps = [
+            self._compile_row_local_step(node, eval_state) for node in reversed(chain)
+        ]
+        result_columns = data_algebra.eval_state.columns_wanted(op, eval_state)
+        user_fun_map = self.user_fun_map.copy()
+
+        def evaluate(cols: Dict[str, Any], n_rows: int):
+            if self.user_fun_map != user_fun_map:
+                return None
+            if self.use_numexpr and (n_rows >= self.numexpr_min_rows):
+                return None
+            with warnings.catch_warnings():
+                warnings.simplefilter(
+                    "ignore"
+                )  # out of range things like arccosh were warning
+                for step in steps:
+                    cols, n_rows = step(cols, n_rows)
+                    if cols is None:
+                        return None
+            return self.pd.DataFrame(
+                {c: cols[c] for c in result_columns},
+                index=self.pd.RangeIndex(n_rows),
+            )
+
+        return RowLocalPlan(
+            table_name=cursor.table_name,
+            column_names=tuple(
+                data_algebra.eval_state.columns_wanted(cursor, eval_state)
+            ),
+            evaluate=evaluate,
+        )
+
+    def _compile_row_local_step(self, node, eval_state) -> Callable:
+        """
+        Compile one step of _compile_row_local_plan() into a function of (columns, number of rows)
+        returning new columns (or None if the step can not be evaluated) and number of rows.
+        """
+        needed = eval_state.columns_needed[id(node)]
+        if node.node_name in {"ExtendNode", "SelectRowsNode"}:
+            ops = node.ops
+            if node.node_name == "ExtendNode":
+                ops = self._ops_needed(node, eval_state)
+            stages = self._common_subexpression_stages(node, ops)
+            stages = [
+                [(k, self._term_plan(opk)) for k, opk in stage.items()]
+                for stage in stages
+            ]
+
+            def evaluate_stages(cols: Dict[str, Any], n_rows: int):
+                work_cols = dict(cols)  # temporary columns are not kept
+                for stage in stages:
+                    new_cols = dict()
+                    for k, plan in stage:
+                        v = self._prepared_column(
+                            self._act_on_prepared_term(plan, work_cols, n_rows), n_rows
+                        )
+                        if v is None:
+                            return None
+                        new_cols[k] = v
+                    work_cols.update(new_cols)
+                return work_cols
+
+            if node.node_name == "ExtendNode":
+                new_keys = list(ops.keys())
+
+                def extend_step(cols: Dict[str, Any], n_rows: int):
+                    work_cols = evaluate_stages(cols, n_rows)
+                    if work_cols is None:
+                        return None, n_rows
+                    cols.update({k: work_cols[k] for k in new_keys})
+                    return {c: v for c, v in cols.items() if c in needed}, n_rows
+
+                return extend_step
+
+            def select_rows_step(cols: Dict[str, Any], n_rows: int):
+                work_cols = evaluate_stages(cols, n_rows)
+                if work_cols is None:
+                    return None, n_rows
+                selection = work_cols["expr"]
+                if not (
+                    isinstance(selection, numpy.ndarray) and (selection.dtype == bool)
+                ):
+                    return None, n_rows
+                cols = {c: v for c, v in cols.items() if c in needed}
+                if not numpy.any(selection):
+                    return None, n_rows  # eval() has its own typing of empty results
+                if not numpy.all(selection):
+                    cols = {
+                        c: (
+                            v[selection]
+                            if isinstance(v, numpy.ndarray)
+                            else v[selection].reset_index(drop=True)
+                        )
+                        for c, v in cols.items()
+                    }
+                    n_rows = int(numpy.sum(selection))
+                return cols, n_rows
+
+            return select_rows_step
+        if node.node_name == "SelectColumnsNode":
+            column_selection = [c for c in node.column_selection if c in needed]
+
+            def select_columns_step(cols: Dict[str, Any], n_rows: int):
+                return {c: cols[c] for c in column_selection}, n_rows
+
+            return select_columns_step
+        if node.node_name == "DropColumnsNode":
+
+            def drop_columns_step(cols: Dict[str, Any], n_rows: int):
+                return {c: v for c, v in cols.items() if c in needed}, n_rows
+
+            return drop_columns_step
+        if node.node_name == "RenameColumnsNode":
+            reverse_mapping = node.reverse_mapping
+
+            def rename_columns_step(cols: Dict[str, Any], n_rows: int):
+                cols = {reverse_mapping.get(c, c): v for c, v in cols.items()}
+                return {c: v for c, v in cols.items() if c in needed}, n_rows
+
+            return rename_columns_step
+        raise TypeError(f"not a row-local step: {node.node_name}")
+
+    def _act_on_prepared_term(self, plan: TermPlan, cols: Dict[str, Any], n_rows: int):
+        """
+        Evaluate a compiled expression over columns of a compiled row-local plan,
+        on numpy arrays if possible (as _act_on_columns() does), else through a data frame.
+        """
+        if plan.array_fn is not None:
+            used = {c: cols[c] for c in plan.column_names}
+            if all(
+                [
+                    isinstance(v, numpy.ndarray) and (v.dtype.kind in "biuf")
+                    for v in used.values()
+                ]
+            ):
+                with numpy.errstate(all="ignore"):
+                    return plan.array_fn(used)
+        return plan.series_fn(
+            self.pd.DataFrame(
+                {c: cols[c] for c in plan.column_names},
+                index=self.pd.RangeIndex(n_rows),
+                copy=False,
+            )
+        )
+
+    def _prepared_column(self, v, n_rows: int):
+        """
+        Conform an expression result to a column of a compiled row-local plan,
+        None if it is not aligned with the plan's rows.
+        """
+        if isinstance(v, numpy.ndarray) and (v.shape == (n_rows,)):
+            return v
+        if isinstance(v, self.pd.Series):
+            if not v.index.equals(self.pd.RangeIndex(n_rows)):
+                return None
+            return self._column_from_series(v)
+        # scalars, promoted as columns_to_frame_() does
+        return self._column_from_series(
+            self.columns_to_frame_({"v": v}, target_rows=n_rows)["v"]
+        )
+
+    def eval_chunked(
+        self, op, *, chunks: Iterable, partials_per_combine: int = 16
+    ) -> Iterator:
+        """
+        Evaluate op over a stream of data frame chunks of its one table (such as
+        from pd.read_csv(chunksize=...)), yielding result chunks. op must be made of
+        row-local steps and row to block record conversions, optionally ending with
+        a project step of sum, count, size, min, max, mean or any_value aggregates. In that case
+        per-chunk partial aggregates are merged, and a single result is yielded at the end.
+        Whole-column and user functions are not row-local, so are not allowed before the project.
+
+        :param op: ViewRepresentation to evaluate
+        :param chunks: iterable of data frames
+        :param partials_per_combine: number of pending partial aggregates that triggers a merge
+        :return: iterator of data frames
+        """
+        assert isinstance(partials_per_combine, int)
+        assert partials_per_combine > 1
+        plan = data_algebra.chunked_eval.plan_chunked_eval(
+            op, excluded_fn_names=self.user_fun_map.keys()
+        )
+        evaluate_chunk = self.prepare_eval(plan.per_chunk)
+        if plan.combine is None:
+            for chunk in chunks:
+                yield evaluate_chunk({plan.table_name: chunk})
+            return
+        combine = self.prepare_eval(plan.combine)
+        partials = []
+        saw_chunk = False
+        for chunk in chunks:
+            saw_chunk = True
+            partials.append(evaluate_chunk({plan.table_name: chunk}))
+            if len(partials) >= partials_per_combine:
+                partials = [
+                    combine({plan.partials_table_name: self.concat_rows(partials)})
+                ]
+        if not saw_chunk:
+            # aggregate of no rows
+            table = op.get_tables()[plan.table_name]
+            empty = self.pd.DataFrame({c: [] for c in table.column_names})
+            yield self.eval(op, data_map={plan.table_name: empty})
+            return
+        combined = combine({plan.partials_table_name: self.concat_rows(partials)})
+        yield self.eval(plan.finalize, data_map={plan.partials_table_name: combined})
+
+    def eval_partitioned(
+        self,
+        op,
+        *,
+        data_map: Dict[str, Any],
+        key: Optional[Iterable[str]] = None,
+        n_partitions: Optional[int] = None,
+        executor: Optional[concurrent.futures.Executor] = None,
+    ):
+        """
+        Evaluate op in parallel over hash partitions of its tables. The partition key
+        must be carried unchanged through the DAG, with every window partition,
+        aggregation grouping and join key including it, and every extend and row
+        selection must be row-local (windowed extends may also use window functions,
+        other than ngroup). If no such key is found (or key is not such a key),
+        evaluation falls back to eval(). Evaluation also falls back to eval() if user
+        functions are registered (in user_fun_map) and executor is not a thread pool, as
+        user functions are not sent to other processes. Result row order is only defined
+        if op ends with an order_rows step.
+
+        :param op: ViewRepresentation to evaluate
+        :param data_map: dictionary mapping table names to data frames
+        :param key: optional partition key column names, found from op if None
+        :param n_partitions: number of partitions, default is the number of CPUs
+        :param executor: optional concurrent.futures.Executor, default is a process pool
         :return: data frame result
         """
         assert isinstance(data_map, Dict)
         assert isinstance(op, data_algebra.data_ops_types.OperatorPlatform)
-        return self._eval_value_source(s=op, data_map=data_map)
+        if n_partitions is None:
+            n_partitions = os.cpu_count()
+        assert isinstance(n_partitions, int)
+        assert n_partitions > 0
+        tables = op.get_tables()
+        if key is None:
+            key = data_algebra.partitioned_eval.find_partition_key(
+                op, excluded_fn_names=self.user_fun_map.keys()
+            )
+        else:
+            key = list(key)
+            if not data_algebra.partitioned_eval.key_is_consistent(
+                op, key, excluded_fn_names=self.user_fun_map.keys()
+            ):
+                key = None
+        if (key is not None) and (n_partitions > 1):
+            # hashes agree across tables only if key types agree
+            key_types = {
+                tuple([str(data_map[k][c].dtype) for c in key]) for k in tables.keys()
+            }
+            if len(key_types) != 1:
+                key = None
+        if (key is None) or (n_partitions < 2):
+            return self.eval(op, data_map=data_map)
+        if (len(self.user_fun_map) > 0) and (
+            not isinstance(executor, concurrent.futures.ThreadPoolExecutor)
+        ):
+            # models are rebuilt without user functions in other processes
+            return self.eval(op, data_map=data_map)
+        partitions = {
+            k: data_algebra.partitioned_eval.partition_frame(
+                self.pd, data_map[k], key=key, n_partitions=n_partitions
+            )
+            for k in tables.keys()
+        }
+        partition_maps = [
+            {k: partitions[k][i] for k in tables.keys()} for i in range(n_partitions)
+        ]
+        partition_maps = [
+            m for m in partition_maps if any([v.shape[0] > 0 for v in m.values()])
+        ]
+        if len(partition_maps) < 1:
+            return self.eval(op, data_map=data_map)
+        own_executor = executor is None
+        if own_executor:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=min(n_partitions, len(partition_maps))
+            )
+        try:
+            futures = [
+                executor.submit(
+                    data_algebra.partitioned_eval.eval_partition, self, op, m
+                )
+                for m in partition_maps
+            ]
+            results = [f.result() for f in futures]
+        finally:
+            if own_executor:
+                executor.shutdown()
+        res = self.concat_rows(results)
+        if (op.node_name == "OrderRowsNode") and (res.shape[0] > 1):
+            ascending = [
+                False if ci in set(op.reverse) else True for ci in op.order_columns
+            ]
+            res = res.sort_values(
+                by=op.order_columns,
+                ascending=ascending,
+                ignore_index=True,
+                inplace=False,
+            )
+        return res
 
-    def _eval_value_source(self, s, *, data_map: dict):
+    def _eval_value_source(self, s, *, data_map: dict, eval_state=None):
         """
         Evaluate an incoming (or value source) node.
+        Nodes with more than one consumer are evaluated once per eval_state.
+        """
+        if eval_state is None:
+            return self._method_dispatch_table[s.node_name](op=s, data_map=data_map)
+        if not eval_state.is_shared(s):
+            if eval_state.has_result(s):
+                # computed ahead by a scheduler task
+                res, _ = eval_state.take(s)
+                return res
+            return self._eval_step(s, data_map=data_map, eval_state=eval_state)
+        try:
+            res, last_use = eval_state.take(s)
+        except KeyError:
+            eval_state.store(
+                s, self._eval_step(s, data_map=data_map, eval_state=eval_state)
+            )
+            res, last_use = eval_state.take(s)
+        if not last_use:
+            # steps add, replace, or delete columns of their inputs, but do not write into
+            # existing column values, so a shallow copy isolates this consumer
+            res = res.copy(deep=False)
+        return res
+
+    def _eval_step(self, op, *, data_map: dict, eval_state):
+        """
+        Run the step for op, and drop any result columns later steps do not use.
+        """
+        profile = eval_state.profile
+        if profile is not None:
+            profile.enter(op)
+        try:
+            chain = self._row_local_chain(op, eval_state)
+            if len(chain) > 1:
+                res = self._fused_row_local_steps(
+                    chain, data_map=data_map, eval_state=eval_state
+                )
+            else:
+                res = self._method_dispatch_table[op.node_name](
+                    op=op, data_map=data_map, eval_state=eval_state
+                )
+        except Exception:
+            if profile is not None:
+                profile.abandon()
+            raise
+        for c in [c for c in res.columns if not eval_state.is_needed(op, c)]:
+            del res[c]  # step results are not shared with the caller's data
+        if profile is not None:
+            profile.exit(
+                op,
+                rows_out=res.shape[0],
+                columns_out=res.shape[1],
+                bytes_out=self.frame_bytes(res),
+                # a failed fusion re-runs the steps one at a time
+                fused=[] if id(op) in eval_state.not_fused else chain[1:],
+            )
+        return res
+
+    # noinspection PyMethodMayBeStatic
+    def _is_row_local_step(self, op) -> bool:
+        """
+        Return True if op computes each result row from the matching input row alone
+        (see data_algebra.eval_state.is_row_local_step(), user functions are not row-local).
+        """
+        return data_algebra.eval_state.is_row_local_step(
+            op, excluded_fn_names=self.user_fun_map.keys()
+        )
+
+    def _row_local_chain(self, op, eval_state) -> List:
+        """
+        Maximal run of row-local steps ending at op, op first. Shared intermediate results are not fused over.
+        """
+        chain = []
+        cursor = op
+        while (id(cursor) not in eval_state.not_fused) and self._is_row_local_step(
+            cursor
+        ):
+            chain.append(cursor)
+            cursor = cursor.sources[0]
+            if eval_state.is_shared(cursor):
+                break
+        return chain
+
+    def _fused_row_local_steps(self, chain: List, *, data_map: dict, eval_state):
+        """
+        Evaluate a run of row-local steps (chain, last step first) as one kernel.
+        Columns are passed from step to step without building a data frame per step,
+        each row selection is applied to the columns later steps use before they are
+        evaluated, and only the final columns are materialized.
+        If the steps can not be fused (a row selection that is not a boolean column),
+        they are re-run one at a time.
+        """
+        source = chain[-1].sources[0]
+        incoming = self._eval_value_source(
+            source, data_map=data_map, eval_state=eval_state
+        )
+        res = None
+        if incoming.shape[0] > 0:
+            res = self._row_local_kernel(chain, incoming, eval_state=eval_state)
+        if res is None:
+            eval_state.put_back(source, incoming)
+            eval_state.not_fused.update([id(node) for node in chain])
+            res = self._method_dispatch_table[chain[0].node_name](
+                op=chain[0], data_map=data_map, eval_state=eval_state
+            )
+        return res
+
+    def _row_local_kernel(self, chain: List, incoming, *, eval_state):
+        """
+        Apply row-local steps (chain, last step first) to incoming, see _fused_row_local_steps().
+        Returns None if the steps can not be fused.
         """
-        return self._method_dispatch_table[s.node_name](op=s, data_map=data_map)
+        cols = {c: incoming[c] for c in incoming.columns}
+        index = incoming.index
+        for node in reversed(chain):
+            cols, index = self._row_local_kernel_step(
+                node, cols, index=index, eval_state=eval_state
+            )
+            if cols is None:
+                return None
+        return self.pd.DataFrame(
+            {
+                c: cols[c]
+                for c in data_algebra.eval_state.columns_wanted(chain[0], eval_state)
+            },
+            index=index,
+            copy=False,
+        )
+
+    def _row_local_kernel_step(self, node, cols: Dict[str, Any], *, index, eval_state):
+        """
+        Apply one row-local step to the columns of _row_local_kernel(), returning the new
+        columns and their row index (columns None if the step can not be fused).
+        """
+        selection = None
+        if node.node_name == "ExtendNode":
+            stages = self._common_subexpression_stages(
+                node, self._ops_needed(node, eval_state)
+            )
+            if len(stages) > 1:
+                # repeated sub-expressions, into temporary columns
+                work_cols = dict(cols)
+                for stage in stages:
+                    self._add_row_local_columns(stage, work_cols, index=index)
+                cols.update({k: work_cols[k] for k in stages[-1].keys()})
+            else:
+                self._add_row_local_columns(stages[0], cols, index=index)
+        elif node.node_name == "SelectRowsNode":
+            stages = self._common_subexpression_stages(node, node.ops)
+            work_cols = cols
+            if len(stages) > 1:
+                work_cols = dict(cols)
+                for stage in stages[:-1]:
+                    self._add_row_local_columns(stage, work_cols, index=index)
+            selection = self._act_on_row_local_term(
+                stages[-1]["expr"], work_cols, index=index
+            )
+            if not (
+                isinstance(selection, self.pd.Series) and (selection.dtype == bool)
+            ):
+                return None, index
+        elif node.node_name == "SelectColumnsNode":
+            # selected columns no later step uses were not computed
+            cols = {
+                c: cols[c]
+                for c in node.column_selection
+                if eval_state.is_needed(node, c)
+            }
+        elif node.node_name == "DropColumnsNode":
+            cols = {c: v for c, v in cols.items() if c not in node.column_deletions}
+        elif node.node_name == "RenameColumnsNode":
+            cols = {node.reverse_mapping.get(c, c): v for c, v in cols.items()}
+        else:
+            raise TypeError(f"not a row-local step: {node.node_name}")
+        cols = {c: v for c, v in cols.items() if eval_state.is_needed(node, c)}
+        if (selection is not None) and (not selection.all()):
+            # later steps only see the kept rows, as they would unfused
+            kept = self._clean_copy(
+                self.pd.DataFrame(cols, index=index, copy=False).loc[
+                    selection.to_numpy(), :
+                ],
+                eval_state=eval_state,
+            )
+            cols = {c: kept[c] for c in kept.columns}
+            index = kept.index
+        return cols, index
+
+    def _add_row_local_columns(
+        self, ops: Dict[str, Any], cols: Dict[str, Any], *, index
+    ) -> None:
+        """
+        Evaluate expressions over a dictionary of columns, adding the results to cols.
+        """
+        new_cols = dict()
+        with warnings.catch_warnings():
+            warnings.simplefilter(
+                "ignore"
+            )  # out of range things like arccosh were warning
+            for k, opk in ops.items():
+                new_cols[k] = self._act_on_row_local_term(opk, cols, index=index)
+        if all(
+            [
+                isinstance(v, self.pd.Series) and v.index.equals(index)
+                for v in new_cols.values()
+            ]
+        ):
+            cols.update(new_cols)
+        else:
+            new_frame = self.columns_to_frame_(new_cols, target_rows=len(index))
+            for k in ops.keys():
+                cols[k] = new_frame[k]
+
+    def _common_subexpression_stages(
+        self, node, ops: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Split a row by row step's expressions into stages, computing repeated sub-expressions
+        once into temporary columns (see data_algebra.expr_rep.factor_common_subexpressions()).
+        Cached, so the rewritten expressions (and their compiled plans) are re-used.
+        """
+        key = id(node)
+        ops_keys = tuple(ops.keys())
+        with self._plans_lock:
+            try:
+                node_ref, cached_keys, stages = self._factored_ops[key]
+                if (node_ref() is node) and (cached_keys == ops_keys):
+                    return stages
+            except KeyError:
+                pass
+        stages = data_algebra.expr_rep.factor_common_subexpressions(
+            ops, reserved_names=node.column_names
+        )
+        model_ref = weakref.ref(self)
+
+        def _on_node_collected(_, *, model_ref=model_ref, key=key):
+            model = model_ref()
+            if model is not None:
+                with model._plans_lock:
+                    model._factored_ops.pop(key, None)
+
+        with self._plans_lock:
+            self._factored_ops[key] = (
+                weakref.ref(node, _on_node_collected),
+                ops_keys,
+                stages,
+            )
+        return stages
+
+    def _act_on_row_local_term(self, term, cols: Dict[str, Any], *, index):
+        """
+        Evaluate an expression over a dictionary of columns, only building a data frame if needed.
+        """
+        evaluated, res = self._act_on_columns(term, cols, index=index)
+        if evaluated:
+            return res
+        return self._term_plan(term).series_fn(self.pd.DataFrame(cols, copy=False))
 
-    def _extend_step(self, op, *, data_map):
+    def _ops_needed(self, op, eval_state) -> Dict[str, Any]:
+        """
+        Return the subset of op.ops whose results later steps use.
+        """
+        if eval_state is None:
+            return op.ops
+        return {k: opk for k, opk in op.ops.items() if eval_state.is_needed(op, k)}
+
+    def _extend_step(self, op, *, data_map, eval_state=None):
         """
         Execute an extend step, returning a data frame.
         """
         if op.node_name != "ExtendNode":
             raise TypeError("op was supposed to be a data_algebra.data_ops.ExtendNode")
-        res = self._eval_value_source(op.sources[0], data_map=data_map)
+        res = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
+        # only compute results later steps use
+        ops = self._ops_needed(op, eval_state)
         if res.shape[0] <= 0:
             # special case out no-row frame
             incoming_col_set = set(res.columns)
             v_dict = {k: [] for k in res.columns}
-            for k in op.ops.keys():
+            for k in ops.keys():
                 if k not in incoming_col_set:
                     v_dict[k] = []
             return self.pd.DataFrame(v_dict)
@@ -688,136 +1687,359 @@ class PandasModelBase(
         if window_situation:
             op.check_extend_window_fns_()
         if not window_situation:
-            with warnings.catch_warnings():
-                warnings.simplefilter(
-                    "ignore"
-                )  # out of range things like arccosh were warning
-                new_cols = {
-                    k: opk.act_on(res, expr_walker=self) for k, opk in op.ops.items()
-                }
-            new_frame = self.columns_to_frame_(new_cols, target_rows=res.shape[0])
-            res = self.add_data_frame_columns_to_data_frame_(res, new_frame)
+            stages = self._common_subexpression_stages(op, ops)
+            work = res
+            if len(stages) > 1:
+                # repeated sub-expressions, into temporary columns of a shallow copy
+                work = res.copy(deep=False)
+                for stage in stages[:-1]:
+                    work = self._add_term_columns(stage, work)
+            res = self._add_term_columns(stages[-1], res, frame=work)
         else:
-            data_algebra_temp_cols = {}
-            standin_name = "_data_algebra_temp_g"  # name of an arbitrary input variable
-            # build up a sub-frame to work on
-            col_list = [c for c in set(op.partition_by)]
-            col_set = set(col_list)
-            for c in op.order_by:
-                if c not in col_set:
-                    col_list.append(c)
-                    col_set.add(c)
-            order_cols = [c for c in col_list]  # must be partition by followed by order
-            for k, opk in op.ops.items():
-                # assumes all args are column names or values, enforce this earlier
-                if len(opk.args) > 0:
-                    if isinstance(opk.args[0], data_algebra.expr_rep.ColumnReference):
-                        value_name = opk.args[0].column_name
-                        if value_name not in col_set:
-                            col_list.append(value_name)
-                            col_set.add(value_name)
-                    elif isinstance(opk.args[0], data_algebra.expr_rep.Value):
-                        key = str(opk.args[0].value)
-                        if key not in data_algebra_temp_cols.keys():
-                            value_name = "data_algebra_extend_temp_col_" + str(
-                                len(data_algebra_temp_cols)
-                            )
-                            data_algebra_temp_cols[key] = value_name
-                            col_list.append(value_name)
-                            res[value_name] = opk.args[0].value
-                    else:
-                        raise ValueError("opk must be a ColumnReference or Value")
-            ascending = [c not in set(op.reverse) for c in col_list]
-            subframe = self.clean_copy(res[col_list])
-            subframe["_data_algebra_orig_index"] = subframe.index
-            if len(order_cols) > 0:
-                subframe = self.clean_copy(
-                    subframe.sort_values(by=col_list, ascending=ascending)
+            new_frame = self._windowed_extend_frame(
+                op, res, ops=ops, eval_state=eval_state
+            )
+            res = self.add_data_frame_columns_to_data_frame_(res, new_frame)
+        return res
+
+    def _add_term_columns(self, ops: Dict[str, Any], res, *, frame=None):
+        """
+        Evaluate expressions over frame (default res), adding the results as columns of res.
+        """
+        if frame is None:
+            frame = res
+        with warnings.catch_warnings():
+            warnings.simplefilter(
+                "ignore"
+            )  # out of range things like arccosh were warning
+            new_cols = {k: self._act_on_term(opk, frame) for k, opk in ops.items()}
+        new_frame = self.columns_to_frame_(new_cols, target_rows=frame.shape[0])
+        return self.add_data_frame_columns_to_data_frame_(res, new_frame)
+
+    def _sort_permutation(self, df, *, by: List[str], ascending: List[bool]):
+        """
+        Stable sort permutation of the rows of df (which must have a range index).
+        Plain numeric, boolean and datetime columns without missing values are sorted
+        with numpy.lexsort directly, other columns through Pandas sort_values().
+        """
+        keys = []
+        for c, c_ascending in zip(by, ascending):
+            v = df[c].to_numpy()
+            if (not isinstance(df[c].dtype, numpy.dtype)) or (
+                v.dtype.kind not in {"b", "i", "u", "f", "M", "m"}
+            ):
+                keys = None
+                break
+            if v.dtype.kind in {"M", "m"}:
+                if numpy.any(numpy.isnat(v)):
+                    keys = None
+                    break
+                v = v.view(numpy.int64)
+            elif (v.dtype.kind == "f") and numpy.any(numpy.isnan(v)):
+                keys = None
+                break
+            if not c_ascending:
+                v = -v if v.dtype.kind == "f" else ~v
+            keys.append(v)
+        if keys is None:
+            return df.sort_values(
+                by=by, ascending=ascending, kind="mergesort"
+            ).index.to_numpy()
+        # numpy.lexsort uses its last key as the primary key
+        return numpy.lexsort(keys[::-1])
+
+    def _windowed_extend_frame(self, op, res, *, ops, eval_state=None):
+        """
+        Compute windowed extend results in a single pass.
+        Rows are sorted once (partition columns, then order columns, then value columns) and group
+        boundaries are found once. Row numbers, group numbers, group sizes, numeric shifts and integer
+        cumulative sums are computed directly from the group boundaries; other window functions share
+        one groupby on the group number. Results are written back through the inverse of the sort
+        permutation, instead of by a second sort.
+        Returns a frame of the new columns, in the row order of res.
+        """
+        partition_cols = list(dict.fromkeys(op.partition_by))
+        for c in partition_cols:
+            if res[c].isnull().any():
+                # keep Pandas groupby semantics for missing keys
+                return self._windowed_extend_frame_by_transform(
+                    op, res, ops=ops, eval_state=eval_state
                 )
-            subframe[standin_name] = 1
-            if len(op.partition_by) > 0:
-                opframe = subframe.groupby(op.partition_by, observed=True)
-                #  Groupby preserves the order of rows within each group.
-                # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.groupby.html
-            else:
-                opframe = subframe.groupby([standin_name], observed=True)
-            # perform calculations
-            for k, opk in op.ops.items():
-                # work on a slice of the data frame
-                # Availability roughly documented in:
-                # https://github.com/WinVector/data_algebra/blob/main/Examples/Methods/data_algebra_catalog.ipynb
-                # (essentially none but _ngroup)
-                if len(opk.args) <= 0:
-                    # check for and remove initial underbar
-                    assert isinstance(opk.op, str)
-                    assert len(opk.op) > 1
-                    assert opk.op[0] == "_"
-                    zero_op = opk.op[1:]
-                    if zero_op in {"row_number", "count"}:
-                        subframe[k] = opframe.cumcount() + 1
-                    elif zero_op in {"ngroup"}:
-                        subframe[k] = opframe.ngroup()
-                    elif zero_op in {"size"}:
-                        transform_op = zero_op
-                        try:
-                            transform_op = self.transform_op_map[transform_op]
-                        except KeyError:
-                            pass
-                        subframe[k] = opframe[standin_name].transform(
-                            transform_op
-                        )  # Pandas transform, not data_algebra
-                    else:
-                        raise KeyError(
-                            "not implemented in windowed situation: "
-                            + str(k)
-                            + ": "
-                            + str(opk)
+        n_rows = res.shape[0]
+        # partition columns sort ascending, so group numbers are those of Pandas ngroup()
+        sort_cols = [c for c in partition_cols]
+        for c in op.order_by:
+            if c not in sort_cols:
+                sort_cols.append(c)
+        n_order_cols = len(sort_cols)
+        data_algebra_temp_cols = {}
+        for k, opk in ops.items():
+            # assumes all args are column names or values, enforce this earlier
+            if len(opk.args) > 0:
+                if isinstance(opk.args[0], data_algebra.expr_rep.ColumnReference):
+                    value_name = opk.args[0].column_name
+                    if value_name not in sort_cols:
+                        sort_cols.append(value_name)
+                elif isinstance(opk.args[0], data_algebra.expr_rep.Value):
+                    key = str(opk.args[0].value)
+                    if key not in data_algebra_temp_cols.keys():
+                        data_algebra_temp_cols[key] = (
+                            "data_algebra_extend_temp_col_"
+                            + str(len(data_algebra_temp_cols))
                         )
                 else:
-                    transform_args = []
-                    if len(opk.args) > 1:
-                        for i in range(1, len(opk.args)):
-                            assert isinstance(opk.args[i], data_algebra.expr_rep.Value)
-                        transform_args = [
-                            opk.args[i].value for i in range(1, len(opk.args))
-                        ]
-                    if isinstance(opk.args[0], data_algebra.expr_rep.ColumnReference):
-                        value_name = opk.args[0].column_name
-                        if value_name not in set(col_list):
-                            col_list.append(value_name)
-                        transform_op = opk.op
-                        try:
-                            transform_op = self.transform_op_map[transform_op]
-                        except KeyError:
-                            pass
-                        subframe[k] = opframe[value_name].transform(
-                            transform_op, *transform_args
-                        )  # Pandas transform, not data_algegra
-                    elif isinstance(opk.args[0], data_algebra.expr_rep.Value):
-                        value_name = data_algebra_temp_cols[str(opk.args[0].value)]
-                        transform_op = opk.op
-                        try:
-                            transform_op = self.transform_op_map[transform_op]
-                        except KeyError:
-                            pass
-                        subframe[k] = opframe[value_name].transform(
-                            transform_op, *transform_args
-                        )  # Pandas transform, not data_algegra
-                    else:
-                        raise ValueError(
-                            f"opk must be a ColumnReference or Value ({opk})"
+                    raise ValueError("opk must be a ColumnReference or Value")
+        rows = self._clean_copy(res.loc[:, sort_cols], eval_state=eval_state)
+        perm = None
+        if n_order_cols > 0:
+            partition_set = set(partition_cols)
+            reverse_set = set(op.reverse)
+            ascending = [
+                (c in partition_set) or (c not in reverse_set) for c in sort_cols
+            ]
+            # value columns only break ties, so skip them when the order is already total
+            perm = self._sort_permutation(
+                rows, by=sort_cols[:n_order_cols], ascending=ascending[:n_order_cols]
+            )
+            if len(sort_cols) > n_order_cols:
+                tied = numpy.ones(n_rows - 1, dtype=bool)
+                for c in sort_cols[:n_order_cols]:
+                    v = rows[c].to_numpy()[perm]
+                    tied &= v[1:] == v[:-1]
+                if numpy.any(tied):
+                    perm = self._sort_permutation(
+                        rows, by=sort_cols, ascending=ascending
+                    )
+            rows = rows.take(perm)
+        for k, opk in ops.items():
+            if (len(opk.args) > 0) and isinstance(
+                opk.args[0], data_algebra.expr_rep.Value
+            ):
+                rows[data_algebra_temp_cols[str(opk.args[0].value)]] = opk.args[0].value
+        # group boundaries, in sorted order
+        group_start_mark = numpy.zeros(n_rows, dtype=bool)
+        group_start_mark[0] = True
+        for c in partition_cols:
+            v = rows[c].to_numpy()
+            group_start_mark[1:] |= v[1:] != v[:-1]
+        group_starts = numpy.flatnonzero(group_start_mark)
+        group_id = numpy.cumsum(group_start_mark) - 1
+        group_sizes = numpy.diff(numpy.append(group_starts, n_rows))
+        row_group_start = group_starts[group_id]
+        row_position = numpy.arange(n_rows)
+        grouped = None
+        # perform calculations
+        new_cols = dict()
+        for k, opk in ops.items():
+            if len(opk.args) <= 0:
+                # check for and remove initial underbar
+                assert isinstance(opk.op, str)
+                assert len(opk.op) > 1
+                assert opk.op[0] == "_"
+                zero_op = opk.op[1:]
+                if zero_op in {"row_number", "count"}:
+                    new_cols[k] = row_position - row_group_start + 1
+                elif zero_op in {"ngroup"}:
+                    new_cols[k] = group_id
+                elif zero_op in {"size"}:
+                    new_cols[k] = group_sizes[group_id]
+                else:
+                    raise KeyError(
+                        "not implemented in windowed situation: "
+                        + str(k)
+                        + ": "
+                        + str(opk)
+                    )
+                continue
+            for i in range(1, len(opk.args)):
+                assert isinstance(opk.args[i], data_algebra.expr_rep.Value)
+            transform_args = [opk.args[i].value for i in range(1, len(opk.args))]
+            if isinstance(opk.args[0], data_algebra.expr_rep.ColumnReference):
+                value_name = opk.args[0].column_name
+            else:
+                value_name = data_algebra_temp_cols[str(opk.args[0].value)]
+            transform_op = self.transform_op_map.get(opk.op, opk.op)
+            col_dtype = rows[value_name].dtype
+            is_numpy_numeric = isinstance(col_dtype, numpy.dtype) and (
+                col_dtype.kind in {"i", "u", "f"}
+            )
+            if (
+                (transform_op == "cumsum")
+                and (col_dtype == numpy.int64)
+                and (len(transform_args) == 0)
+            ):
+                # integer prefix sums are exact, so restart each group by subtraction
+                v = rows[value_name].to_numpy()
+                running = numpy.cumsum(v)
+                new_cols[k] = running - (running[row_group_start] - v[row_group_start])
+                continue
+            if (
+                (transform_op == "shift")
+                and is_numpy_numeric
+                and (len(transform_args) <= 1)
+            ):
+                periods = 1 if len(transform_args) == 0 else transform_args[0]
+                if (
+                    isinstance(periods, (int, numpy.integer))
+                    and (not isinstance(periods, bool))
+                    and (periods != 0)
+                ):
+                    v = rows[value_name].to_numpy()
+                    source_position = row_position - periods
+                    in_group = (source_position >= row_group_start) & (
+                        source_position < row_group_start + group_sizes[group_id]
+                    )
+                    shifted = numpy.full(
+                        n_rows,
+                        numpy.nan,
+                        dtype=col_dtype if col_dtype.kind == "f" else numpy.float64,
+                    )
+                    shifted[in_group] = v[source_position[in_group]]
+                    new_cols[k] = shifted
+                    continue
+            if grouped is None:
+                grouped = rows.groupby(group_id, sort=False)
+            new_cols[k] = grouped[value_name].transform(
+                transform_op, *transform_args
+            )  # Pandas transform, not data_algebra
+        # copy out results, in original row order
+        inverse_perm = None
+        if perm is not None:
+            inverse_perm = numpy.empty(n_rows, dtype=numpy.int64)
+            inverse_perm[perm] = row_position
+        frame_cols = dict()
+        for k, v in new_cols.items():
+            if isinstance(v, self.pd.Series):
+                v = v.array
+            if inverse_perm is not None:
+                v = v.take(inverse_perm)
+            frame_cols[k] = v
+        return self.pd.DataFrame(frame_cols)
+
+    def _windowed_extend_frame_by_transform(self, op, res, *, ops, eval_state=None):
+        """
+        Compute windowed extend results with one Pandas groupby transform per result column.
+        Used when a partition column has missing values (which Pandas groupby drops).
+        Returns a frame of the new columns, in the row order of res.
+        """
+        data_algebra_temp_cols = {}
+        standin_name = "_data_algebra_temp_g"  # name of an arbitrary input variable
+        # build up a sub-frame to work on
+        col_list = [c for c in set(op.partition_by)]
+        col_set = set(col_list)
+        for c in op.order_by:
+            if c not in col_set:
+                col_list.append(c)
+                col_set.add(c)
+        order_cols = [c for c in col_list]  # must be partition by followed by order
+        for k, opk in ops.items():
+            # assumes all args are column names or values, enforce this earlier
+            if len(opk.args) > 0:
+                if isinstance(opk.args[0], data_algebra.expr_rep.ColumnReference):
+                    value_name = opk.args[0].column_name
+                    if value_name not in col_set:
+                        col_list.append(value_name)
+                        col_set.add(value_name)
+                elif isinstance(opk.args[0], data_algebra.expr_rep.Value):
+                    key = str(opk.args[0].value)
+                    if key not in data_algebra_temp_cols.keys():
+                        value_name = "data_algebra_extend_temp_col_" + str(
+                            len(data_algebra_temp_cols)
                         )
-            # clear some temps
-            for value_name in data_algebra_temp_cols.values():
-                del res[value_name]
-            # copy out results
-            subframe = subframe.sort_values(by=["_data_algebra_orig_index"])
-            subframe = subframe.loc[:, list(op.ops.keys())]
-            subframe = self.clean_copy(subframe)
-            res = self.add_data_frame_columns_to_data_frame_(res, subframe)
-        return res
-
-    def _project_step(self, op, *, data_map):
+                        data_algebra_temp_cols[key] = value_name
+                        col_list.append(value_name)
+                        res[value_name] = opk.args[0].value
+                else:
+                    raise ValueError("opk must be a ColumnReference or Value")
+        ascending = [c not in set(op.reverse) for c in col_list]
+        subframe = self._clean_copy(res[col_list], eval_state=eval_state)
+        subframe["_data_algebra_orig_index"] = subframe.index
+        if len(order_cols) > 0:
+            subframe = self._clean_copy(
+                subframe.sort_values(by=col_list, ascending=ascending),
+                eval_state=eval_state,
+            )
+        subframe[standin_name] = 1
+        if len(op.partition_by) > 0:
+            opframe = subframe.groupby(op.partition_by, observed=True)
+            #  Groupby preserves the order of rows within each group.
+            # https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.DataFrame.groupby.html
+        else:
+            opframe = subframe.groupby([standin_name], observed=True)
+        # perform calculations
+        for k, opk in ops.items():
+            # work on a slice of the data frame
+            # Availability roughly documented in:
+            # https://github.com/WinVector/data_algebra/blob/main/Examples/Methods/data_algebra_catalog.ipynb
+            # (essentially none but _ngroup)
+            if len(opk.args) <= 0:
+                # check for and remove initial underbar
+                assert isinstance(opk.op, str)
+                assert len(opk.op) > 1
+                assert opk.op[0] == "_"
+                zero_op = opk.op[1:]
+                if zero_op in {"row_number", "count"}:
+                    subframe[k] = opframe.cumcount() + 1
+                elif zero_op in {"ngroup"}:
+                    subframe[k] = opframe.ngroup()
+                elif zero_op in {"size"}:
+                    transform_op = zero_op
+                    try:
+                        transform_op = self.transform_op_map[transform_op]
+                    except KeyError:
+                        pass
+                    subframe[k] = opframe[standin_name].transform(
+                        transform_op
+                    )  # Pandas transform, not data_algebra
+                else:
+                    raise KeyError(
+                        "not implemented in windowed situation: "
+                        + str(k)
+                        + ": "
+                        + str(opk)
+                    )
+            else:
+                transform_args = []
+                if len(opk.args) > 1:
+                    for i in range(1, len(opk.args)):
+                        assert isinstance(opk.args[i], data_algebra.expr_rep.Value)
+                    transform_args = [
+                        opk.args[i].value for i in range(1, len(opk.args))
+                    ]
+                if isinstance(opk.args[0], data_algebra.expr_rep.ColumnReference):
+                    value_name = opk.args[0].column_name
+                    if value_name not in set(col_list):
+                        col_list.append(value_name)
+                    transform_op = opk.op
+                    try:
+                        transform_op = self.transform_op_map[transform_op]
+                    except KeyError:
+                        pass
+                    subframe[k] = opframe[value_name].transform(
+                        transform_op, *transform_args
+                    )  # Pandas transform, not data_algegra
+                elif isinstance(opk.args[0], data_algebra.expr_rep.Value):
+                    value_name = data_algebra_temp_cols[str(opk.args[0].value)]
+                    transform_op = opk.op
+                    try:
+                        transform_op = self.transform_op_map[transform_op]
+                    except KeyError:
+                        pass
+                    subframe[k] = opframe[value_name].transform(
+                        transform_op, *transform_args
+                    )  # Pandas transform, not data_algegra
+                else:
+                    raise ValueError(f"opk must be a ColumnReference or Value ({opk})")
+        # clear some temps
+        for value_name in data_algebra_temp_cols.values():
+            del res[value_name]
+        # copy out results
+        subframe = subframe.sort_values(by=["_data_algebra_orig_index"])
+        subframe = subframe.loc[:, list(ops.keys())]
+        subframe = self._clean_copy(subframe, eval_state=eval_state)
+        return subframe
+
+    def _project_step(self, op, *, data_map, eval_state=None):
         """
         Execute a project step, returning a data frame.
         """
@@ -829,8 +2051,12 @@ class PandasModelBase(
         # try the following tutorial:
         # https://www.shanelynn.ie/summarising-aggregation-and-grouping-data-in-python-pandas/
         data_algebra_temp_cols = {}
-        res = self._eval_value_source(op.sources[0], data_map=data_map)
-        for k, opk in op.ops.items():
+        res = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
+        # only compute results later steps use
+        ops = self._ops_needed(op, eval_state)
+        for k, opk in ops.items():
             if len(opk.args) > 1:
                 raise ValueError(
                     "non-trivial aggregation expression: " + str(k) + ": " + str(opk)
@@ -853,45 +2079,45 @@ class PandasModelBase(
                         + ": "
                         + str(opk)
                     )
-        res["_data_table_temp_col"] = 1
         if len(op.group_by) > 0:
-            res = res.groupby(op.group_by, observed=True)
-        if len(op.ops) > 0:
-            cols = {}
-            for k, opk in op.ops.items():
-                value_name = None
-                if len(opk.args) > 0:
-                    value_name = str(opk.args[0])
-                    if isinstance(opk.args[0], data_algebra.expr_rep.Value):
-                        value_name = data_algebra_temp_cols[value_name]
-                transform_op = opk.op
-                if len(opk.args) > 0:
-                    transform_op = opk.op
-                    try:
-                        transform_op = self.transform_op_map[transform_op]
-                    except KeyError:
-                        pass
-                    vk = res[value_name].agg(transform_op)
-                else:
-                    # expect and strip off initial underbar
-                    assert isinstance(transform_op, str)
-                    assert len(transform_op) > 1
-                    assert transform_op[0] == "_"
-                    transform_op = transform_op[1:]
-                    try:
-                        transform_op = self.transform_op_map[transform_op]
-                    except KeyError:
-                        pass
-                    vk = res["_data_table_temp_col"].agg(transform_op)
-                cols[k] = vk
+            res = self._grouped_project_frame(
+                op, res, ops=ops, data_algebra_temp_cols=data_algebra_temp_cols
+            )
         else:
-            cols = {"_data_table_temp_col": res["_data_table_temp_col"].agg("sum")}
-        # agg can return scalars, which then can't be made into a self.pd.DataFrame
-        res = self.columns_to_frame_(cols)
-        res = res.reset_index(
-            drop=(len(op.group_by) < 1) or (res.shape[0] <= 0),
-            inplace=False,
-        )  # grouping variables in the index
+            res["_data_table_temp_col"] = 1
+            if len(ops) > 0:
+                cols = {}
+                for k, opk in ops.items():
+                    value_name = None
+                    if len(opk.args) > 0:
+                        value_name = str(opk.args[0])
+                        if isinstance(opk.args[0], data_algebra.expr_rep.Value):
+                            value_name = data_algebra_temp_cols[value_name]
+                    transform_op = opk.op
+                    if len(opk.args) > 0:
+                        transform_op = opk.op
+                        try:
+                            transform_op = self.transform_op_map[transform_op]
+                        except KeyError:
+                            pass
+                        vk = res[value_name].agg(transform_op)
+                    else:
+                        # expect and strip off initial underbar
+                        assert isinstance(transform_op, str)
+                        assert len(transform_op) > 1
+                        assert transform_op[0] == "_"
+                        transform_op = transform_op[1:]
+                        try:
+                            transform_op = self.transform_op_map[transform_op]
+                        except KeyError:
+                            pass
+                        vk = res["_data_table_temp_col"].agg(transform_op)
+                    cols[k] = vk
+            else:
+                cols = {"_data_table_temp_col": res["_data_table_temp_col"].agg("sum")}
+            # agg can return scalars, which then can't be made into a self.pd.DataFrame
+            res = self.columns_to_frame_(cols)
+            res = res.reset_index(drop=True, inplace=False)
         missing_group_cols = set(op.group_by) - set(res.columns)
         if res.shape[0] > 0:
             if len(missing_group_cols) != 0:
@@ -901,12 +2127,58 @@ class PandasModelBase(
                 res[g] = []
         if "_data_table_temp_col" in res.columns:
             res = res.drop("_data_table_temp_col", axis=1, inplace=False)
-        # double check shape is what we expect
-        if not self.table_is_keyed_by_columns(res, column_names=op.group_by):
-            raise ValueError("result wasn't keyed by group_by columns")
+        # result is keyed by group_by columns by construction (one row per group)
         return res
 
-    def _select_rows_step(self, op, *, data_map):
+    def _grouped_project_frame(self, op, res, *, ops, data_algebra_temp_cols):
+        """
+        Aggregate res by op.group_by. The grouping is computed once, and each distinct
+        aggregation function is applied to all of its value columns in one call.
+        Returns the aggregated frame with the grouping columns restored from the index.
+        """
+        if (len(ops) <= 0) or any([len(opk.args) <= 0 for opk in ops.values()]):
+            res["_data_table_temp_col"] = 1
+        agg_spec = dict()  # result name to (value column, aggregation function)
+        for k, opk in ops.items():
+            if len(opk.args) > 0:
+                value_name = str(opk.args[0])
+                if isinstance(opk.args[0], data_algebra.expr_rep.Value):
+                    value_name = data_algebra_temp_cols[value_name]
+                transform_op = opk.op
+            else:
+                # expect and strip off initial underbar
+                value_name = "_data_table_temp_col"
+                assert isinstance(opk.op, str)
+                assert len(opk.op) > 1
+                assert opk.op[0] == "_"
+                transform_op = opk.op[1:]
+            try:
+                transform_op = self.transform_op_map[transform_op]
+            except KeyError:
+                pass
+            agg_spec[k] = (value_name, transform_op)
+        if len(agg_spec) <= 0:
+            agg_spec["_data_table_temp_col"] = ("_data_table_temp_col", "sum")
+        value_names_by_fn = dict()
+        for value_name, transform_op in agg_spec.values():
+            value_names = value_names_by_fn.setdefault(transform_op, [])
+            if value_name not in value_names:
+                value_names.append(value_name)
+        grouped = res.groupby(op.group_by, observed=True)
+        aggregated = dict()
+        for transform_op, value_names in value_names_by_fn.items():
+            block = grouped[value_names].agg(transform_op)
+            for value_name in value_names:
+                if isinstance(block, self.pd.Series):
+                    aggregated[(value_name, transform_op)] = block  # such as size
+                else:
+                    aggregated[(value_name, transform_op)] = block[value_name]
+        res = self.pd.DataFrame({k: aggregated[v] for k, v in agg_spec.items()})
+        return res.reset_index(
+            drop=res.shape[0] <= 0, inplace=False
+        )  # grouping variables in the index
+
+    def _select_rows_step(self, op, *, data_map, eval_state=None):
         """
         Execute a select rows step, returning a data frame.
         """
@@ -914,14 +2186,22 @@ class PandasModelBase(
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.SelectRowsNode"
             )
-        res = self._eval_value_source(op.sources[0], data_map=data_map)
+        res = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
         if res.shape[0] < 1:
             return res
-        selection = op.expr.act_on(res, expr_walker=self)
-        res = self.clean_copy(res.loc[selection, :])
+        stages = self._common_subexpression_stages(op, op.ops)
+        work = res
+        if len(stages) > 1:
+            work = res.copy(deep=False)
+            for stage in stages[:-1]:
+                work = self._add_term_columns(stage, work)
+        selection = self._act_on_term(stages[-1]["expr"], work)
+        res = self._clean_copy(res.loc[selection, :], eval_state=eval_state)
         return res
 
-    def _select_columns_step(self, op, *, data_map):
+    def _select_columns_step(self, op, *, data_map, eval_state=None):
         """
         Execute a select columns step, returning a data frame.
         """
@@ -929,10 +2209,12 @@ class PandasModelBase(
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.SelectColumnsNode"
             )
-        res = self._eval_value_source(op.sources[0], data_map=data_map)
-        return res[op.column_selection]
+        res = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
+        return res[data_algebra.eval_state.columns_wanted(op, eval_state)]
 
-    def _drop_columns_step(self, op, *, data_map):
+    def _drop_columns_step(self, op, *, data_map, eval_state=None):
         """
         Execute a drop columns step, returning a data frame.
         """
@@ -940,11 +2222,38 @@ class PandasModelBase(
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.DropColumnsNode"
             )
-        res = self._eval_value_source(op.sources[0], data_map=data_map)
+        res = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
         column_selection = [c for c in res.columns if c not in op.column_deletions]
         return res[column_selection]
 
-    def _order_rows_step(self, op, *, data_map):
+    def _top_k_candidates(self, res, *, column: str, ascending: bool, k: int):
+        """
+        Rows of res that can be among the first k after sorting with column as the
+        first sort key, found by partial selection. Rows keep their original order.
+        Returns res if the column's type is not supported, or there are fewer than k
+        non-null values (nulls sort last).
+        """
+        values = res[column]
+        if self.pd.api.types.is_bool_dtype(values.dtype) or not (
+            self.pd.api.types.is_numeric_dtype(values.dtype)
+            or self.pd.api.types.is_datetime64_any_dtype(values.dtype)
+        ):
+            return res
+        if ascending:
+            survivors = values.nsmallest(k, keep="all")
+        else:
+            survivors = values.nlargest(k, keep="all")
+        if survivors.count() < k:
+            return res  # nulls are among the first k
+        if ascending:
+            keep = values <= survivors.max()
+        else:
+            keep = values >= survivors.min()
+        return res.loc[keep.to_numpy(dtype=bool, na_value=False), :]
+
+    def _order_rows_step(self, op, *, data_map, eval_state=None):
         """
         Execute an order rows step, returning a data frame.
         """
@@ -952,23 +2261,38 @@ class PandasModelBase(
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.OrderRowsNode"
             )
-        res = self._eval_value_source(op.sources[0], data_map=data_map)
+        res = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
         if res.shape[0] > 1:
             ascending = [
                 False if ci in set(op.reverse) else True for ci in op.order_columns
             ]
+            if (
+                (op.limit is not None)
+                and (op.limit > 0)
+                and (op.limit * 10 <= res.shape[0])
+            ):
+                res = self._top_k_candidates(
+                    res,
+                    column=op.order_columns[0],
+                    ascending=ascending[0],
+                    k=op.limit,
+                )
             res = res.sort_values(
                 by=op.order_columns,
                 ascending=ascending,
                 ignore_index=True,
                 inplace=False,
+                # stable, so ties break the same way with or without the top-k filter
+                kind="quicksort" if op.limit is None else "stable",
             )
             self.drop_indices(res)
         if (op.limit is not None) and (res.shape[0] > op.limit):
-            res = self.clean_copy(res.iloc[range(op.limit), :])
+            res = self._clean_copy(res.iloc[range(op.limit), :], eval_state=eval_state)
         return res
 
-    def _map_columns_step(self, op, *, data_map):
+    def _map_columns_step(self, op, *, data_map, eval_state=None):
         """
         Execute a map columns step, returning a data frame.
         """
@@ -976,14 +2300,16 @@ class PandasModelBase(
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.MapColumnsNode"
             )
-        res = self._eval_value_source(op.sources[0], data_map=data_map)
+        res = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
         res = res.rename(columns=op.column_remapping)
         if (op.column_deletions is not None) and (len(op.column_deletions) > 0):
             column_selection = [c for c in res.columns if c not in op.column_deletions]
             res = res[column_selection]
         return res
 
-    def _rename_columns_step(self, op, *, data_map):
+    def _rename_columns_step(self, op, *, data_map, eval_state=None):
         """
         Execute a rename columns step, returning a data frame.
         """
@@ -991,7 +2317,9 @@ class PandasModelBase(
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.RenameColumnsNode"
             )
-        res = self._eval_value_source(op.sources[0], data_map=data_map)
+        res = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
         return res.rename(columns=op.reverse_mapping)
 
     # noinspection PyMethodMayBeStatic
@@ -1011,7 +2339,97 @@ class PandasModelBase(
             pass
         return jointype
 
-    def _natural_join_step(self, op, *, data_map):
+    def _join_key_fingerprint(self, frame, key_columns: List[str]):
+        """
+        Version information for the key columns of frame: shape, column buffer identities,
+        and a checksum of the key values (so keys altered in place are not looked up in a stale
+        index). The checksum is over the column buffer, which for object columns holds
+        references to the (immutable) key values, so it costs much less than re-building.
+        """
+        tokens = []
+        for c in key_columns:
+            v = frame[c].values
+            if isinstance(v, numpy.ndarray):
+                tokens.append(
+                    (
+                        v.__array_interface__["data"][0],
+                        v.strides,
+                        v.dtype.str,
+                        zlib.crc32(memoryview(numpy.ascontiguousarray(v))),
+                    )
+                )
+            else:
+                tokens.append(id(v))
+        return (frame.shape, tuple(tokens))
+
+    def _build_join_index(self, frame, key_columns: List[str]):
+        """
+        Build a hash index over the key columns of frame.
+
+        :return: (index, size in bytes)
+        """
+        if len(key_columns) == 1:
+            index = self.pd.Index(frame[key_columns[0]])
+        else:
+            index = self.pd.MultiIndex.from_arrays([frame[c] for c in key_columns])
+        index.is_unique  # populate the hash table, so its size is counted
+        return index, index.memory_usage(deep=False)
+
+    def _join_by_cached_index(self, op, *, left, right, data_map):
+        """
+        Left join through a cached hash index of the right table's join keys.
+        Applies when the right source is a table (so the index survives between evaluations)
+        with unique, plain typed keys. Inner joins are left to pd.merge(), as its row order
+        for them (grouped by key in some Pandas versions) is not the left table's.
+
+        :return: None if not applicable, else joined frame laid out as pd.merge() would lay it out.
+        """
+        jointype = self.standardize_join_code_(op.jointype)
+        if (jointype != "left") or (len(op.on_a) <= 0):
+            return None
+        source = op.sources[1]
+        if source.node_name != "TableDescription":
+            return None
+        if (data_map is not None) and (len(data_map) > 0):
+            frame = data_map[source.table_name]
+        else:
+            frame = source.head
+        if frame.shape[0] != right.shape[0]:
+            return None
+        for c in op.on_a:
+            if not isinstance(left[c].dtype, numpy.dtype):
+                return None
+        for c in op.on_b:
+            if not isinstance(frame[c].dtype, numpy.dtype):
+                return None
+        on_b = list(op.on_b)
+        index = self.join_index_cache.get(
+            frame,
+            on_b,
+            fingerprint=self._join_key_fingerprint(frame, on_b),
+            build=lambda: self._build_join_index(frame, on_b),
+        )
+        if not index.is_unique:
+            return None
+        if len(op.on_a) == 1:
+            left_keys = self.pd.Index(left[op.on_a[0]])
+        else:
+            left_keys = self.pd.MultiIndex.from_arrays([left[c] for c in op.on_a])
+        positions = index.get_indexer(left_keys)
+        # right columns, named as pd.merge() names them
+        merged_keys = set([a for a, b in zip(op.on_a, op.on_b) if a == b])
+        left_cols = set(left.columns)
+        right_cols = dict()
+        for c in right.columns:
+            if c in merged_keys:
+                continue
+            right_name = c + "_tmp_right_col" if c in left_cols else c
+            right_cols[right_name] = right[c].array.take(positions, allow_fill=True)
+        if len(right_cols) <= 0:
+            return left
+        return self.pd.concat([left, self.pd.DataFrame(right_cols)], axis=1)
+
+    def _natural_join_step(self, op, *, data_map, eval_state=None):
         """
         Execute a natural join step, returning a data frame.
         """
@@ -1019,8 +2437,12 @@ class PandasModelBase(
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.NaturalJoinNode"
             )
-        left = self._eval_value_source(op.sources[0], data_map=data_map)
-        right = self._eval_value_source(op.sources[1], data_map=data_map)
+        left = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
+        right = self._eval_value_source(
+            op.sources[1], data_map=data_map, eval_state=eval_state
+        )
         if (left.shape[0] == 0) and (right.shape[0] == 0):
             # pandas seems to not like this case
             return self.pd.DataFrame({k: [] for k in op.columns_produced()})
@@ -1032,38 +2454,54 @@ class PandasModelBase(
         )
         if type_checks is not None:
             raise ValueError(f"join: incompatible column types: {type_checks}")
-        on_a = op.on_a
-        on_b = op.on_b
-        scratch_col = None  # extra column to prevent empty-on issues
-        if len(on_a) <= 0:
-            scratch_col = "data_algebra_temp_merge_col"
-            on_a = [scratch_col]
-            on_b = [scratch_col]
-            left[scratch_col] = 1
-            right[scratch_col] = 1
-        # noinspection PyUnresolvedReferences
-        res = self.pd.merge(
-            left=left,
-            right=right,
-            how=self.standardize_join_code_(op.jointype),
-            left_on=on_a,
-            right_on=on_b,
-            sort=False,
-            suffixes=("", "_tmp_right_col"),
-        )
-        self.drop_indices(res)
-        if scratch_col is not None:
-            del res[scratch_col]
+        res = None
+        if self.join_index_cache is not None:
+            res = self._join_by_cached_index(
+                op, left=left, right=right, data_map=data_map
+            )
+        if res is None:
+            on_a = op.on_a
+            on_b = op.on_b
+            scratch_col = None  # extra column to prevent empty-on issues
+            if len(on_a) <= 0:
+                scratch_col = "data_algebra_temp_merge_col"
+                on_a = [scratch_col]
+                on_b = [scratch_col]
+                left[scratch_col] = 1
+                right[scratch_col] = 1
+            # noinspection PyUnresolvedReferences
+            res = self.pd.merge(
+                left=left,
+                right=right,
+                how=self.standardize_join_code_(op.jointype),
+                left_on=on_a,
+                right_on=on_b,
+                sort=False,
+                suffixes=("", "_tmp_right_col"),
+            )
+            self.drop_indices(res)
+            if scratch_col is not None:
+                del res[scratch_col]
         on_a_set = set(op.on_a)
-        for c in common_cols:
-            if c not in on_a_set:
+        coalesce_cols = [
+            c for c in res.columns if (c in common_cols) and (c not in on_a_set)
+        ]
+        if len(coalesce_cols) > 0:
+            # coalesce all overlapping columns, then drop all of the right copies at once
+            coalesced = dict()
+            for c in coalesce_cols:
                 is_null = res[c].isnull()
-                res.loc[is_null, c] = res.loc[is_null, c + "_tmp_right_col"]
-                res = res.drop(c + "_tmp_right_col", axis=1, inplace=False)
+                if is_null.any():
+                    coalesced[c] = res[c].where(~is_null, res[c + "_tmp_right_col"])
+            res = res.drop(
+                [c + "_tmp_right_col" for c in coalesce_cols], axis=1, inplace=False
+            )
+            for c, v in coalesced.items():
+                res[c] = v
         self.drop_indices(res)
         return res
 
-    def _concat_rows_step(self, op, *, data_map):
+    def _concat_rows_step(self, op, *, data_map, eval_state=None):
         """
         Execute a concat rows step, returning a data frame.
         """
@@ -1071,8 +2509,12 @@ class PandasModelBase(
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.ConcatRowsNode"
             )
-        left = self._eval_value_source(op.sources[0], data_map=data_map)
-        right = self._eval_value_source(op.sources[1], data_map=data_map)
+        left = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
+        right = self._eval_value_source(
+            op.sources[1], data_map=data_map, eval_state=eval_state
+        )
         if op.id_column is not None:
             if left.shape[0] > 0:
                 left[op.id_column] = op.a_name
@@ -1094,7 +2536,7 @@ class PandasModelBase(
         self.drop_indices(res)
         return res
 
-    def _convert_records_step(self, op, *, data_map):
+    def _convert_records_step(self, op, *, data_map, eval_state=None):
         """
         Execute record conversion step, returning a data frame.
         """
@@ -1102,7 +2544,12 @@ class PandasModelBase(
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.ConvertRecordsNode"
             )
-        res = self._eval_value_source(op.sources[0], data_map=data_map)
+        res = self._eval_value_source(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
+        if (eval_state is not None) and (not self.copy_on_write_enabled()):
+            # transform() copies its input (deferred under copy on write)
+            eval_state.note_copy(self.frame_bytes(res))
         return op.record_map.transform(res, local_data_model=self)
 
     # cdata record conversion steps
@@ -1126,8 +2573,10 @@ class PandasModelBase(
         # table must be keyed by record_keys + control_table_keys
         if data.shape[0] < 1:
             return self.pd.DataFrame({c: [] for c in blocks_in.row_columns})
-        if not self.table_is_keyed_by_columns(
-            data, column_names=blocks_in.record_keys + blocks_in.control_table_keys
+        if (not self.use_trusted_keys) and (
+            not self.table_is_keyed_by_columns(
+                data, column_names=blocks_in.record_keys + blocks_in.control_table_keys
+            )
         ):
             raise ValueError(
                 "table is not keyed by blocks_in.record_keys + blocks_in.control_table_keys"
@@ -1212,8 +2661,10 @@ class PandasModelBase(
         assert set(data.columns) == set(blocks_out.row_columns)
         if data.shape[0] < 1:
             return self.pd.DataFrame({c: [] for c in blocks_out.block_columns})
-        if not self.table_is_keyed_by_columns(
-            data, column_names=blocks_out.record_keys
+        if (not self.use_trusted_keys) and (
+            not self.table_is_keyed_by_columns(
+                data, column_names=blocks_out.record_keys
+            )
         ):
             raise ValueError("table is not keyed by blocks_out.record_keys")
         ct = self.data_frame(blocks_out.control_table)
@@ -1265,6 +2716,176 @@ class PandasModelBase(
 
     # expression helpers
 
+    def _compile_term(self, term) -> Tuple[Callable, Optional[Callable]]:
+        """
+        Resolve the implementations of an expression's operators once, in the same
+        order as act_on_expression(). Closures do not refer to term itself, so cached
+        plans do not keep expressions alive.
+
+        :param term: data_algebra.expr_rep.PreTerm to compile
+        :return: function of data frame, function of dictionary of numpy arrays (or None)
+        """
+        if isinstance(term, data_algebra.expr_rep.Value):
+            value = term.value
+
+            def value_fn(_):
+                return value
+
+            return value_fn, value_fn
+        if isinstance(term, data_algebra.expr_rep.ColumnReference):
+            column_name = term.column_name
+
+            def column_fn(cols):
+                return cols[column_name]
+
+            return column_fn, column_fn
+        if not isinstance(term, data_algebra.expr_rep.Expression):
+            term_ref = weakref.ref(term)
+
+            def walk_fn(frame):
+                return term_ref().act_on(frame, expr_walker=self)
+
+            return walk_fn, None
+        op_name = term.op
+        sub_plans = [self._compile_term(ai) for ai in term.args]
+        series_fns = [sp[0] for sp in sub_plans]
+        array_fns = [sp[1] for sp in sub_plans]
+        array_safe = all([afn is not None for afn in array_fns])
+        fn = self.user_fun_map.get(op_name, None)
+        if fn is not None:
+            array_safe = False
+        else:
+            fn = self.impl_map.get(op_name, None)
+            if fn is not None:
+                array_safe = array_safe and (op_name in _array_safe_impl_ops)
+        if fn is None:
+            numpy_fn = numpy.__dict__.get(op_name, None)
+            if not callable(numpy_fn):
+                numpy_fn = None
+            if len(term.args) == 0:
+                if op_name not in ["uniform", "_uniform"]:
+                    raise KeyError(f"zero-argument function {op_name} not found")
+
+                def uniform_fn(frame):
+                    return numpy.random.uniform(size=frame.shape[0])
+
+                return uniform_fn, None
+
+            def fn(*values):
+                # as in act_on_expression(), prefer a method of the first argument
+                method = getattr(values[0], op_name, None)
+                if callable(method):
+                    return method(*values[1:])
+                if numpy_fn is None:
+                    raise KeyError(f"function {op_name} not found")
+                return numpy_fn(*values)
+
+            array_safe = array_safe and (op_name in _array_safe_numpy_ops)
+            if array_safe:
+                array_op = numpy_fn
+        else:
+            array_op = fn
+
+        def series_fn(frame):
+            return fn(*[sfn(frame) for sfn in series_fns])
+
+        if not array_safe:
+            return series_fn, None
+
+        def array_fn(cols):
+            return array_op(*[afn(cols) for afn in array_fns])
+
+        return series_fn, array_fn
+
+    def _term_plan(self, term) -> TermPlan:
+        """
+        Get compiled plan for an expression, compiling and caching it if needed.
+
+        :param term: data_algebra.expr_rep.PreTerm to compile
+        :return: TermPlan
+        """
+        key = id(term)
+        with self._plans_lock:
+            if self.user_fun_map != self._term_plans_user_fun_map:
+                # resolution may have changed
+                self._term_plans.clear()
+                self._term_plans_user_fun_map = self.user_fun_map.copy()
+            compiled_under = self._term_plans_user_fun_map
+            try:
+                term_ref, plan = self._term_plans[key]
+                if term_ref() is term:
+                    return plan
+            except KeyError:
+                pass
+        series_fn, array_fn = self._compile_term(term)
+        columns_used = set()
+        term.get_column_names(columns_used)
+        plan = TermPlan(
+            series_fn=series_fn,
+            array_fn=array_fn,
+            column_names=tuple(sorted(columns_used)),
+        )
+        # drop the plan when the expression is collected, so a recycled id() can not match it
+        model_ref = weakref.ref(self)
+
+        def _on_term_collected(_, *, model_ref=model_ref, key=key):
+            model = model_ref()
+            if model is not None:
+                with model._plans_lock:
+                    model._term_plans.pop(key, None)
+
+        with self._plans_lock:
+            if self._term_plans_user_fun_map is compiled_under:
+                self._term_plans[key] = (weakref.ref(term, _on_term_collected), plan)
+        return plan
+
+    def _act_on_columns(self, term, cols, *, index) -> Tuple[bool, Any]:
+        """
+        Evaluate an expression without going through a data frame, if possible.
+        Large enough inputs use one numexpr evaluation of the whole expression.
+        Otherwise the expression's compiled plan is applied directly to numpy arrays,
+        when all columns it uses are numeric.
+
+        :param term: data_algebra.expr_rep.PreTerm to evaluate
+        :param cols: data frame, or dictionary of Series sharing index
+        :param index: row index of cols
+        :return: (True, result) if evaluated, else (False, None)
+        """
+        n_rows = len(index)
+        if self.use_numexpr and (n_rows >= self.numexpr_min_rows):
+            res = data_algebra.numexpr_eval.evaluate_expression(term, cols)
+            if res is not None:
+                return True, self.pd.Series(res, index=index, copy=False)
+        plan = self._term_plan(term)
+        if plan.array_fn is None:
+            return False, None
+        used = {c: cols[c] for c in plan.column_names}
+        if not all(
+            [
+                isinstance(v.dtype, numpy.dtype) and (v.dtype.kind in "biuf")
+                for v in used.values()
+            ]
+        ):
+            return False, None
+        with numpy.errstate(all="ignore"):
+            res = plan.array_fn({c: v.to_numpy() for c, v in used.items()})
+        if isinstance(res, numpy.ndarray) and (res.shape == (n_rows,)):
+            res = self.pd.Series(res, index=index, copy=False)
+        return True, res
+
+    def _act_on_term(self, term, frame):
+        """
+        Evaluate an expression over a data frame, using its cached compiled plan.
+
+        :param term: data_algebra.expr_rep.PreTerm to evaluate
+        :param frame: data frame to evaluate over
+        :return: result
+        """
+        evaluated, res = self._act_on_columns(term, frame, index=frame.index)
+        if evaluated:
+            return res
+        return self._term_plan(term).series_fn(frame)
+
     def act_on_literal(self, *, value):
         """
         Action for a literal/constant in an expression.
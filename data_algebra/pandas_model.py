@@ -2,6 +2,7 @@
 Adapter for Pandas API.
 """
 
+import functools
 from typing import Optional
 import pandas as pd
 
@@ -13,10 +14,73 @@ from data_algebra.pandas_base import PandasModelBase
 class PandasModel(PandasModelBase):
     """
     Realize the data algebra over pandas.
+    Steps copy the frames they alter, so results never share column buffers with inputs. Under
+    Pandas copy on write (pd.set_option("mode.copy_on_write", True) for the whole session, always
+    on from Pandas 3.0) these copies are deferred, and as steps only add, replace or delete
+    columns they are never made. profile_eval() reports the bytes copied.
     """
 
-    def __init__(self):
-        PandasModelBase.__init__(self, pd=pd, presentation_model_name="pd")
+    def __init__(
+        self,
+        *,
+        use_trusted_keys: bool = False,
+        join_index_cache_bytes: int = 0,
+        use_numexpr: bool = False,
+        numexpr_min_rows: int = 10000,
+        max_branch_workers: int = 1,
+        spill_budget_bytes: int = 0,
+        spill_directory: Optional[str] = None,
+    ):
+        """
+        :param use_trusted_keys: if True skip checking that record transform inputs are keyed by
+                                 their record keys (for production runs on known-good data).
+        :param join_index_cache_bytes: if positive, memory budget for hash indexes of join keys of
+                                       tables joined on the right, reused across evaluations
+                                       (keys altered in place are detected by a checksum, and
+                                       the index is re-built).
+        :param use_numexpr: if True (and numexpr is installed) evaluate arithmetic, comparison,
+                            logical and math expressions as single numexpr calls.
+        :param numexpr_min_rows: smallest number of rows to use numexpr for.
+        :param max_branch_workers: if greater than 1, number of threads to evaluate independent
+                                   parts of the operator DAG (branches of joins and row
+                                   concatenations, shared results) on concurrently.
+        :param spill_budget_bytes: if positive, memory budget for intermediate results held for
+                                   later consumers in an evaluation, results beyond it are spilled
+                                   to local Arrow IPC (or pickle) files and read back when used.
+        :param spill_directory: where to write spill files, default is the system temporary directory.
+        """
+        PandasModelBase.__init__(
+            self,
+            pd=pd,
+            presentation_model_name="pd",
+            use_trusted_keys=use_trusted_keys,
+            join_index_cache_bytes=join_index_cache_bytes,
+            use_numexpr=use_numexpr,
+            numexpr_min_rows=numexpr_min_rows,
+            max_branch_workers=max_branch_workers,
+            spill_budget_bytes=spill_budget_bytes,
+            spill_directory=spill_directory,
+        )
+
+    def __reduce__(self):
+        # rebuilt from its settings when sent to other processes, caches
+        # and user_fun_map are not carried over
+        join_index_cache_bytes = 0
+        if self.join_index_cache is not None:
+            join_index_cache_bytes = self.join_index_cache.max_bytes
+        return (
+            functools.partial(
+                PandasModel,
+                use_trusted_keys=self.use_trusted_keys,
+                join_index_cache_bytes=join_index_cache_bytes,
+                use_numexpr=self.use_numexpr,
+                numexpr_min_rows=self.numexpr_min_rows,
+                max_branch_workers=self.max_branch_workers,
+                spill_budget_bytes=self.spill_budget_bytes,
+                spill_directory=self.spill_directory,
+            ),
+            (),
+        )
 
 
 def register_pandas_model(key: Optional[str] = None):
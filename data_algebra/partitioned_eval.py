@@ -0,0 +1,181 @@
+"""
+Planning evaluation of operator DAGs over hash partitions of their inputs.
+"""
+
+from typing import AbstractSet, Dict, Iterable, List, Optional
+
+import data_algebra.eval_state
+import data_algebra.expr_rep
+
+# functions whose windowed values depend only on the rows of their window
+_fn_names_that_are_window_local = (
+    data_algebra.expr_rep.fn_names_that_imply_windowed_situation.union(
+        data_algebra.expr_rep.fn_names_that_imply_ordered_windowed_situation
+    )
+    .union(data_algebra.expr_rep.fn_names_that_are_row_local)
+    .difference({"ngroup", "_ngroup"})  # group numbers count all windows
+)
+
+
+def _is_window_local_expression(term, excluded_fn_names: AbstractSet[str]) -> bool:
+    if isinstance(term, data_algebra.expr_rep.Expression):
+        if (term.op not in _fn_names_that_are_window_local) or (
+            term.op in excluded_fn_names
+        ):
+            return False
+        return all(
+            [_is_window_local_expression(a, excluded_fn_names) for a in term.args]
+        )
+    return True
+
+
+def _key_is_consistent(
+    node,
+    key: List[str],
+    checked: Dict[int, bool],
+    excluded_fn_names: AbstractSet[str],
+) -> bool:
+    node_id = id(node)
+    if node_id in checked.keys():
+        return checked[node_id]
+    key_set = set(key)
+    name = node.node_name
+    if name == "TableDescription":
+        ok = key_set.issubset(node.column_names)
+    elif name == "SelectRowsNode":
+        ok = data_algebra.eval_state.is_row_local_step(
+            node, excluded_fn_names=excluded_fn_names
+        )
+    elif name == "SelectColumnsNode":
+        ok = key_set.issubset(node.column_selection)
+    elif name == "DropColumnsNode":
+        ok = len(key_set.intersection(node.column_deletions)) == 0
+    elif name in {"RenameColumnsNode", "MapColumnsNode"}:
+        ok = (
+            len(key_set.intersection(node.column_remapping.keys())) == 0
+            and len(key_set.intersection(node.column_remapping.values())) == 0
+        )
+    elif name == "ExtendNode":
+        ok = len(key_set.intersection(node.ops.keys())) == 0
+        if ok and node.windowed_situation:
+            # each window must fall entirely within one partition
+            ok = key_set.issubset(node.partition_by) and all(
+                [
+                    _is_window_local_expression(term, excluded_fn_names)
+                    for term in node.ops.values()
+                ]
+            )
+        elif ok:
+            ok = data_algebra.eval_state.is_row_local_step(
+                node, excluded_fn_names=excluded_fn_names
+            )
+    elif name == "ProjectNode":
+        ok = key_set.issubset(node.group_by)
+    elif name == "OrderRowsNode":
+        ok = node.limit is None
+    elif name == "NaturalJoinNode":
+        # rows match only if keys are equal, so matches land in the same partition
+        ok = all(
+            [(k in node.on_a) and (node.on_b[node.on_a.index(k)] == k) for k in key]
+        )
+    elif name == "ConcatRowsNode":
+        ok = (node.id_column is None) or (node.id_column not in key_set)
+    elif name == "ConvertRecordsNode":
+        ok = True
+        for blocks in [node.record_map.blocks_in, node.record_map.blocks_out]:
+            if blocks is not None:
+                ok = ok and key_set.issubset(blocks.record_keys)
+    else:
+        ok = False
+    if ok:
+        for s in node.sources:
+            if not _key_is_consistent(s, key, checked, excluded_fn_names):
+                ok = False
+                break
+    checked[node_id] = ok
+    return ok
+
+
+def key_is_consistent(
+    op, key: Iterable[str], *, excluded_fn_names: Iterable[str] = ()
+) -> bool:
+    """
+    Return True if op's result is the concatenation of its results on partitions of
+    its tables, when rows are assigned to partitions by their values of key columns.
+    Extends and row selections must be row-local (windowed extends may also use
+    window functions, other than ngroup), as whole-column functions see only one partition.
+
+    :param op: operator DAG to check
+    :param key: partition key column names
+    :param excluded_fn_names: function names to treat as not row-local (such as user functions)
+    :return: True if op can be evaluated partition by partition
+    """
+    key = list(key)
+    if len(key) < 1:
+        return False
+    return _key_is_consistent(op, key, dict(), set(excluded_fn_names))
+
+
+def find_partition_key(
+    op, *, excluded_fn_names: Iterable[str] = ()
+) -> Optional[List[str]]:
+    """
+    Find a column to hash-partition op's tables on, taken from window partitions,
+    aggregation groupings and join keys in op.
+
+    :param op: operator DAG to plan
+    :param excluded_fn_names: function names to treat as not row-local (such as user functions)
+    :return: partition key column names, or None if there is no consistent key
+    """
+    candidates = []
+
+    def visit(node):
+        name = node.node_name
+        if name == "ExtendNode":
+            candidates.extend(node.partition_by)
+        elif name == "ProjectNode":
+            candidates.extend(node.group_by)
+        elif name == "NaturalJoinNode":
+            candidates.extend([k for k in node.on_a if k in node.on_b])
+        for s in node.sources:
+            visit(s)
+
+    visit(op)
+    seen = set()
+    for c in candidates:
+        if c in seen:
+            continue
+        seen.add(c)
+        if key_is_consistent(op, [c], excluded_fn_names=excluded_fn_names):
+            return [c]
+    return None
+
+
+def partition_frame(pd, frame, *, key: List[str], n_partitions: int) -> List:
+    """
+    Split a data frame into n_partitions frames by a hash of key columns.
+
+    :param pd: Pandas-like module
+    :param frame: data frame to split
+    :param key: partition key column names
+    :param n_partitions: number of partitions
+    :return: list of data frames
+    """
+    assert n_partitions > 0
+    codes = pd.util.hash_pandas_object(frame.loc[:, key], index=False).to_numpy()
+    codes = codes % n_partitions
+    return [
+        frame.loc[codes == i, :].reset_index(drop=True) for i in range(n_partitions)
+    ]
+
+
+def eval_partition(model, op, data_map: Dict):
+    """
+    Evaluate op on one partition (process pool entry point).
+
+    :param model: data model to evaluate with
+    :param op: operator DAG
+    :param data_map: partition of the tables
+    :return: data frame result
+    """
+    return model.eval(op, data_map=data_map)
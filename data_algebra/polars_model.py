@@ -3,7 +3,12 @@ Adapter to use Polars ( https://www.pola.rs ) in the data algebra.
 
 """
 
-from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+from collections import OrderedDict
+import glob
+import os
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
 
 import numpy as np
 import polars as pl
@@ -16,8 +21,100 @@ import data_algebra.data_ops_types
 import data_algebra.connected_components
 import data_algebra.expression_walker
 import data_algebra.PolarsSQL
+import data_algebra.eval_state
+import data_algebra.eval_profile
 from data_algebra.sql_format_options import SQLFormatOptions
 
+# file suffixes to Polars formats
+_file_formats = {
+    ".parquet": "parquet",
+    ".pq": "parquet",
+    ".arrow": "ipc",
+    ".ipc": "ipc",
+    ".feather": "ipc",
+    ".csv": "csv",
+}
+
+
+def file_format_of(path) -> str:
+    """
+    Polars file format ("parquet", "ipc" or "csv") of a path, by its suffix.
+
+    :param path: file path or glob pattern
+    :return: format name
+    """
+    suffix = os.path.splitext(str(path))[1].lower()
+    try:
+        return _file_formats[suffix]
+    except KeyError:
+        raise ValueError(f"can not determine file format of {path}")
+
+
+def scan_source(path) -> pl.LazyFrame:
+    """
+    Lazily scan a Parquet, Arrow IPC or CSV file, glob pattern of files, or directory of
+    Parquet files. Nothing is read until the plan using the scan is collected.
+
+    :param path: file path, glob pattern or directory
+    :return: Polars LazyFrame
+    """
+    path = os.fspath(path)
+    if os.path.isdir(path):
+        path = os.path.join(path, "**", "*.parquet")
+        if len(glob.glob(path, recursive=True)) < 1:
+            raise ValueError(f"no Parquet files found under {path}")
+    file_format = file_format_of(path)
+    if file_format == "parquet":
+        return pl.scan_parquet(path)
+    if file_format == "ipc":
+        return pl.scan_ipc(path)
+    return pl.scan_csv(path)
+
+
+def _plan_lines(plan, *, optimized: bool) -> List[str]:
+    if isinstance(plan, pl.DataFrame):
+        plan = plan.lazy()
+    text = plan.explain(optimized=optimized)
+    return [line.rstrip() for line in text.split("\n") if len(line.strip()) > 0]
+
+
+def _plan_line_key(line: str) -> str:
+    # scans are matched by their source, not by the columns or rows pushed down to them
+    line = line.strip()
+    if line.startswith("DF "):
+        line = line.split(";")[0]
+    return line
+
+
+def _plan_line_operator(line: str) -> str:
+    # leading operator word, such as FILTER, for lines the optimizer rewrote
+    match = re.match(r"[A-Z_]+", line.strip())
+    return "" if match is None else match.group(0)
+
+
+def _own_plan_lines(lines: List[str], source_lines: List[List[str]]) -> List[str]:
+    """
+    Lines of a node's naive plan that are not part of a source's plan, dedented.
+    """
+    keys = [line.strip() for line in lines]
+    own = [True] * len(lines)
+    for sl in source_lines:
+        sk = [line.strip() for line in sl]
+        n = len(sk)
+        i = 0
+        while (n > 0) and (i + n <= len(keys)):
+            if keys[i : (i + n)] == sk:
+                for j in range(i, i + n):
+                    own[j] = False
+                i = i + n
+            else:
+                i = i + 1
+    res = [lines[i] for i in range(len(lines)) if own[i]]
+    if len(res) > 0:
+        indent = min([len(line) - len(line.lstrip()) for line in res])
+        res = [line[indent:] for line in res]
+    return res
+
 
 def _build_lit(v):
     if isinstance(v, bool):
@@ -93,6 +190,7 @@ class PolarsTerm:
         :param polars_term: Optional Polars expression (None means collect info, not a true term)
         :param is_literal: True if term is a constant
         :param is_column: True if term is a column name
+        :param is_series: True if term is computed over the whole frame (never windowed)
         :param lit_value: original value for a literal
         :param inputs: inputs to expression node
         """
@@ -114,18 +212,15 @@ class ExpressionRequirementsCollector(data_algebra.expression_walker.ExpressionW
     Class to collect what accommodations an expression needs.
     """
 
-    collect_required: bool
     zero_constant_required: bool
     one_constant_required: bool
     _needs_zero_constant: Set[str]
     _needs_one_constant: Set[str]
-    _collect_required: Set[str]
 
     def __init__(self) -> None:
         data_algebra.expression_walker.ExpressionWalker.__init__(
             self,
         )
-        self.collect_required = False
         self.zero_constant_required = False
         self.one_constant_required = False
         self._needs_zero_constant = {
@@ -139,14 +234,6 @@ class ExpressionRequirementsCollector(data_algebra.expression_walker.ExpressionW
             "cumcount",
             "_cumcount",
         }
-        self._collect_required = {
-            "uniform",
-            "_uniform",
-            "ngroup",
-            "_ngroup",  # number groups
-            "sgroup",
-            "_sgroup",  # size groups
-        }
 
     def act_on_literal(self, *, value):
         """
@@ -185,8 +272,6 @@ class ExpressionRequirementsCollector(data_algebra.expression_walker.ExpressionW
             self.one_constant_required = True
         if op.op in self._needs_zero_constant:
             self.zero_constant_required = True
-        if op.op in self._collect_required:
-            self.collect_required = True
 
     def add_in_temp_columns(self, temp_v_columns: List):
         """
@@ -210,6 +295,39 @@ def _unpack_lits(v):
         raise ValueError(f"unexpected type to _unpack_lits: {type(v)}")
 
 
+# functions with one value per window
+_aggregate_fn_names = {
+    "all",
+    "any",
+    "any_value",
+    "count",
+    "first",
+    "last",
+    "max",
+    "mean",
+    "median",
+    "min",
+    "nunique",
+    "size",
+    "std",
+    "sum",
+    "var",
+}
+
+
+def _is_aggregate(term) -> bool:
+    # True if term has one value per window (in an extend step)
+    if isinstance(term, data_algebra.expr_rep.Value):
+        return True
+    if isinstance(term, data_algebra.expr_rep.Expression):
+        if len(term.args) == 0:
+            return term.op in {"size", "_size"}
+        if term.op in _aggregate_fn_names:
+            return True
+        return all([_is_aggregate(a) for a in term.args])
+    return False
+
+
 def _mapv(a, b: Dict, c):
     # TODO: find out if there is another way to do this
     assert isinstance(b, Dict)
@@ -380,6 +498,8 @@ class PolarsExpressionActor(data_algebra.expression_walker.ExpressionWalker):
     extend_context: bool
     project_context: bool
     partition_by: List[str]
+    order_by: List[str]
+    reverse: List[str]
 
     def __init__(
         self,
@@ -388,7 +508,17 @@ class PolarsExpressionActor(data_algebra.expression_walker.ExpressionWalker):
         extend_context: bool = False,
         project_context: bool = False,
         partition_by: Optional[Iterable[str]] = None,
+        order_by: Optional[Iterable[str]] = None,
+        reverse: Optional[Iterable[str]] = None,
     ) -> None:
+        """
+        :param polars_model: PolarsModel supplying implementations
+        :param extend_context: if True translate for an extend step
+        :param project_context: if True translate for a project step
+        :param partition_by: window partition columns
+        :param order_by: window ordering columns, columns are read in this order
+        :param reverse: columns of order_by to order descending
+        """
         assert isinstance(extend_context, bool)
         assert isinstance(project_context, bool)
         assert (extend_context + project_context) == 1
@@ -404,6 +534,35 @@ class PolarsExpressionActor(data_algebra.expression_walker.ExpressionWalker):
         else:
             partition_by = list(partition_by)
         self.partition_by = partition_by
+        assert not isinstance(order_by, str)  # common error
+        self.order_by = [] if order_by is None else list(order_by)
+        self.reverse = [] if reverse is None else list(reverse)
+
+    def in_window_order(self, term):
+        """
+        Re-order a (window length) term into window order.
+
+        :param term: Polars expression
+        :return: Polars expression
+        """
+        return term.sort_by(
+            self.order_by, descending=[c in self.reverse for c in self.order_by]
+        )
+
+    def from_window_order(self, term):
+        """
+        Map a (window length) term computed in window order back to row order.
+
+        :param term: Polars expression
+        :return: Polars expression
+        """
+        # Expr.take() was renamed Expr.gather() in Polars 0.19.14
+        gather = term.gather if hasattr(term, "gather") else term.take
+        return gather(
+            pl.arg_sort_by(
+                self.order_by, descending=[c in self.reverse for c in self.order_by]
+            ).arg_sort()
+        )
 
     # expression helpers
 
@@ -449,6 +608,16 @@ class PolarsExpressionActor(data_algebra.expression_walker.ExpressionWalker):
         # process inputs
         for v in values:
             assert isinstance(v, (List, PolarsTerm))
+        if len(self.order_by) > 0:
+            # read columns in window order
+            values = [
+                (
+                    PolarsTerm(polars_term=self.in_window_order(v.polars_term))
+                    if isinstance(v, PolarsTerm) and v.is_column
+                    else v
+                )
+                for v in values
+            ]
         want_literals_unpacked = op.op in self.polars_model.want_literals_unpacked
         if want_literals_unpacked:
             args = _unpack_lits(values)
@@ -458,49 +627,37 @@ class PolarsExpressionActor(data_algebra.expression_walker.ExpressionWalker):
         f = None
         arity = len(values)
         if (f is None) and (arity == 0):
+            # whole frame terms, kept lazy
             if op.op in ["_uniform", "uniform"]:
-                assert isinstance(arg, pl.DataFrame)
+                rng = self.polars_model.rng
                 return PolarsTerm(
-                    polars_term=pl.Series(
-                        values=self.polars_model.rng.uniform(0.0, 1.0, arg.shape[0]),
-                        dtype=pl.datatypes.Float64,
-                        dtype_if_empty=pl.datatypes.Float64,
+                    polars_term=pl.first().map_batches(
+                        lambda s: pl.Series(
+                            values=rng.uniform(0.0, 1.0, len(s)),
+                            dtype=pl.datatypes.Float64,
+                        )
                     ),
                     is_series=True,
                 )
             elif op.op in ["_sgroup", "sgroup"]:
-                assert isinstance(arg, pl.DataFrame)
-                n_groups = 0
-                if arg.shape[0] > 0:
-                    n_groups = 1
-                    if len(self.partition_by) > 0:
-                        s_groups = (
-                            arg.group_by(self.partition_by)
-                            .apply(lambda x: x.head(1))
-                            .shape[0]
-                        )
+                # number of groups
+                if len(self.partition_by) > 0:
+                    n_groups = pl.struct(self.partition_by).n_unique()
+                else:
+                    n_groups = pl.count().clip_max(1)
                 return PolarsTerm(
-                    polars_term=pl.lit(s_groups),
-                    lit_value=n_groups,
-                    is_literal=True,
+                    polars_term=n_groups.cast(pl.datatypes.Int64),
+                    is_series=True,
                 )
             elif op.op in ["_ngroup", "ngroup"]:
-                assert isinstance(arg, pl.DataFrame)
-                group_labels = []
-                if arg.shape[0] > 0:
-                    n_groups = [0] * arg.shape[0]
-                    if len(self.partition_by) > 0:
-                        # TODO: number the groups, not size them
-                        n_groups = (
-                            arg.group_by(self.partition_by)
-                            .apply(lambda x: x.head(1))
-                            .shape[0]
-                        )
+                # group number, in order of the partition keys (as Pandas ngroup())
+                if len(self.partition_by) <= 0:
+                    return PolarsTerm(
+                        polars_term=_build_lit(0), is_literal=True, lit_value=0
+                    )
                 return PolarsTerm(
-                    polars_term=pl.Series(
-                        values=group_labels,
-                        dtype=pl.datatypes.Int64,
-                        dtype_if_empty=pl.datatypes.Int64,
+                    polars_term=(pl.struct(self.partition_by).rank("dense") - 1).cast(
+                        pl.datatypes.Int64
                     ),
                     is_series=True,
                 )
@@ -527,12 +684,198 @@ class PolarsExpressionActor(data_algebra.expression_walker.ExpressionWalker):
         )
 
 
+def _sql_table(value) -> pl.LazyFrame:
+    # lazy form of a table to register in a pl.SQLContext
+    if isinstance(value, (str, os.PathLike)):
+        return scan_source(value)
+    return value.lazy()
+
+
+class PolarsSQLSession:
+    """
+    Long-lived Polars SQL context, for running many queries against the same tables.
+    Tables are registered as lazy frames and only re-registered when their source
+    changes (a different frame or path, or a frame that changed shape or columns).
+    Generated SQL is cached per operator DAG (keyed by its strict Python representation,
+    which is much cheaper to produce than SQL).
+    Safe to share between threads.
+    """
+
+    sql_model: data_algebra.PolarsSQL.PolarsSQLModel
+    max_cached_queries: int
+    hits: int
+    misses: int
+
+    def __init__(
+        self,
+        *,
+        sql_model: Optional[data_algebra.PolarsSQL.PolarsSQLModel] = None,
+        max_cached_queries: int = 1000,
+    ):
+        """
+        :param sql_model: SQL model used to translate operator DAGs, default PolarsSQLModel()
+        :param max_cached_queries: maximum number of generated SQL texts to keep
+        """
+        if sql_model is None:
+            sql_model = data_algebra.PolarsSQL.PolarsSQLModel()
+        assert isinstance(sql_model, data_algebra.PolarsSQL.PolarsSQLModel)
+        assert isinstance(max_cached_queries, int)
+        assert max_cached_queries > 0
+        self.sql_model = sql_model
+        self.max_cached_queries = max_cached_queries
+        self.hits = 0
+        self.misses = 0
+        self._context = pl.SQLContext()
+        self._registered: Dict[str, Tuple[Any, Any]] = dict()
+        self._sql_cache: OrderedDict = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _fingerprint(value):
+        if isinstance(value, (str, os.PathLike)):
+            # scans read the files at collection, so only the path matters
+            return os.fspath(value)
+        if isinstance(value, pl.DataFrame):
+            return value.shape, tuple(value.columns)
+        if isinstance(value, pl.LazyFrame):
+            return None
+        raise ValueError(f"can not register {type(value)} as a Polars SQL table")
+
+    def register(self, name: str, value) -> bool:
+        """
+        Register a table, unless the same source is already registered under the name.
+
+        :param name: table name
+        :param value: Polars DataFrame or LazyFrame, or file path (see scan_source())
+        :return: True if the table was (re-)registered
+        """
+        assert isinstance(name, str)
+        fingerprint = self._fingerprint(value)
+        with self._lock:
+            try:
+                held, held_fingerprint = self._registered[name]
+                if ((held is value) or isinstance(value, (str, os.PathLike))) and (
+                    held_fingerprint == fingerprint
+                ):
+                    return False
+            except KeyError:
+                pass
+            self._context.register(name, _sql_table(value))
+            self._registered[name] = (value, fingerprint)
+            return True
+
+    def register_many(self, data_map: Dict[str, Any]) -> List[str]:
+        """
+        Register tables, see register().
+
+        :param data_map: dictionary mapping table names to tables
+        :return: names of the tables that were (re-)registered
+        """
+        assert isinstance(data_map, Dict)
+        return [k for k, v in data_map.items() if self.register(k, v)]
+
+    def unregister(self, name: str) -> None:
+        """
+        Remove a table, if registered.
+
+        :param name: table name
+        """
+        with self._lock:
+            if self._registered.pop(name, None) is not None:
+                self._context.unregister(name)
+
+    def tables(self) -> List[str]:
+        """
+        :return: sorted list of registered table names
+        """
+        with self._lock:
+            return sorted(self._registered.keys())
+
+    def to_sql(self, op) -> str:
+        """
+        Convert an operator DAG into SQL, re-using previously generated SQL.
+
+        :param op: ViewRepresentation to convert
+        :return: sql string
+        """
+        assert isinstance(op, data_algebra.data_ops_types.OperatorPlatform)
+        key = op.to_python(strict=True, pretty=False)
+        with self._lock:
+            try:
+                sql_string = self._sql_cache[key]
+                self._sql_cache.move_to_end(key)
+                self.hits = self.hits + 1
+                return sql_string
+            except KeyError:
+                self.misses = self.misses + 1
+        sql_string = self.sql_model.to_sql(op)
+        with self._lock:
+            self._sql_cache[key] = sql_string
+            while len(self._sql_cache) > self.max_cached_queries:
+                self._sql_cache.popitem(last=False)
+        return sql_string
+
+    def execute(
+        self,
+        op,
+        *,
+        data_map: Optional[Dict[str, Any]] = None,
+        lazy: bool = False,
+        isolated: bool = False,
+    ):
+        """
+        Run a query against the registered tables.
+
+        :param op: ViewRepresentation to evaluate, or SQL string
+        :param data_map: optional tables to register before running (see register_many())
+        :param lazy: if True return a LazyFrame instead of collecting
+        :param isolated: if True only the tables of data_map are visible to the query, and are
+                         unregistered after planning it (the session's tables are restored)
+        :return: data frame result
+        """
+        assert isinstance(lazy, bool)
+        assert isinstance(isolated, bool)
+        if isinstance(op, str):
+            sql_string = op
+        else:
+            sql_string = self.to_sql(op)
+        with self._lock:
+            if isolated:
+                res = self._execute_isolated(sql_string, data_map=data_map)
+            else:
+                if data_map is not None:
+                    self.register_many(data_map)
+                res = self._context.execute(sql_string, eager=False)
+        if not lazy:
+            res = res.collect()
+        return res
+
+    def _execute_isolated(self, sql_string: str, *, data_map: Optional[Dict[str, Any]]):
+        # plan sql_string seeing only the tables of data_map, caller holds the lock
+        held = self._registered
+        for name in held.keys():
+            self._context.unregister(name)
+        self._registered = dict()
+        try:
+            if data_map is not None:
+                self.register_many(data_map)
+            # the plan holds its tables, so they can be unregistered before collection
+            return self._context.execute(sql_string, eager=False)
+        finally:
+            for name in self._registered.keys():
+                self._context.unregister(name)
+            self._registered = held
+            for name, (value, _) in held.items():
+                self._context.register(name, _sql_table(value))
+
+
 class PolarsModel(data_algebra.data_model.DataModel):
     """
     Interface for realizing the data algebra as a sequence of steps over Polars https://www.pola.rs .
     """
 
     use_lazy_eval: bool
+    use_trusted_keys: bool
     presentation_model_name: str
     _method_dispatch_table: Dict[str, Callable]
     extend_expr_impl_map: Dict[int, Dict[str, Callable]]
@@ -542,15 +885,29 @@ class PolarsModel(data_algebra.data_model.DataModel):
     want_literals_unpacked: Set[str]
     rng: Any
     sql_model: data_algebra.PolarsSQL.PolarsSQLModel
+    sql_session: PolarsSQLSession
 
-    def __init__(self, *, use_lazy_eval: bool = True):
+    def __init__(
+        self,
+        *,
+        use_lazy_eval: bool = True,
+        use_trusted_keys: bool = False,
+    ):
+        """
+        :param use_lazy_eval: if True evaluate with Polars lazy frames
+        :param use_trusted_keys: if True skip checking that record transform inputs are keyed by
+                                 their record keys (for production runs on known-good data).
+        """
         data_algebra.data_model.DataModel.__init__(
             self, presentation_model_name="pl", module=pl
         )
         self.sql_model = data_algebra.PolarsSQL.PolarsSQLModel()
+        self.sql_session = PolarsSQLSession(sql_model=self.sql_model)
         self.rng = np.random.default_rng()
         assert isinstance(use_lazy_eval, bool)
         self.use_lazy_eval = use_lazy_eval
+        assert isinstance(use_trusted_keys, bool)
+        self.use_trusted_keys = use_trusted_keys
         self._method_dispatch_table = {
             "ConcatRowsNode": self._concat_rows_step,
             "ConvertRecordsNode": self._convert_records_step,
@@ -700,14 +1057,18 @@ class PolarsModel(data_algebra.data_model.DataModel):
         # get rid of some corner cases
         if len(column_names) < 1:
             return False
-        mx = (
-            table.select(column_names)
-            .with_columns([pl.lit(1, pl.Int64).alias("_da_count_tmp")])
-            .group_by(column_names)
-            .sum()["_da_count_tmp"]
-            .max()
+        # hash each row's key once, a repeated hash is either a duplicate key or a hash collision
+        keys = table.select(column_names)
+        end = data_algebra.util.first_repeated_hash(
+            keys.shape[0],
+            lambda start, end: keys.slice(start, end - start).hash_rows().to_numpy(),
         )
-        return mx <= 1
+        if end is None:
+            return True
+        # confirm exactly, on the rows scanned so far and then (only on a collision) all rows
+        if keys.slice(0, end).is_duplicated().any():
+            return False
+        return not keys.is_duplicated().any()
 
     # evaluate
 
@@ -716,19 +1077,205 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        streaming: bool = False,
     ) -> pl.DataFrame:
         """
         Implementation of Polars evaluation of data algebra operators
 
         :param op: ViewRepresentation to evaluate
-        :param data_map: dictionary mapping table and view names to data frames
+        :param data_map: dictionary mapping table and view names to data frames, lazy frames,
+                         or paths of files to scan (see scan_source())
+        :param streaming: if True collect with the Polars streaming engine (processing
+                          inputs in batches, for data larger than memory)
         :return: data frame result
         """
         assert isinstance(data_map, Dict)
         assert isinstance(op, data_algebra.data_ops_types.OperatorPlatform)
-        res = self._compose_polars_ops(op=op, data_map=data_map)
+        assert isinstance(streaming, bool)
+        return self._eval(
+            op,
+            data_map=data_map,
+            eval_state=data_algebra.eval_state.EvalState(op),
+            streaming=streaming,
+        )
+
+    def sink(
+        self,
+        op: data_algebra.data_ops_types.OperatorPlatform,
+        *,
+        data_map: Dict[str, Any],
+        path,
+        file_format: Optional[str] = None,
+    ) -> bool:
+        """
+        Evaluate op, writing the result to a Parquet, Arrow IPC or CSV file. The result is
+        sunk to the file by the Polars streaming engine, batch by batch without being held in
+        memory. If Polars can not stream the plan, it is collected (with the streaming engine)
+        and then written. Results used by more than one step are cached (sinks do not eliminate
+        common sub-plans), so such plans are collected.
+
+        :param op: ViewRepresentation to evaluate
+        :param data_map: dictionary mapping table and view names to data frames, lazy frames,
+                         or paths of files to scan (see scan_source())
+        :param path: file to write
+        :param file_format: "parquet", "ipc" or "csv", default from the suffix of path
+        :return: True if the result was streamed to the file
+        """
+        assert isinstance(data_map, Dict)
+        assert isinstance(op, data_algebra.data_ops_types.OperatorPlatform)
+        if file_format is None:
+            file_format = file_format_of(path)
+        if file_format not in {"parquet", "ipc", "csv"}:
+            raise ValueError(f"unknown file format {file_format}")
+        eval_state = data_algebra.eval_state.EvalState(op)
+        # sinks and streaming collection do not eliminate common sub-plans
+        eval_state.cache_shared = True
+        res = self._compose_polars_ops(op, data_map=data_map, eval_state=eval_state)
         if isinstance(res, pl.LazyFrame):
-            res = res.collect()
+            try:
+                if file_format == "parquet":
+                    res.sink_parquet(path)
+                elif file_format == "ipc":
+                    res.sink_ipc(path)
+                else:
+                    res.sink_csv(path)
+                return True
+            except pl.exceptions.InvalidOperationError:
+                # raised before any work is done, for plans the streaming engine can not run
+                pass
+            res = res.collect(streaming=True, comm_subplan_elim=False)
+        if file_format == "parquet":
+            res.write_parquet(path)
+        elif file_format == "ipc":
+            res.write_ipc(path)
+        else:
+            res.write_csv(path)
+        return False
+
+    def explain(
+        self,
+        op: data_algebra.data_ops_types.OperatorPlatform,
+        *,
+        data_map: Dict[str, Any],
+        profile: bool = False,
+    ) -> str:
+        """
+        Describe the Polars plan generated for op. The report has the optimized plan
+        (showing predicate and projection pushdown), each optimized plan line that comes
+        from a single step marked with that step's number; then each step of op, in
+        evaluation order, with the fragment of the (unoptimized) plan it generated.
+        Steps that have to materialize their result appear as in-memory frames (DF).
+
+        :param op: ViewRepresentation to explain
+        :param data_map: dictionary mapping table and view names to data frames, lazy frames,
+                         or paths of files to scan (see scan_source())
+        :param profile: if True also run the plan and report Polars' per-node timings
+        :return: report text
+        """
+        assert isinstance(data_map, Dict)
+        assert isinstance(op, data_algebra.data_ops_types.OperatorPlatform)
+        assert isinstance(profile, bool)
+        eval_state = data_algebra.eval_state.EvalState(op)
+        eval_state.plans = dict()
+        res = self._compose_polars_ops(op, data_map=data_map, eval_state=eval_state)
+        nodes = list(reversed(data_algebra.eval_state.topological_order(op)))
+        step_number = {id(node): i for i, node in enumerate(nodes)}
+        naive_lines = {
+            k: _plan_lines(v, optimized=False) for k, v in eval_state.plans.items()
+        }
+        fragments = dict()
+        steps_by_line = dict()
+        steps_by_operator = dict()
+        for node in nodes:
+            if id(node) not in naive_lines.keys():
+                continue
+            fragment = _own_plan_lines(
+                naive_lines[id(node)],
+                [naive_lines.get(id(s), []) for s in node.sources],
+            )
+            fragments[id(node)] = fragment
+            for line in fragment:
+                steps_by_line.setdefault(_plan_line_key(line), set()).add(
+                    step_number[id(node)]
+                )
+                steps_by_operator.setdefault(_plan_line_operator(line), set()).add(
+                    step_number[id(node)]
+                )
+        lines = ["optimized plan:"]
+        for line in _plan_lines(res, optimized=True):
+            steps = steps_by_line.get(_plan_line_key(line), None)
+            if (steps is None) and (len(_plan_line_operator(line)) > 0):
+                steps = steps_by_operator.get(_plan_line_operator(line), None)
+            if steps is None:
+                steps = set()
+            if len(steps) == 1:
+                line = line + f"  -- [{list(steps)[0]}]"
+            lines.append("    " + line)
+        lines.append("steps:")
+        for i, node in enumerate(nodes):
+            lines.append(
+                f"[{i}] " + data_algebra.eval_profile.step_text(node, step_number)
+            )
+            fragment = fragments.get(id(node), None)
+            if fragment is None:
+                lines.append("    -- not composed")
+                continue
+            if len(fragment) < 1:
+                lines.append("    -- no plan nodes of its own")
+            lines.extend(["    " + line for line in fragment])
+        if profile:
+            if isinstance(res, pl.DataFrame):
+                res = res.lazy()
+            _, timings = res.profile()
+            lines.append("polars profile (microseconds):")
+            for name, start, end in timings.iter_rows():
+                lines.append(f"    {name}: {start} to {end}, {end - start} elapsed")
+        return "\n".join(lines) + "\n"
+
+    def profile_eval(
+        self, op, *, data_map: Dict[str, Any], trace_memory: bool = False
+    ) -> Tuple[pl.DataFrame, data_algebra.eval_profile.EvalProfile]:
+        """
+        Evaluate op, recording per-node statistics. Each step's result is collected
+        (materialized) as it is composed, so steps are timed separately, and lazy
+        plan optimizations across steps do not apply.
+
+        :param op: ViewRepresentation to evaluate
+        :param data_map: dictionary mapping table and view names to data frames
+        :param trace_memory: if True also record bytes allocated per node (slows evaluation)
+        :return: data frame result, EvalProfile
+        """
+        assert isinstance(data_map, Dict)
+        assert isinstance(op, data_algebra.data_ops_types.OperatorPlatform)
+        eval_state = data_algebra.eval_state.EvalState(op)
+        profile = data_algebra.eval_profile.EvalProfile(trace_memory=trace_memory)
+        eval_state.profile = profile
+        profile.start()
+        try:
+            res = self._eval(op, data_map=data_map, eval_state=eval_state)
+        finally:
+            profile.stop()
+        return res, profile
+
+    def _eval(
+        self,
+        op: data_algebra.data_ops_types.OperatorPlatform,
+        *,
+        data_map: Dict[str, Any],
+        eval_state: data_algebra.eval_state.EvalState,
+        streaming: bool = False,
+    ) -> pl.DataFrame:
+        """
+        Compose and collect op under eval_state.
+        """
+        # common sub-plan elimination is not available when streaming
+        eval_state.cache_shared = streaming
+        res = self._compose_polars_ops(op, data_map=data_map, eval_state=eval_state)
+        if isinstance(res, pl.LazyFrame):
+            if streaming:
+                res = res.collect(streaming=True, comm_subplan_elim=False)
+            else:
+                res = res.collect()
         assert self.is_appropriate_data_instance(res)
         return res
 
@@ -755,29 +1302,25 @@ class PolarsModel(data_algebra.data_model.DataModel):
         Implementation of Polars evaluation through Polars SQL interface.
         https://pola-rs.github.io/polars-book/user-guide/sql.html
         Not at a useful level of development yet.
-        Currently creates non-reentrant pl.SQLContext() in call.
+        Runs in the model's sql_session, re-using its SQL context and generated SQL. Only the
+        tables in data_map are visible to the query, and they are unregistered after it (run
+        queries with sql_session.execute() to keep tables registered between calls).
 
         :param op: ViewRepresentation to evaluate, or SQL string
         :param data_map: dictionary mapping table and view names to data frames or data sources
         :return: data frame result
         """
         assert isinstance(data_map, Dict)
-        if isinstance(op, str):
-            sql_string = op
-        else:
+        if not isinstance(op, str):
             assert isinstance(op, data_algebra.data_ops_types.OperatorPlatform)
-            sql_string = self.to_sql(op)
-        sql_context = pl.SQLContext()  # currently this is a non-reentrant singleton
-        for k, v in data_map.items():
-            sql_context.register(k, v)
-        res = sql_context.execute(sql_string)
-        return res
+        return self.sql_session.execute(op, data_map=data_map, isolated=True)
 
     def _compose_polars_ops(
         self,
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Convert to polars operators
@@ -788,7 +1331,57 @@ class PolarsModel(data_algebra.data_model.DataModel):
         """
         assert isinstance(op, data_algebra.data_ops_types.OperatorPlatform)
         assert isinstance(data_map, Dict)
-        res = self._method_dispatch_table[op.node_name](op=op, data_map=data_map)
+        if (eval_state is None) or (not eval_state.is_shared(op)):
+            return self._compose_step(op, data_map=data_map, eval_state=eval_state)
+        # nodes with more than one consumer are planned once, all consumers get the
+        # same plan (collection's common sub-plan elimination then computes it once,
+        # where that is not available the plan is explicitly cached)
+        try:
+            res, _ = eval_state.take(op)
+        except KeyError:
+            res = self._compose_step(op, data_map=data_map, eval_state=eval_state)
+            if eval_state.cache_shared and isinstance(res, pl.LazyFrame):
+                res = res.cache()
+            eval_state.store(op, res)
+            res, _ = eval_state.take(op)
+        return res
+
+    def _compose_step(
+        self,
+        op: data_algebra.data_ops_types.OperatorPlatform,
+        *,
+        data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
+    ):
+        """
+        Convert one step to polars operators, see _compose_polars_ops().
+        """
+        profile = None if eval_state is None else eval_state.profile
+        if profile is None:
+            res = self._method_dispatch_table[op.node_name](
+                op=op, data_map=data_map, eval_state=eval_state
+            )
+            if (eval_state is not None) and (eval_state.plans is not None):
+                eval_state.plans[id(op)] = res
+            return res
+        profile.enter(op)
+        try:
+            res = self._method_dispatch_table[op.node_name](
+                op=op, data_map=data_map, eval_state=eval_state
+            )
+            if isinstance(res, pl.LazyFrame):
+                res = res.collect()
+        except Exception:
+            profile.abandon()
+            raise
+        profile.exit(
+            op,
+            rows_out=res.shape[0],
+            columns_out=res.shape[1],
+            bytes_out=res.estimated_size(),
+        )
+        if self.use_lazy_eval:
+            res = res.lazy()
         return res
 
     # operator step realizations
@@ -798,6 +1391,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute a concat rows step, returning a data frame.
@@ -806,8 +1400,15 @@ class PolarsModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.ConcatRowsNode"
             )
-        common_columns = [c for c in op.columns_produced() if c != op.id_column]
-        inputs = [self._compose_polars_ops(s, data_map=data_map) for s in op.sources]
+        common_columns = [
+            c
+            for c in data_algebra.eval_state.columns_wanted(op, eval_state)
+            if c != op.id_column
+        ]
+        inputs = [
+            self._compose_polars_ops(s, data_map=data_map, eval_state=eval_state)
+            for s in op.sources
+        ]
         assert len(inputs) == 2
         inputs = [
             input_i.select(common_columns) for input_i in inputs
@@ -827,6 +1428,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute record conversion step, returning a data frame.
@@ -835,26 +1437,46 @@ class PolarsModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.ConvertRecordsNode"
             )
-        res = self._compose_polars_ops(op.sources[0], data_map=data_map)
+        res = self._compose_polars_ops(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
         if isinstance(res, pl.LazyFrame):
             res = res.collect()
         res = op.record_map.transform(res, local_data_model=self)
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         if self.use_lazy_eval and (not isinstance(res, pl.LazyFrame)):
             res = res.lazy()
         return res
 
+    def _ops_needed(
+        self,
+        op: data_algebra.data_ops_types.OperatorPlatform,
+        eval_state: Optional[data_algebra.eval_state.EvalState],
+    ) -> Dict[str, Any]:
+        """
+        Return the subset of op.ops whose results later steps use.
+        """
+        if eval_state is None:
+            return op.ops
+        return {k: opk for k, opk in op.ops.items() if eval_state.is_needed(op, k)}
+
     def _extend_step(
         self,
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute an extend step, returning a data frame.
         """
         if op.node_name != "ExtendNode":
             raise TypeError("op was supposed to be a data_algebra.data_ops.ExtendNode")
-        res = self._compose_polars_ops(op.sources[0], data_map=data_map)
+        res = self._compose_polars_ops(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
+        # only compute results later steps use
+        ops = self._ops_needed(op, eval_state)
         partition_by = op.partition_by
         temp_v_columns = []
         # see if we need to make partition non-empty
@@ -864,17 +1486,33 @@ class PolarsModel(data_algebra.data_model.DataModel):
             temp_v_columns.append(_build_lit(1).alias(v_name))
         # pre-scan expressions
         er = ExpressionRequirementsCollector()
-        for opk in op.ops.values():
+        for opk in ops.values():
             opk.act_on(None, expr_walker=er)
         er.add_in_temp_columns(temp_v_columns)
-        value_to_send_to_act = None
-        if er.collect_required:
-            if isinstance(res, pl.LazyFrame):
-                res = res.collect()
-            value_to_send_to_act = res
-        # work on expressions
+        # work on expressions, ordering within each window (no sort of the frame)
+        order_by = op.order_by
+        reverse = op.reverse
+        if len(order_by) > 1:
+            # windows sort by one key column, the row's position in the full ordering
+            v_name = "_da_extend_temp_order_column"
+            temp_v_columns.append(
+                pl.arg_sort_by(
+                    order_by, descending=[c in set(reverse) for c in order_by]
+                )
+                .arg_sort()
+                .alias(v_name)
+            )
+            order_by = [v_name]
+            reverse = []
+        actor = PolarsExpressionActor(
+            polars_model=self,
+            extend_context=True,
+            partition_by=op.partition_by,
+            order_by=order_by,
+            reverse=reverse,
+        )
         produced_columns = []
-        for k, opk in op.ops.items():
+        for k, opk in ops.items():
             if op.windowed_situation:
                 if (len(opk.args) == 1) and isinstance(
                     opk.args[0], data_algebra.expr_rep.Value
@@ -893,12 +1531,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
                         inline=opk.inline,
                         method=opk.method,
                     )
-            fld_k_container = opk.act_on(
-                value_to_send_to_act,
-                expr_walker=PolarsExpressionActor(
-                    polars_model=self, extend_context=True, partition_by=op.partition_by
-                ),
-            )  # PolarsTerm
+            fld_k_container = opk.act_on(None, expr_walker=actor)  # PolarsTerm
             assert isinstance(fld_k_container, PolarsTerm)
             fld_k = fld_k_container.polars_term
             if op.windowed_situation and (
@@ -908,23 +1541,15 @@ class PolarsModel(data_algebra.data_model.DataModel):
                     or fld_k_container.is_series
                 )
             ):
+                if (len(op.order_by) > 0) and (not _is_aggregate(opk)):
+                    # one value per row, computed in window order
+                    fld_k = actor.from_window_order(fld_k)
                 fld_k = fld_k.over(partition_by)
             produced_columns.append(fld_k.alias(k))
         if len(temp_v_columns) > 0:
             res = res.with_columns(temp_v_columns)
-        if len(op.order_by) > 0:
-            order_cols = list(partition_by)
-            partition_set = set(partition_by)
-            for c in op.order_by:
-                if c not in partition_set:
-                    order_cols.append(c)
-            reversed_cols = [
-                True if ci in set(op.reverse) else False for ci in op.order_by
-            ]
-            res = res.sort(by=op.order_by, descending=reversed_cols)
         res = res.with_columns(produced_columns)
-        if len(temp_v_columns) > 0:
-            res = res.select(op.columns_produced())
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         # get back to lazy type if needed
         if self.use_lazy_eval and isinstance(res, pl.DataFrame):
             res = res.lazy()
@@ -935,13 +1560,18 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute a project step, returning a data frame.
         """
         if op.node_name != "ProjectNode":
             raise TypeError("op was supposed to be a data_algebra.data_ops.ProjectNode")
-        res = self._compose_polars_ops(op.sources[0], data_map=data_map)
+        res = self._compose_polars_ops(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
+        # only compute results later steps use
+        ops = self._ops_needed(op, eval_state)
         group_by = op.group_by
         temp_v_columns = []
         # see if we need to make group_by non-empty
@@ -951,17 +1581,12 @@ class PolarsModel(data_algebra.data_model.DataModel):
             temp_v_columns.append(_build_lit(1).alias(v_name))
         # pre-scan expressions
         er = ExpressionRequirementsCollector()
-        for opk in op.ops.values():
+        for opk in ops.values():
             opk.act_on(None, expr_walker=er)
         er.add_in_temp_columns(temp_v_columns)
-        value_to_send_to_act = None
-        if er.collect_required:
-            if isinstance(res, pl.LazyFrame):
-                res = res.collect()
-            value_to_send_to_act = res
         # work on expressions
         produced_columns = []
-        for k, opk in op.ops.items():
+        for k, opk in ops.items():
             if (len(opk.args) == 1) and isinstance(
                 opk.args[0], data_algebra.expr_rep.Value
             ):
@@ -978,7 +1603,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
                     method=opk.method,
                 )
             fld_k_container = opk.act_on(
-                value_to_send_to_act,
+                None,
                 expr_walker=PolarsExpressionActor(
                     polars_model=self, project_context=True
                 ),
@@ -989,8 +1614,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         if len(temp_v_columns) > 0:
             res = res.with_columns(temp_v_columns)
         res = res.group_by(group_by).agg(produced_columns)
-        if len(temp_v_columns) > 0:
-            res = res.select(op.columns_produced())
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         if (op.group_by is None) or (len(op.group_by) == 0):
             # see if we have a zero row result
             if isinstance(res, pl.LazyFrame):
@@ -1013,6 +1637,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute a natural join step, returning a data frame.
@@ -1021,7 +1646,10 @@ class PolarsModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.NaturalJoinNode"
             )
-        inputs = [self._compose_polars_ops(s, data_map=data_map) for s in op.sources]
+        inputs = [
+            self._compose_polars_ops(s, data_map=data_map, eval_state=eval_state)
+            for s in op.sources
+        ]
         assert len(inputs) == 2
         how = op.jointype.lower()
         if how == "full":
@@ -1030,6 +1658,9 @@ class PolarsModel(data_algebra.data_model.DataModel):
             coalesce_columns = set(op.sources[0].columns_produced()).intersection(
                 op.sources[1].columns_produced()
             ) - set(op.on_a)
+            coalesce_columns = coalesce_columns.intersection(
+                data_algebra.eval_state.columns_wanted(op, eval_state)
+            )
             orphan_keys = [c for c in op.on_b if c not in set(op.on_a)]
             input_right = inputs[1]
             if len(orphan_keys) > 0:
@@ -1060,6 +1691,9 @@ class PolarsModel(data_algebra.data_model.DataModel):
             coalesce_columns = set(op.sources[0].columns_produced()).intersection(
                 op.sources[1].columns_produced()
             ) - set(op.on_b)
+            coalesce_columns = coalesce_columns.intersection(
+                data_algebra.eval_state.columns_wanted(op, eval_state)
+            )
             orphan_keys = [c for c in op.on_a if c not in set(op.on_b)]
             input_right = inputs[0]
             if len(orphan_keys) > 0:
@@ -1085,7 +1719,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
                 )
             if len(orphan_keys) > 0:
                 res = res.rename({f"{c}_da_join_tmp_key": c for c in orphan_keys})
-        res = res.select(op.columns_produced())
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         return res
 
     def _order_rows_step(
@@ -1093,6 +1727,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute an order rows step, returning a data frame.
@@ -1101,13 +1736,25 @@ class PolarsModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.OrderRowsNode"
             )
-        res = self._compose_polars_ops(op.sources[0], data_map=data_map)
+        res = self._compose_polars_ops(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
         reversed_cols = [
             True if ci in set(op.reverse) else False for ci in op.order_columns
         ]
-        res = res.sort(by=op.order_columns, descending=reversed_cols)
-        if op.limit is not None:
-            res = res.head(op.limit)
+        if (op.limit is not None) and isinstance(res, pl.DataFrame):
+            # the lazy planner runs sort then head as a top-k selection
+            res = (
+                res.lazy()
+                .sort(by=op.order_columns, descending=reversed_cols)
+                .head(op.limit)
+                .collect()
+            )
+        else:
+            res = res.sort(by=op.order_columns, descending=reversed_cols)
+            if op.limit is not None:
+                res = res.head(op.limit)
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         return res
 
     def _rename_columns_step(
@@ -1115,6 +1762,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute a rename columns step, returning a data frame.
@@ -1123,12 +1771,16 @@ class PolarsModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.RenameColumnsNode"
             )
-        res = self._compose_polars_ops(op.sources[0], data_map=data_map)
+        res = self._compose_polars_ops(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
         if isinstance(res, pl.LazyFrame):
             # work around https://github.com/pola-rs/polars/issues/5882#issue-1507040380
             res = res.collect()
-        res = res.rename(op.reverse_mapping)
-        res = res.select(op.columns_produced())
+        res = res.rename(
+            {k: v for k, v in op.reverse_mapping.items() if k in set(res.columns)}
+        )
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         if self.use_lazy_eval and isinstance(res, pl.DataFrame):
             res = res.lazy()
         return res
@@ -1138,6 +1790,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute a map columns step, returning a data frame.
@@ -1146,12 +1799,16 @@ class PolarsModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.MapColumnsNode"
             )
-        res = self._compose_polars_ops(op.sources[0], data_map=data_map)
+        res = self._compose_polars_ops(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
         if isinstance(res, pl.LazyFrame):
             # work around https://github.com/pola-rs/polars/issues/5882#issue-1507040380
             res = res.collect()
-        res = res.rename(op.column_remapping)
-        res = res.select(op.columns_produced())
+        res = res.rename(
+            {k: v for k, v in op.column_remapping.items() if k in set(res.columns)}
+        )
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         if self.use_lazy_eval and isinstance(res, pl.DataFrame):
             res = res.lazy()
         return res
@@ -1161,6 +1818,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute a select columns step, returning a data frame.
@@ -1169,8 +1827,10 @@ class PolarsModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.SelectColumnsNode"
             )
-        res = self._compose_polars_ops(op.sources[0], data_map=data_map)
-        res = res.select(op.columns_produced())
+        res = self._compose_polars_ops(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         return res
 
     def _drop_columns_step(
@@ -1178,12 +1838,15 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute a drop columns step, returning a data frame.
         """
-        res = self._compose_polars_ops(op.sources[0], data_map=data_map)
-        res = res.select(op.columns_produced())
+        res = self._compose_polars_ops(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         return res
 
     def _select_rows_step(
@@ -1191,6 +1854,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Execute a select rows step, returning a data frame.
@@ -1199,29 +1863,25 @@ class PolarsModel(data_algebra.data_model.DataModel):
             raise TypeError(
                 "op was supposed to be a data_algebra.data_ops.SelectRowsNode"
             )
-        res = self._compose_polars_ops(op.sources[0], data_map=data_map)
+        res = self._compose_polars_ops(
+            op.sources[0], data_map=data_map, eval_state=eval_state
+        )
         temp_v_columns = []
         # pre-scan expressions
         er = ExpressionRequirementsCollector()
         for opk in op.ops.values():
             opk.act_on(None, expr_walker=er)
         er.add_in_temp_columns(temp_v_columns)
-        value_to_send_to_act = None
-        if er.collect_required:
-            if isinstance(res, pl.LazyFrame):
-                res = res.collect()
-            value_to_send_to_act = res
         # work on expression
         if len(temp_v_columns) > 0:
             res = res.with_columns(temp_v_columns)
         selection = op.expr.act_on(
-            value_to_send_to_act,
+            None,
             expr_walker=PolarsExpressionActor(polars_model=self, extend_context=True),
         )  # PolarsTerm
         assert isinstance(selection, PolarsTerm)
         res = res.filter(selection.polars_term)
-        if len(temp_v_columns) > 0:
-            res = res.select(op.columns_produced())
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         if self.use_lazy_eval and isinstance(res, pl.DataFrame):
             res = res.lazy()
         return res
@@ -1231,6 +1891,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         execute SQL
@@ -1243,7 +1904,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         assert self.is_appropriate_data_instance(res)
         if self.use_lazy_eval and (not isinstance(res, pl.LazyFrame)):
             res = res.lazy()
-        res = res.select(op.columns_produced())
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         return res
 
     def _table_step(
@@ -1251,6 +1912,7 @@ class PolarsModel(data_algebra.data_model.DataModel):
         op: data_algebra.data_ops_types.OperatorPlatform,
         *,
         data_map: Dict[str, Any],
+        eval_state: Optional[data_algebra.eval_state.EvalState] = None,
     ):
         """
         Return a data frame from table description and data_map.
@@ -1260,11 +1922,19 @@ class PolarsModel(data_algebra.data_model.DataModel):
                 "op was supposed to be a data_algebra.data_ops.TableDescription"
             )
         res = data_map[op.table_name]
+        if isinstance(res, (str, os.PathLike)):
+            # file source, scanned so only the columns and rows used are read
+            res = scan_source(res).select(
+                data_algebra.eval_state.columns_wanted(op, eval_state)
+            )
+            if not self.use_lazy_eval:
+                res = res.collect()
+            return res
         if not self.is_appropriate_data_instance(res):
             raise ValueError("data_map[" + op.table_name + "] was not the right type")
         if self.use_lazy_eval and (not isinstance(res, pl.LazyFrame)):
             res = res.lazy()
-        res = res.select(op.columns_produced())
+        res = res.select(data_algebra.eval_state.columns_wanted(op, eval_state))
         return res
 
     # cdata transforms
@@ -1287,8 +1957,10 @@ class PolarsModel(data_algebra.data_model.DataModel):
         # table must be keyed by record_keys + control_table_keys
         if data.shape[0] < 1:
             return pl.DataFrame({c: [] for c in blocks_in.row_columns})
-        if not self.table_is_keyed_by_columns(
-            data, column_names=blocks_in.record_keys + blocks_in.control_table_keys
+        if (not self.use_trusted_keys) and (
+            not self.table_is_keyed_by_columns(
+                data, column_names=blocks_in.record_keys + blocks_in.control_table_keys
+            )
         ):
             raise ValueError(
                 "table is not keyed by blocks_in.record_keys + blocks_in.control_table_keys"
@@ -1356,8 +2028,10 @@ class PolarsModel(data_algebra.data_model.DataModel):
         assert set(data.columns) == set(blocks_out.row_columns)
         if data.shape[0] < 1:
             return pl.DataFrame({c: [] for c in blocks_out.block_columns})
-        if not self.table_is_keyed_by_columns(
-            data, column_names=blocks_out.record_keys
+        if (not self.use_trusted_keys) and (
+            not self.table_is_keyed_by_columns(
+                data, column_names=blocks_out.record_keys
+            )
         ):
             raise ValueError("table is not keyed by blocks_out.record_keys")
         ct = self.data_frame(blocks_out.control_table)
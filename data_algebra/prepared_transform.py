@@ -0,0 +1,104 @@
+"""
+Operator DAGs checked and planned once, for repeated low-latency transforms.
+"""
+
+from typing import Any, Dict, Iterable, List
+
+import data_algebra.data_model
+
+
+class PreparedTransform:
+    """
+    A single table operator DAG, validated and planned once for a data model, for
+    repeated transforms of data frames, single records, or small batches of records.
+    Results are the same as ops.transform(X, data_model=data_model).
+    """
+
+    ops: Any
+    data_model: data_algebra.data_model.DataModel
+    strict: bool
+    table_name: str
+    column_names: List[str]
+
+    def __init__(self, ops, *, data_model=None, strict: bool = False):
+        """
+        :param ops: ViewRepresentation to apply, must use exactly one table
+        :param data_model: data model for execution, default is the Pandas model
+        :param strict: if True, throw on unexpected columns
+        """
+        assert isinstance(strict, bool)
+        if data_model is None:
+            data_model = data_algebra.data_model.default_data_model()
+        assert isinstance(data_model, data_algebra.data_model.DataModel)
+        ops.columns_used()  # for table consistency check/raise
+        tables = ops.get_tables()
+        if len(tables) != 1:
+            raise ValueError(
+                "PreparedTransform can only be applied to ops-dags with only one table def"
+            )
+        self.ops = ops
+        self.data_model = data_model
+        self.strict = strict
+        self.table_name = list(tables.keys())[0]
+        self.column_names = list(tables[self.table_name].column_names)
+        self._column_set = set(self.column_names)
+        self._evaluate = data_model.prepare_eval(ops)
+        self._evaluate_records = data_model.prepare_records_eval(ops)
+
+    def _check_columns(self, have: Iterable[str]) -> None:
+        have = set(have)
+        missing = self._column_set - have
+        if len(missing) > 0:
+            raise ValueError(
+                "Table "
+                + self.table_name
+                + " missing required columns: "
+                + str(missing)
+            )
+        if self.strict:
+            excess = have - self._column_set
+            if len(excess) > 0:
+                raise ValueError(
+                    "Table "
+                    + self.table_name
+                    + " excess columns columns: "
+                    + str(excess)
+                )
+
+    def transform(self, X):
+        """
+        Apply data transform to a table.
+
+        :param X: data frame to apply to
+        :return: transformed data frame
+        """
+        if not self.data_model.is_appropriate_data_instance(X):
+            raise ValueError(
+                f"type {type(X)} not appropriate for data model {self.data_model}"
+            )
+        self._check_columns(X.columns)
+        return self._evaluate({self.table_name: X})
+
+    def transform_record(self, record: Dict[str, Any]):
+        """
+        Apply data transform to a single row, given as a dictionary of column names to values.
+
+        :param record: dictionary mapping column names to scalar values
+        :return: transformed data frame
+        """
+        assert isinstance(record, dict)
+        self._check_columns(record.keys())
+        return self._evaluate_records([record])
+
+    def transform_records(self, records: Iterable[Dict[str, Any]]):
+        """
+        Apply data transform to a batch of rows, each given as a dictionary of column names to values.
+
+        :param records: dictionaries mapping column names to scalar values
+        :return: transformed data frame
+        """
+        records = list(records)
+        for record in records:
+            assert isinstance(record, dict)
+            self._check_columns(record.keys())
+        return self._evaluate_records(records)
@@ -0,0 +1,206 @@
+"""
+Holding intermediate results of an evaluation under a memory budget, spilling to local files.
+"""
+
+from collections import OrderedDict
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Optional
+
+have_pyarrow = False
+try:
+    # noinspection PyUnresolvedReferences
+    import pyarrow
+    import pyarrow.ipc
+
+    have_pyarrow = True
+except ImportError:
+    pass
+
+
+def _round_trips(frame, table) -> bool:
+    # object columns only come back as object columns if Arrow stores them as strings or dates,
+    # and Arrow nulls come back as None (so not as NaN or NaT)
+    for c, field in zip(frame.columns, table.schema):
+        if frame[c].dtype != object:
+            continue
+        if not (
+            pyarrow.types.is_string(field.type)
+            or pyarrow.types.is_large_string(field.type)
+            or pyarrow.types.is_date(field.type)
+        ):
+            return False
+        missing = frame[c].isna()
+        if missing.any() and any([v is not None for v in frame[c][missing]]):
+            return False
+    return True
+
+
+def write_frame(frame, path: str) -> str:
+    """
+    Write a Pandas data frame to path, as an Arrow IPC file if it can be read back with
+    the same column types and values, else pickled.
+
+    :param frame: data frame to write
+    :param path: file path, without suffix
+    :return: path written
+    """
+    if have_pyarrow:
+        try:
+            table = pyarrow.Table.from_pandas(frame, preserve_index=False)
+        except (pyarrow.ArrowException, TypeError, ValueError):
+            table = None  # for example mixed type object columns
+        if (table is not None) and _round_trips(frame, table):
+            arrow_path = path + ".arrow"
+            with pyarrow.OSFile(arrow_path, "wb") as sink:
+                with pyarrow.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            return arrow_path
+    pickle_path = path + ".pkl"
+    with open(pickle_path, "wb") as f:
+        pickle.dump(frame, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return pickle_path
+
+
+def read_frame(path: str):
+    """
+    Read a data frame written by write_frame(), memory mapping Arrow IPC files.
+
+    :param path: path returned by write_frame()
+    :return: data frame
+    """
+    if path.endswith(".arrow"):
+        with pyarrow.memory_map(path, "r") as source:
+            table = pyarrow.ipc.open_file(source).read_all()
+        return table.to_pandas()
+    with open(path, "rb") as f:
+        return pickle.load(f)
+
+
+class SpillingResults:
+    """
+    Dictionary-like store for the intermediate results an EvalState holds for later
+    consumers. When the held results exceed max_bytes, results are written to files in a
+    temporary directory, and read back when taken. The results spilled first are those
+    whose next consumer is furthest away (by next_use, else those stored longest ago).
+    The result just stored, and results about to be taken (next_use negative), stay in
+    memory. Results are removed (and their files deleted) when their last consumer takes them.
+    Safe to share between threads.
+    """
+
+    max_bytes: int
+    n_bytes: int
+    bytes_spilled: int
+    n_spilled: int
+    _in_memory: OrderedDict
+    _spilled: Dict[Any, str]
+
+    def __init__(
+        self,
+        *,
+        max_bytes: int,
+        frame_bytes: Callable[[Any], int],
+        write: Callable[[Any, str], str] = write_frame,
+        read: Callable[[str], Any] = read_frame,
+        directory: Optional[str] = None,
+        next_use: Optional[Callable[[Any], int]] = None,
+    ):
+        """
+        :param max_bytes: memory budget for held results, in bytes
+        :param frame_bytes: function estimating the size of a result in bytes
+        :param write: function writing a result to a path (without suffix), returning the path used
+        :param read: function reading a result written by write
+        :param directory: where to create the spill directory, default is the system temporary directory
+        :param next_use: function from key to evaluation order position of the result's next consumer
+        """
+        assert isinstance(max_bytes, int)
+        assert max_bytes > 0
+        self.max_bytes = max_bytes
+        self.n_bytes = 0
+        self.bytes_spilled = 0
+        self.n_spilled = 0
+        self._frame_bytes = frame_bytes
+        self._write = write
+        self._read = read
+        self._directory = directory
+        self._spill_dir = None
+        self._next_use = next_use
+        self._in_memory = OrderedDict()  # key -> (value, size)
+        self._spilled = dict()
+        self._lock = threading.RLock()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return (key in self._in_memory) or (key in self._spilled)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._in_memory) + len(self._spilled)
+
+    def __getitem__(self, key):
+        with self._lock:
+            try:
+                return self._in_memory[key][0]
+            except KeyError:
+                pass
+            return self._read(self._spilled[key])
+
+    def __setitem__(self, key, value) -> None:
+        n_bytes = int(self._frame_bytes(value))
+        with self._lock:
+            if key in self:
+                del self[key]
+            self._in_memory[key] = (value, n_bytes)
+            self.n_bytes = self.n_bytes + n_bytes
+            self._spill_cold(keep=key)
+
+    def __delitem__(self, key) -> None:
+        with self._lock:
+            try:
+                _, n_bytes = self._in_memory.pop(key)
+                self.n_bytes = self.n_bytes - n_bytes
+                return
+            except KeyError:
+                pass
+            os.remove(self._spilled.pop(key))
+
+    def _spill_cold(self, *, keep) -> None:
+        if self.n_bytes <= self.max_bytes:
+            return
+        candidates = [k for k in self._in_memory.keys() if k != keep]
+        if self._next_use is not None:
+            # furthest next use first, never results about to be taken (next use negative)
+            next_uses = {k: self._next_use(k) for k in candidates}
+            candidates = [k for k in candidates if next_uses[k] >= 0]
+            candidates.sort(key=lambda k: next_uses[k], reverse=True)
+        for k in candidates:
+            if self.n_bytes <= self.max_bytes:
+                return
+            value, n_bytes = self._in_memory[k]
+            if self._spill_dir is None:
+                self._spill_dir = tempfile.mkdtemp(
+                    prefix="data_algebra_spill_", dir=self._directory
+                )
+            path = self._write(
+                value, os.path.join(self._spill_dir, str(self.n_spilled))
+            )
+            del self._in_memory[k]
+            self._spilled[k] = path
+            self.n_bytes = self.n_bytes - n_bytes
+            self.bytes_spilled = self.bytes_spilled + n_bytes
+            self.n_spilled = self.n_spilled + 1
+
+    def close(self) -> None:
+        """
+        Drop all held results and delete spill files.
+        """
+        with self._lock:
+            self._in_memory.clear()
+            self._spilled.clear()
+            self.n_bytes = 0
+            if self._spill_dir is not None:
+                shutil.rmtree(self._spill_dir, ignore_errors=True)
+                self._spill_dir = None
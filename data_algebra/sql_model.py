@@ -16,6 +16,7 @@ import data_algebra.expr_rep
 import data_algebra.util
 import data_algebra.data_ops_types
 import data_algebra.data_ops
+import data_algebra.view_representations
 from data_algebra.OrderedSet import OrderedSet
 import data_algebra.op_catalog
 from data_algebra.sql_format_options import SQLFormatOptions
@@ -791,6 +792,7 @@ class SQLModel:
         default_SQL_format_options=None,
         union_all_term_start: str = "(",
         union_all_term_end: str = ")",
+        hoist_common_subexpressions: bool = True,
     ):
         if sql_formatters is None:
             sql_formatters = {}
@@ -819,6 +821,9 @@ class SQLModel:
         self.allow_extend_merges = allow_extend_merges
         self.union_all_term_start = union_all_term_start
         self.union_all_term_end = union_all_term_end
+        # compute repeated sub-expressions once, in inner selects
+        assert isinstance(hoist_common_subexpressions, bool)
+        self.hoist_common_subexpressions = hoist_common_subexpressions
         self.known_methods = None
         self.recommended_methods = None
         if str(self) in data_algebra.op_catalog.methods_table.columns:
@@ -1076,6 +1081,25 @@ class SQLModel:
         missing = using - set(extend_node.column_names)
         if len(missing) > 0:
             raise KeyError("referred to unknown columns: " + str(missing))
+        if self.hoist_common_subexpressions and not (
+            extend_node.windowed_situation
+            or (len(extend_node.partition_by) > 0)
+            or (len(extend_node.order_by) > 0)
+        ):
+            # compute repeated sub-expressions once, in an inner select
+            # (only nested ones, an inner select costs more than re-computing x + y)
+            stages = data_algebra.expr_rep.factor_common_subexpressions(
+                subops, reserved_names=extend_node.column_names, min_depth=2
+            )
+            if len(stages) > 1:
+                factored = extend_node.sources[0]
+                for stage in stages:
+                    factored = data_algebra.view_representations.ExtendNode(
+                        source=factored, parsed_ops=stage
+                    )
+                return factored.to_near_sql_implementation_(
+                    db_model=self, using=using, temp_id_source=temp_id_source
+                )
         # get set of columns we need from subquery
         subusing = extend_node.columns_used_from_sources(using=using)[0]
         subsql = extend_node.sources[0].to_near_sql_implementation_(
@@ -1249,6 +1273,26 @@ class SQLModel:
             temp_id_source = [0]
         if using is None:
             using = OrderedSet(select_rows_node.column_names)
+        # compute repeated (nested) sub-expressions once, in an inner select
+        stages = [select_rows_node.ops]
+        if self.hoist_common_subexpressions:
+            stages = data_algebra.expr_rep.factor_common_subexpressions(
+                select_rows_node.ops,
+                reserved_names=select_rows_node.column_names,
+                min_depth=2,
+            )
+        if len(stages) > 1:
+            factored = select_rows_node.sources[0]
+            for stage in stages[:-1]:
+                factored = data_algebra.view_representations.ExtendNode(
+                    source=factored, parsed_ops=stage
+                )
+            factored = data_algebra.view_representations.SelectRowsNode(
+                source=factored, ops=stages[-1]
+            )
+            return factored.to_near_sql_implementation_(
+                db_model=self, using=using, temp_id_source=temp_id_source
+            )
         subusing = select_rows_node.columns_used_from_sources(using=using)[0]
         subsql = select_rows_node.sources[0].to_near_sql_implementation_(
             db_model=self, using=subusing, temp_id_source=temp_id_source
@@ -4,7 +4,7 @@ Basic utilities. Not allowed to import many other modules.
 
 import datetime
 import warnings
-from typing import Dict, Iterable, Optional, Tuple
+from typing import Callable, Dict, Iterable, Optional, Tuple
 
 import numpy
 
@@ -230,3 +230,27 @@ def check_columns_appear_compatible(
     if len(mismatches) > 0:
         return mismatches
     return None
+
+
+def first_repeated_hash(
+    n_rows: int,
+    hash_rows: Callable[[int, int], numpy.ndarray],
+    *,
+    chunk_size: int = 1 << 16,
+) -> Optional[int]:
+    """
+    Scan row hashes a chunk at a time, stopping at the first chunk that repeats a hash.
+
+    :param n_rows: number of rows
+    :param hash_rows: function mapping (start, end) to the hashes of rows start through end - 1
+    :param chunk_size: rows hashed per step
+    :return: end of the first chunk containing a repeated hash (a duplicate row or a hash collision), None if all hashes are distinct
+    """
+    assert chunk_size > 0
+    seen = set()
+    for start in range(0, n_rows, chunk_size):
+        end = min(n_rows, start + chunk_size)
+        seen.update(numpy.asarray(hash_rows(start, end)).tolist())
+        if len(seen) < end:
+            return end
+    return None
@@ -17,6 +17,7 @@ import data_algebra.expr_rep
 from data_algebra.data_ops_types import MethodUse, OperatorPlatform
 import data_algebra.data_ops_utils
 import data_algebra.near_sql
+import data_algebra.prepared_transform
 from data_algebra.OrderedSet import (
     OrderedSet,
     ordered_intersect,
@@ -573,6 +574,24 @@ class ViewRepresentation(OperatorPlatform, abc.ABC):
             strict=strict,
         )
 
+    def prepare(
+        self,
+        *,
+        data_model=None,
+        strict: bool = False,
+    ) -> data_algebra.prepared_transform.PreparedTransform:
+        """
+        Check and plan this single table operator DAG once, for repeated low-latency transforms
+        (including of single records or small batches of records).
+
+        :param data_model: data model for execution, default is the Pandas model
+        :param strict: if True, throw on unexpected columns
+        :return: PreparedTransform
+        """
+        return data_algebra.prepared_transform.PreparedTransform(
+            self, data_model=data_model, strict=strict
+        )
+
     # composition (used to eliminate intermediate order nodes)
 
     def is_trivial_when_intermediate_(self) -> bool:
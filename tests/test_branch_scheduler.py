@@ -0,0 +1,117 @@
+
+import threading
+
+import pytest
+
+import data_algebra
+import data_algebra.branch_scheduler
+import data_algebra.eval_state
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def _star_example(pd):
+    fact = pd.DataFrame(
+        {"k1": [1, 2, 3, 1], "k2": ["a", "b", "a", "c"], "v": [1.0, 2.0, 3.0, 4.0]}
+    )
+    d1 = pd.DataFrame({"k1": [1, 2, 3], "w1": [10, 20, 30]})
+    d2 = pd.DataFrame({"k2": ["a", "b", "c"], "w2": [0.1, 0.2, 0.3]})
+    fact_table = descr(fact=fact)
+    ops = (
+        fact_table.natural_join(
+            b=descr(d1=d1).extend({"w1": "w1 * 2"}), on=["k1"], jointype="left"
+        )
+        .natural_join(
+            b=descr(d2=d2).select_rows("w2 > 0.15"), on=["k2"], jointype="left"
+        )
+        .concat_rows(b=fact_table.extend({"w1": 0, "w2": 0.0}))
+        .extend({"score": "v * w1"})
+    )
+    return ops, {"fact": fact, "d1": d1, "d2": d2}
+
+
+def test_task_roots():
+    pd = data_algebra.data_model.default_data_model().pd
+    ops, data_map = _star_example(pd)
+    eval_state = data_algebra.eval_state.EvalState(ops)
+    roots = data_algebra.branch_scheduler.task_roots(ops, eval_state.consumer_counts)
+    root_ids = [id(node) for node in roots]
+    concat = ops.sources[0]
+    join_2, fact_extend = concat.sources
+    join_1, d2_select = join_2.sources
+    fact_table, d1_extend = join_1.sources
+    assert set(root_ids) == {
+        id(ops),
+        id(join_2),
+        id(fact_extend),
+        id(join_1),
+        id(d2_select),
+        id(fact_table),
+        id(d1_extend),
+    }
+    # sources before consumers
+    assert root_ids[-1] == id(ops)
+    assert root_ids.index(id(fact_table)) < root_ids.index(id(join_1))
+    assert root_ids.index(id(join_1)) < root_ids.index(id(join_2))
+    # the concat step is part of the root's task
+    assert data_algebra.branch_scheduler.task_dependencies(ops, set(root_ids)) == {
+        id(join_2),
+        id(fact_extend),
+    }
+    assert data_algebra.branch_scheduler.task_dependencies(
+        fact_extend, set(root_ids)
+    ) == {id(fact_table)}
+
+
+def test_branch_workers_pandas():
+    pd = data_algebra.data_model.default_data_model().pd
+    ops, data_map = _star_example(pd)
+    expect = ops.eval(data_map)
+    model = data_algebra.pandas_model.PandasModel(max_branch_workers=3)
+    res = model.eval(ops, data_map=data_map)
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    # independent branches really run at the same time (the barrier times out otherwise)
+    threads_seen = set()
+    both_dimensions = threading.Barrier(2, timeout=10)
+    original = model._table_step
+
+    def _noting_table_step(op, *, data_map, eval_state=None):
+        threads_seen.add(threading.get_ident())
+        if op.table_name in ["d1", "d2"]:
+            both_dimensions.wait()
+        return original(op, data_map=data_map, eval_state=eval_state)
+
+    model._method_dispatch_table["TableDescription"] = _noting_table_step
+    res = model.eval(ops, data_map=data_map)
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    assert len(threads_seen) > 1
+
+
+def test_branch_workers_shared_evaluated_once():
+    pd = data_algebra.data_model.default_data_model().pd
+    ops, data_map = _star_example(pd)
+    expect = ops.eval(data_map)
+    model = data_algebra.pandas_model.PandasModel(max_branch_workers=4)
+    tables_read = []
+    original = model._table_step
+
+    def _counting_table_step(op, *, data_map, eval_state=None):
+        tables_read.append(op.table_name)
+        return original(op, data_map=data_map, eval_state=eval_state)
+
+    model._method_dispatch_table["TableDescription"] = _counting_table_step
+    for i in range(5):
+        tables_read.clear()
+        res = model.eval(ops, data_map=data_map)
+        assert data_algebra.test_util.equivalent_frames(res, expect)
+        assert sorted(tables_read) == ["d1", "d2", "fact"]
+
+
+def test_branch_workers_raise():
+    pd = data_algebra.data_model.default_data_model().pd
+    ops, data_map = _star_example(pd)
+    model = data_algebra.pandas_model.PandasModel(max_branch_workers=4)
+    bad_map = {k: v for k, v in data_map.items() if k != "d2"}
+    with pytest.raises(KeyError):
+        model.eval(ops, data_map=bad_map)
@@ -0,0 +1,106 @@
+
+import pytest
+
+import data_algebra
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+from data_algebra.cdata import RecordMap, RecordSpecification
+
+
+def _chunks(d, size):
+    return [d.iloc[i : (i + size), :] for i in range(0, d.shape[0], size)]
+
+
+def test_chunked_eval_row_local():
+    pd = data_algebra.data_model.default_data_model().pd
+    model = data_algebra.data_model.default_data_model()
+    d = pd.DataFrame(
+        {"id": [1, 2, 3, 4, 5], "a": [1.0, 2.0, 3.0, 4.0, 5.0], "b": [5, 4, 3, 2, 1]}
+    )
+    ops = (
+        descr(d=d)
+        .extend({"z": "a * b"})
+        .select_rows("z > 4")
+        .select_columns(["id", "a", "z"])
+    )
+    res = list(model.eval_chunked(ops, chunks=_chunks(d, 2)))
+    assert len(res) == 3
+    expect = ops.transform(d)
+    assert data_algebra.test_util.equivalent_frames(model.concat_rows(res), expect)
+    record_map = RecordMap(
+        blocks_out=RecordSpecification(
+            pd.DataFrame({"measure": ["a", "b"], "value": ["a", "b"]}),
+            record_keys=["id"],
+            control_table_keys=["measure"],
+        ),
+    )
+    ops = descr(d=d).convert_records(record_map)
+    res = model.concat_rows(list(model.eval_chunked(ops, chunks=_chunks(d, 2))))
+    expect = ops.transform(d)
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+
+
+def test_chunked_eval_project():
+    pd = data_algebra.data_model.default_data_model().pd
+    model = data_algebra.data_model.default_data_model()
+    d = pd.DataFrame(
+        {
+            "g": ["a", "b", "a", "b", "c", "a", "c"],
+            "x": [1.0, 2.0, 3.0, None, 5.0, 6.0, 7.0],
+            "y": [1, 2, 3, 4, 5, 6, 7],
+        }
+    )
+    aggs = {
+        "s": "z.sum()",
+        "m": "x.mean()",
+        "c": "x.count()",
+        "mn": "y.min()",
+        "mx": "y.max()",
+        "n": "_size()",
+    }
+    for group_by in [["g"], []]:
+        ops = descr(d=d).extend({"z": "x * 2"}).project(aggs, group_by=group_by)
+        expect = ops.transform(d)
+        for size in [1, 3, 10]:
+            res = list(
+                model.eval_chunked(ops, chunks=_chunks(d, size), partials_per_combine=2)
+            )
+            assert len(res) == 1
+            assert data_algebra.test_util.equivalent_frames(res[0], expect)
+    ops = descr(d=d).project({"n": "_size()"}, group_by=["g"])
+    res = list(model.eval_chunked(ops, chunks=[]))
+    assert len(res) == 1
+    assert res[0].shape[0] == 0
+
+
+def test_chunked_eval_rejects():
+    pd = data_algebra.data_model.default_data_model().pd
+    model = data_algebra.data_model.default_data_model()
+    d = pd.DataFrame({"g": ["a", "b"], "x": [1.0, 2.0]})
+    bad_ops = [
+        descr(d=d).extend({"z": "x.cumsum()"}, partition_by=["g"], order_by=["x"]),
+        descr(d=d).order_rows(["x"]),
+        descr(d=d).project({"z": "x.median()"}, group_by=["g"]),
+        descr(d=d).project({"z": "x.sum()"}, group_by=["g"]).extend({"q": "z + 1"}),
+    ]
+    for ops in bad_ops:
+        with pytest.raises(ValueError):
+            list(model.eval_chunked(ops, chunks=[d]))
+
+
+def test_chunked_eval_rejects_whole_column_functions():
+    pd = data_algebra.data_model.default_data_model().pd
+    model = data_algebra.data_model.default_data_model()
+    d = pd.DataFrame({"a": [1, 2, 3, 4, 5, 6], "b": [1, 1, 1, 1, 1, 1]})
+    # co_equalizer links rows across chunks, so can not be computed chunk by chunk
+    ops = descr(d=d).extend({"c": "a.co_equalizer(b)"})
+    assert list(ops.transform(d)["c"]) == [1, 1, 1, 1, 1, 1]
+    with pytest.raises(ValueError):
+        list(model.eval_chunked(ops, chunks=_chunks(d, 2)))
+    ops = descr(d=d).extend({"z": "a.sqrt()"})
+    model = data_algebra.pandas_model.PandasModel()
+    assert len(list(model.eval_chunked(ops, chunks=_chunks(d, 2)))) == 3
+    model.user_fun_map["sqrt"] = lambda x: x - x.min()
+    with pytest.raises(ValueError):
+        list(model.eval_chunked(ops, chunks=_chunks(d, 2)))
@@ -0,0 +1,172 @@
+import numpy
+
+import data_algebra
+import data_algebra.expr_rep
+import data_algebra.pandas_model
+import data_algebra.PostgreSQL
+import data_algebra.SQLite
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+have_polars = False
+try:
+    import polars as pl
+    import data_algebra.polars_model
+
+    have_polars = True
+except ModuleNotFoundError:
+    pass
+
+
+def test_factor_common_subexpressions():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"x": [1.0], "m": [1.0], "s": [1.0]})
+    ops = descr(d=d).extend(
+        {
+            "a": "((x - m) / s) * 2",
+            "b": "((x - m) / s) + 1",
+            "c": "(x - m).abs()",
+            "e": "x + 1",
+        }
+    )
+    stages = data_algebra.expr_rep.factor_common_subexpressions(
+        ops.ops, reserved_names=d.columns
+    )
+    assert len(stages) == 3
+    assert {k: str(v) for k, v in stages[0].items()} == {"_da_cse_1": "x - m"}
+    assert {k: str(v) for k, v in stages[1].items()} == {"_da_cse_0": "_da_cse_1 / s"}
+    assert {k: str(v) for k, v in stages[2].items()} == {
+        "a": "_da_cse_0 * 2",
+        "b": "_da_cse_0 + 1",
+        "c": "_da_cse_1.abs()",
+        "e": "x + 1",
+    }
+    # temporary names avoid existing columns
+    stages = data_algebra.expr_rep.factor_common_subexpressions(
+        ops.ops, reserved_names=["_da_cse_0"]
+    )
+    assert "__da_cse_0" in stages[1].keys()
+    # nothing shared, ops returned as is
+    ops2 = descr(d=d).extend({"a": "x + 1", "b": "x + 2"})
+    stages = data_algebra.expr_rep.factor_common_subexpressions(
+        ops2.ops, reserved_names=d.columns
+    )
+    assert len(stages) == 1
+    assert stages[0] is ops2.ops
+
+
+def test_factor_common_subexpressions_keeps_random_and_literal_types():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"x": [1.0]})
+    ops = descr(d=d).extend({"a": "_uniform() + x", "b": "_uniform() + x"})
+    stages = data_algebra.expr_rep.factor_common_subexpressions(
+        ops.ops, reserved_names=d.columns
+    )
+    assert len(stages) == 1
+    ops = descr(d=d).extend({"a": "(x + 1) * 2", "b": "(x + 1.0) * 3"})
+    stages = data_algebra.expr_rep.factor_common_subexpressions(
+        ops.ops, reserved_names=d.columns
+    )
+    assert len(stages) == 1
+    assert data_algebra.expr_rep.term_key(
+        ops.ops["a"].args[0]
+    ) != data_algebra.expr_rep.term_key(ops.ops["b"].args[0])
+
+
+def test_common_subexpressions_eval():
+    pd = data_algebra.data_model.default_data_model().pd
+    rng = numpy.random.default_rng(2023)
+    n = 50
+    d = pd.DataFrame(
+        {
+            "x": rng.normal(size=n),
+            "m": rng.normal(size=n),
+            "s": rng.uniform(1, 2, size=n),
+        }
+    )
+    ops = (
+        descr(d=d)
+        .extend(
+            {
+                "a": "((x - m) / s) * 2",
+                "b": "((x - m) / s) + 1",
+                "c": "(x - m).abs()",
+            }
+        )
+        .select_rows("((x - m) / s) * ((x - m) / s) > 0.25")
+    )
+    z = (d["x"] - d["m"]) / d["s"]
+    expect = d.copy()
+    expect["a"] = z * 2
+    expect["b"] = z + 1
+    expect["c"] = (d["x"] - d["m"]).abs()
+    expect = expect.loc[z * z > 0.25, :].reset_index(drop=True)
+    data_algebra.test_util.check_transform(ops=ops, data=d, expect=expect)
+    # temporary columns are not part of the result
+    res = data_algebra.pandas_model.PandasModel().eval(ops, data_map={"d": d})
+    assert list(res.columns) == ["x", "m", "s", "a", "b", "c"]
+    # shared nested sub-expressions are in an inner select, simple ones are not
+    sql = data_algebra.SQLite.SQLiteModel().to_sql(ops)
+    assert '("x" - "m") / "s" AS "_da_cse_0"' in sql
+    assert sql.count('("x" - "m") / "s"') == 2  # once for the extend, once for select_rows
+    assert 'ABS("x" - "m") AS "c"' in sql
+
+
+def test_common_subexpressions_not_hoisted_out_of_conditionals():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"x": [1.0, 2.0, 3.0], "y": [0.0, 2.0, 1.0]})
+    db_model = data_algebra.PostgreSQL.PostgreSQLModel()
+    # division only evaluated where guarded, so stays inside the CASE
+    ops = descr(d=d).extend({"r": "(y != 0).if_else(x / y + x / y, 0)"})
+    stages = data_algebra.expr_rep.factor_common_subexpressions(
+        ops.ops, reserved_names=d.columns
+    )
+    assert len(stages) == 1
+    sql = db_model.to_sql(ops)
+    assert "_da_cse_" not in sql
+    expect = d.copy()
+    expect["r"] = [0.0, 2.0, 6.0]
+    data_algebra.test_util.check_transform(ops=ops, data=d, expect=expect)
+    ops = descr(d=d).extend({"r": "x.coalesce(y / x + y / x)"})
+    assert "_da_cse_" not in db_model.to_sql(ops)
+    # also computed unguarded, so computed once for every row
+    ops = descr(d=d).extend(
+        {
+            "r": "(y != 0).if_else((x / y).abs() + (x / y).abs(), 0)",
+            "q": "(x / y).abs().is_inf()",
+        }
+    )
+    sql = db_model.to_sql(ops)
+    assert 'ABS("x" / "y") AS "_da_cse_0"' in sql
+
+
+def test_common_subexpressions_cross_engine():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"x": [1.0, 2.0, 3.0], "y": [2.0, -1.0, 0.5]})
+    expect = d.copy()
+    expect["a"] = (d["x"] + d["y"]) * 2
+    expect["b"] = (d["x"] + d["y"]) * 3
+    expect["c"] = ((d["x"] + d["y"]) * 2).abs() + 1
+    expect["e"] = ((d["x"] + d["y"]) * 2).abs() - 1
+    # simple repeated sub-expressions are left in place in SQL
+    assert "_da_cse_" not in data_algebra.SQLite.SQLiteModel().to_sql(
+        descr(d=d).extend({"a": "(x + y) * 2", "b": "(x + y) * 3"})
+    )
+    for ops in [
+        descr(d=d).extend({"a": "(x + y) * 2", "b": "(x + y) * 3"}),
+        descr(d=d).extend(
+            {
+                "a": "(x + y) * 2",
+                "b": "(x + y) * 3",
+                "c": "((x + y) * 2).abs() + 1",
+                "e": "((x + y) * 2).abs() - 1",
+            }
+        ),
+    ]:
+        expect_i = expect.loc[:, ops.column_names]
+        data_algebra.test_util.check_transform(ops=ops, data=d, expect=expect_i)
+        if not have_polars:
+            continue
+        model = data_algebra.polars_model.PolarsModel()
+        res = model.eval_as_sql(ops, data_map={"d": pl.DataFrame(d)})
+        assert data_algebra.test_util.equivalent_frames(res.to_pandas(), expect_i)
@@ -0,0 +1,96 @@
+
+import os
+import pickle
+import subprocess
+import sys
+
+import numpy
+
+import data_algebra
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def _example_ops(d):
+    return (
+        descr(d=d)
+        .extend({"z": "x.cumsum()"}, partition_by=["g"], order_by=["o"])
+        .extend({"w": "2 * x + z"})
+        .select_rows("w > 2")
+        .order_rows(["o"], limit=4)
+    )
+
+
+def _example_data(pd):
+    return pd.DataFrame(
+        {
+            "g": ["a", "b"] * 50,
+            "o": list(range(100)),
+            "x": [float(i) for i in range(100)],
+        }
+    )
+
+
+# copy on write can only be turned on for a whole Pandas session, so is run in its own process
+_copy_on_write_script = """
+import pickle
+import sys
+
+import numpy
+import pandas as pd
+
+import data_algebra
+import data_algebra.pandas_model
+import data_algebra.test_util
+
+with open(sys.argv[1], "rb") as f:
+    ops, d = pickle.load(f)
+model = data_algebra.pandas_model.PandasModel()
+assert model.copy_on_write_enabled()
+d_orig = d.copy()
+res, profile = model.profile_eval(ops, data_map={"d": d})
+# writes to the result do not reach the input
+res_out = res.copy()
+res["x"] = numpy.nan
+res.loc[0, "o"] = -1
+assert data_algebra.test_util.equivalent_frames(d, d_orig)
+with open(sys.argv[1], "wb") as f:
+    pickle.dump((res_out, profile.bytes_copied), f)
+"""
+
+
+def test_copy_on_write_bytes_copied(tmp_path):
+    pd = data_algebra.data_model.default_data_model().pd
+    d = _example_data(pd)
+    d_orig = d.copy()
+    ops = _example_ops(d)
+    model = data_algebra.pandas_model.PandasModel()
+    expect, profile = model.profile_eval(ops, data_map={"d": d})
+    assert data_algebra.test_util.equivalent_frames(expect, ops.transform(d))
+    if not model.copy_on_write_enabled():
+        # every step isolating itself copies
+        assert profile.bytes_copied >= model.frame_bytes(d)
+        res = expect.copy()
+        res["x"] = numpy.nan
+        assert data_algebra.test_util.equivalent_frames(d, d_orig)
+    path = str(tmp_path / "copy_on_write.pkl")
+    with open(path, "wb") as f:
+        pickle.dump((ops, d), f)
+    env = dict(os.environ)
+    env["PANDAS_COPY_ON_WRITE"] = "1"
+    # the same data_algebra as this process
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(os.path.abspath(data_algebra.__file__)))]
+        + [p for p in [env.get("PYTHONPATH", "")] if len(p) > 0]
+    )
+    subprocess.run(
+        [sys.executable, "-c", _copy_on_write_script, path], env=env, check=True
+    )
+    with open(path, "rb") as f:
+        res_cow, bytes_copied_cow = pickle.load(f)
+    assert data_algebra.test_util.equivalent_frames(res_cow, expect)
+    # copies are deferred, and never made
+    assert bytes_copied_cow == 0
+    if not model.copy_on_write_enabled():
+        assert bytes_copied_cow < profile.bytes_copied
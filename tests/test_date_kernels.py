@@ -0,0 +1,50 @@
+
+import datetime
+
+import data_algebra
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def _base_Sunday(d):
+    return d - datetime.timedelta(days=(d.weekday() + 1) % 7)
+
+
+def test_date_kernels_match_row_by_row():
+    pd = data_algebra.data_model.default_data_model().pd
+    days = [
+        datetime.date(2000, 1, 1) + datetime.timedelta(days=i)
+        for i in range(0, 3000, 37)
+    ]
+    d = pd.DataFrame(
+        {
+            "d0": days,
+            "d1": list(reversed(days)),
+            # DST changes in this time zone do not move dates
+            "t0": pd.to_datetime(days).tz_localize("US/Pacific")
+            + pd.Timedelta(hours=23),
+        }
+    )
+    d.index = range(100, 100 + d.shape[0])
+    ops = descr(d=d).extend(
+        {
+            "date_diff": "d0.date_diff(d1)",
+            "t_date_diff": "t0.date_diff(d1)",
+            "base_Sunday": "d0.base_Sunday()",
+            "weekofyear": "d0.weekofyear()",
+            "dayofweek": "d0.dayofweek()",
+            "quarter": "d0.quarter()",
+            "timestamp_diff": "t0.timestamp_diff(t0)",
+        }
+    )
+    res = ops.transform(d)
+    assert list(res["date_diff"]) == [(a - b).days for a, b in zip(d["d0"], d["d1"])]
+    assert list(res["t_date_diff"]) == list(res["date_diff"])
+    assert list(res["base_Sunday"]) == [_base_Sunday(a) for a in d["d0"]]
+    assert list(res["weekofyear"]) == [
+        max(1, (a - _base_Sunday(datetime.date(a.year, 1, 1))).days // 7)
+        for a in d["d0"]
+    ]
+    assert list(res["dayofweek"]) == [1 + (a.weekday() + 1) % 7 for a in d["d0"]]
+    assert list(res["quarter"]) == [1 + (a.month - 1) // 3 for a in d["d0"]]
+    assert list(res["timestamp_diff"]) == [0.0] * d.shape[0]
@@ -0,0 +1,73 @@
+
+import data_algebra
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def _example(pd):
+    d = pd.DataFrame({"a": [1, 2, 3], "b": [2, 3, 4], "g": ["x", "y", "x"]})
+    table = descr(d=d)
+    ops = (
+        table.extend({"c": "a + b"})
+        .select_rows("c > 3")
+        .natural_join(
+            b=table.project({"n": "_size()"}, group_by=["g"]),
+            on=["g"],
+            jointype="left",
+        )
+        .order_rows(["a"])
+    )
+    return d, ops
+
+
+def test_eval_profile_pandas():
+    pd = data_algebra.data_model.default_data_model().pd
+    d, ops = _example(pd)
+    model = data_algebra.pandas_model.PandasModel()
+    res, profile = model.profile_eval(ops, data_map={"d": d}, trace_memory=True)
+    assert data_algebra.test_util.equivalent_frames(res, ops.eval({"d": d}))
+    records = profile.records(ops)
+    by_name = {r["node_name"]: r for r in records}
+    # the extend is fused into the row selection
+    assert "ExtendNode" not in by_name.keys()
+    assert by_name["SelectRowsNode"]["fused_node_names"] == ["ExtendNode"]
+    assert by_name["SelectRowsNode"]["rows_in"] == 3
+    assert by_name["SelectRowsNode"]["rows_out"] == 2
+    assert by_name["ProjectNode"]["rows_out"] == 2
+    assert by_name["NaturalJoinNode"]["rows_in"] == 4
+    assert by_name["OrderRowsNode"]["columns_out"] == 5
+    assert by_name["TableDescription"]["calls"] == 1
+    for r in records:
+        assert r["wall_seconds"] >= 0
+        assert r["bytes_allocated"] is not None
+    report = profile.explain(ops)
+    assert report.count("\n") == 12
+    assert "fused into step" in report
+    assert "[4].order_rows(['a'])" in report
+    # profiling is off by default
+    res, profile = model.profile_eval(ops, data_map={"d": d})
+    assert all([r["bytes_allocated"] is None for r in profile.records(ops)])
+
+
+def test_eval_profile_polars():
+    have_polars = False
+    try:
+        import polars as pl
+        import data_algebra.polars_model
+
+        have_polars = True
+    except ModuleNotFoundError:
+        pass
+    if not have_polars:
+        return
+    pd = data_algebra.data_model.default_data_model().pd
+    d, ops = _example(pd)
+    model = data_algebra.polars_model.PolarsModel()
+    res, profile = model.profile_eval(ops, data_map={"d": pl.from_pandas(d)})
+    assert data_algebra.test_util.equivalent_frames(res.to_pandas(), ops.eval({"d": d}))
+    by_name = {r["node_name"]: r for r in profile.records(ops)}
+    assert by_name["SelectRowsNode"]["rows_out"] == 2
+    assert by_name["ExtendNode"]["rows_out"] == 3
+    # the shared table is composed once for all paths to it
+    assert by_name["TableDescription"]["calls"] == 1
@@ -0,0 +1,90 @@
+
+import data_algebra
+import data_algebra.eval_state
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def test_eval_state_count_consumers():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"k": [1, 2], "x": [3, 4]})
+    base = descr(d=d).extend({"y": "x + 1"})
+    ops = base.natural_join(base, on=["k"], jointype="inner")
+    counts = data_algebra.eval_state.count_consumers(ops)
+    assert counts[id(ops)] == 1
+    assert counts[id(base)] == 2
+    assert counts[id(base.sources[0])] == 1
+
+
+def test_eval_state_shared_node_evaluated_once():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"k": [1, 2, 3], "x": [3.0, 4.0, 5.0]})
+    base = descr(d=d).extend({"y": "x.cumsum()"}, order_by=["k"])
+    ops = base.natural_join(
+        base.extend({"z": "y * 2"}), on=["k"], jointype="inner"
+    ).concat_rows(base.extend({"z": "y * 3"}))
+    model = data_algebra.pandas_model.PandasModel()
+    extend_calls = []
+    orig_extend_step = model._method_dispatch_table["ExtendNode"]
+
+    def counting_extend_step(op, **kwargs):
+        extend_calls.append(id(op))
+        return orig_extend_step(op, **kwargs)
+
+    model._method_dispatch_table["ExtendNode"] = counting_extend_step
+    res = ops.eval({"d": d}, data_model=model)
+    assert extend_calls.count(id(base)) == 1
+    expect = pd.DataFrame(
+        {
+            "k": [1, 2, 3, 1, 2, 3],
+            "x": [3.0, 4.0, 5.0, 3.0, 4.0, 5.0],
+            "y": [3.0, 7.0, 12.0, 3.0, 7.0, 12.0],
+            "z": [6.0, 14.0, 24.0, 9.0, 21.0, 36.0],
+            "source_name": ["a", "a", "a", "b", "b", "b"],
+        }
+    )
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    # stand-alone evaluation of the shared node is not disturbed by its consumers
+    assert data_algebra.test_util.equivalent_frames(
+        base.eval({"d": d}), expect.loc[range(3), ["k", "x", "y"]]
+    )
+
+
+def test_eval_state_self_join():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"k": [1, 2], "x": [3, 4]})
+    base = descr(d=d).extend({"y": "x + 1"})
+    ops = base.natural_join(base, on=["k"], jointype="inner")
+    expect = pd.DataFrame({"k": [1, 2], "x": [3, 4], "y": [4, 5]})
+    data_algebra.test_util.check_transform(ops=ops, data=d, expect=expect)
+
+
+def test_eval_state_columns_needed():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({f"c{i}": [i, i + 1] for i in range(10)})
+    d["g"] = ["a", "b"]
+    ops = (
+        descr(d=d)
+        .extend({"y": "c1 + c2", "unused": "c3 * 2"})
+        .select_rows("c4 > 0")
+        .project({"y": "y.sum()"}, group_by=["g"])
+    )
+    needed = data_algebra.eval_state.columns_needed(ops)
+    table = ops.sources[0].sources[0].sources[0]
+    assert needed[id(table)] == {"c1", "c2", "c4", "g"}
+    assert needed[id(ops.sources[0])] == {"y", "g"}
+    res = ops.transform(d)
+    expect = pd.DataFrame({"g": ["a", "b"], "y": [3, 5]})
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+
+
+def test_eval_state_columns_needed_keeps_a_column():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"x": [1, 2, 3], "y": [4, 5, 6]})
+    ops = descr(d=d).project({"n": "_size()"})
+    needed = data_algebra.eval_state.columns_needed(ops)
+    assert needed[id(ops.sources[0])] == {"x"}
+    res = ops.transform(d)
+    expect = pd.DataFrame({"n": [3]})
+    assert data_algebra.test_util.equivalent_frames(res, expect)
@@ -0,0 +1,99 @@
+
+import data_algebra
+import data_algebra.join_index_cache
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def test_join_index_cache_reused_across_evals():
+    pd = data_algebra.data_model.default_data_model().pd
+    dim = pd.DataFrame({"k": [1, 2, 3], "name": ["a", "b", "c"], "v": [10, 20, 30]})
+    model = data_algebra.pandas_model.PandasModel(join_index_cache_bytes=1 << 20)
+    for jointype in ["left", "inner"]:
+        for batch in [
+            pd.DataFrame({"k": [3, 1, 4], "v": [None, 1.0, 2.0]}),
+            pd.DataFrame({"k": [2, 2, 5, 1], "v": [5.0, None, None, None]}),
+        ]:
+            ops = descr(fact=batch).natural_join(
+                b=descr(dim=dim), on=["k"], jointype=jointype
+            )
+            expect = ops.eval({"fact": batch, "dim": dim})
+            res = ops.eval({"fact": batch, "dim": dim}, data_model=model)
+            assert data_algebra.test_util.equivalent_frames(res, expect)
+    # only left joins use the index
+    assert model.join_index_cache.misses == 1
+    assert model.join_index_cache.hits == 1
+    # replacing a key column invalidates the entry
+    dim["k"] = [3, 2, 1]
+    batch = pd.DataFrame({"k": [1, 2]})
+    ops = descr(fact=batch).natural_join(b=descr(dim=dim), on=["k"], jointype="left")
+    res = ops.eval({"fact": batch, "dim": dim}, data_model=model)
+    assert list(res["name"]) == ["c", "b"]
+    assert model.join_index_cache.misses == 2
+
+
+def test_join_index_cache_row_order():
+    pd = data_algebra.data_model.default_data_model().pd
+    dim = pd.DataFrame({"k": [1, 2, 3], "name": ["a", "b", "c"]})
+    batch = pd.DataFrame({"k": [3, 1, 3, 2, 4], "x": [0, 1, 2, 3, 4]})
+    cached_model = data_algebra.pandas_model.PandasModel(join_index_cache_bytes=1 << 20)
+    plain_model = data_algebra.pandas_model.PandasModel()
+    for jointype in ["left", "inner"]:
+        ops = descr(fact=batch).natural_join(
+            b=descr(dim=dim), on=["k"], jointype=jointype
+        )
+        expect = ops.eval({"fact": batch, "dim": dim}, data_model=plain_model)
+        res = ops.eval({"fact": batch, "dim": dim}, data_model=cached_model)
+        assert data_algebra.test_util.equivalent_frames(
+            res, expect, check_row_order=True
+        )
+
+
+def test_join_index_cache_non_unique_keys():
+    pd = data_algebra.data_model.default_data_model().pd
+    dim = pd.DataFrame({"k": [1, 1, 2], "name": ["a", "b", "c"]})
+    batch = pd.DataFrame({"k": [1, 2]})
+    ops = descr(fact=batch).natural_join(b=descr(dim=dim), on=["k"], jointype="left")
+    model = data_algebra.pandas_model.PandasModel(join_index_cache_bytes=1 << 20)
+    res = ops.eval({"fact": batch, "dim": dim}, data_model=model)
+    expect = pd.DataFrame({"k": [1, 1, 2], "name": ["a", "b", "c"]})
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+
+
+def test_join_index_cache_lru_eviction():
+    pd = data_algebra.data_model.default_data_model().pd
+    cache = data_algebra.join_index_cache.JoinIndexCache(max_bytes=100)
+    frames = [pd.DataFrame({"k": [i]}) for i in range(3)]
+    for d in frames:
+        cache.get(d, ["k"], fingerprint=0, build=lambda: ("index", 40))
+    assert len(cache) == 2
+    assert cache.n_bytes == 80
+    cache.get(frames[1], ["k"], fingerprint=0, build=lambda: ("index", 40))
+    assert cache.hits == 1
+    cache.get(frames[0], ["k"], fingerprint=0, build=lambda: ("index", 40))
+    assert cache.misses == 4
+    # too large to keep
+    cache.get(frames[2], ["x"], fingerprint=0, build=lambda: ("index", 200))
+    assert len(cache) == 2
+    del frames
+    assert len(cache) == 0
+    assert cache.n_bytes == 0
+
+
+def test_join_index_cache_keys_altered_in_place():
+    pd = data_algebra.data_model.default_data_model().pd
+    model = data_algebra.pandas_model.PandasModel(join_index_cache_bytes=1 << 20)
+    for keys, new_key in [([1, 2, 3], 4), (["x", "y", "z"], "w")]:
+        dim = pd.DataFrame({"k": keys, "name": ["a", "b", "c"]})
+        batch = pd.DataFrame({"k": [keys[0], new_key, keys[2]]})
+        ops = descr(fact=batch).natural_join(
+            b=descr(dim=dim), on=["k"], jointype="left"
+        )
+        res = ops.eval({"fact": batch, "dim": dim}, data_model=model)
+        assert list(res["name"].fillna("")) == ["a", "", "c"]
+        dim.loc[0, "k"] = new_key
+        res = ops.eval({"fact": batch, "dim": dim}, data_model=model)
+        expect = ops.eval({"fact": batch, "dim": dim})
+        assert data_algebra.test_util.equivalent_frames(res, expect)
+        assert list(res["name"].fillna("")) == ["", "a", "c"]
@@ -80,3 +80,37 @@ def test_natural_join_columns_on_by_excl():
         ops4 = describe_table(d, "d").natural_join(
             b=describe_table(d2, "d2"), on=["y"], by=["x"], jointype="LEFT"
         )
+
+
+def test_natural_join_coalesce_many_columns():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "k": [1, 2, 3],
+            "a": [1.0, None, None],
+            "b": ["x", None, "z"],
+            "c": [7, 8, 9],
+        }
+    )
+    d2 = pd.DataFrame(
+        {
+            "k": [2, 3, 4],
+            "a": [20.0, None, 40.0],
+            "b": ["yy", "zz", "ww"],
+            "c": [80, 90, 100],
+        }
+    )
+    ops = describe_table(d, "d").natural_join(
+        b=describe_table(d2, "d2"), on=["k"], jointype="full"
+    )
+    expect = pd.DataFrame(
+        {
+            "k": [1, 2, 3, 4],
+            "a": [1.0, 20.0, None, 40.0],
+            "b": ["x", "yy", "z", "ww"],
+            "c": [7.0, 8.0, 9.0, 100.0],
+        }
+    )
+    data_algebra.test_util.check_transform(
+        ops=ops, data={"d": d, "d2": d2}, expect=expect
+    )
@@ -0,0 +1,83 @@
+
+import numpy
+
+import data_algebra
+import data_algebra.numexpr_eval
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def test_numexpr_translate():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "a": [1.0, 2.0],
+            "b": [1, 2],
+            "f": [True, False],
+            "s": ["x", "y"],
+        }
+    )
+    ops = descr(d=d).extend(
+        {
+            "z": "((a - b) / (a + 1) > 0.5) and (not f)",
+            "v": "f.if_else((a * b).sqrt(), 0.0)",
+            "w": "b.where((a * b).sqrt(), 0.0)",
+            "int_power": "b ** 2",
+            "string": "s == 'x'",
+            "sign": "a.sign()",
+        }
+    )
+    column_dtypes = {c: d[c].dtype for c in d.columns}
+    translated = {
+        k: data_algebra.numexpr_eval.translate_expression(
+            opk, column_dtypes=column_dtypes
+        )
+        for k, opk in ops.ops.items()
+    }
+    assert translated["z"] is not None
+    assert set(translated["z"][1].keys()) == {"a", "b", "f"}
+    assert translated["v"] is not None
+    assert translated["w"] is None  # b is not a boolean
+    # left to the expression walker
+    assert translated["int_power"] is None
+    assert translated["string"] is None
+    assert translated["sign"] is None
+
+
+def test_numexpr_eval_matches_walker():
+    if not data_algebra.numexpr_eval.have_numexpr:
+        return
+    pd = data_algebra.data_model.default_data_model().pd
+    rng = numpy.random.default_rng(2023)
+    d = pd.DataFrame(
+        {
+            "a": rng.normal(size=100),
+            "b": rng.integers(-5, 5, size=100),
+            "c": rng.normal(size=100),
+            "f": rng.integers(0, 2, size=100) == 1,
+            "s": ["x", "y"] * 50,
+        }
+    )
+    d.loc[3, "a"] = numpy.nan
+    ops = (
+        descr(d=d)
+        .extend(
+            {
+                "score": "(a - b) / (c + 1)",
+                "flag": "((a > 0.5) or f) and (b != 2)",
+                "m": "(a * b + c).exp() - c.abs().sqrt()",
+                "r": "a % 1.5",
+                "q": "b - 2 * b",
+                "g": "f.where(b, 0)",
+                "p": "s.concat('_')",
+            }
+        )
+        .select_rows("(score > -1.0) or (m >= 0.0)")
+    )
+    model = data_algebra.pandas_model.PandasModel(use_numexpr=True, numexpr_min_rows=0)
+    res = ops.eval({"d": d}, data_model=model)
+    expect = ops.eval({"d": d})
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    assert res["flag"].dtype == bool
+    assert res["q"].dtype == expect["q"].dtype
@@ -0,0 +1,129 @@
+
+import concurrent.futures
+
+import data_algebra
+import data_algebra.pandas_model
+import data_algebra.partitioned_eval
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def _example_data(pd):
+    d = pd.DataFrame(
+        {
+            "g": [i % 7 for i in range(50)],
+            "x": [float((i * 13) % 11) for i in range(50)],
+        }
+    )
+    e = pd.DataFrame({"g": list(range(5)), "w": [0.5 * i for i in range(5)]})
+    return d, e
+
+
+def test_partitioned_eval():
+    pd = data_algebra.data_model.default_data_model().pd
+    d, e = _example_data(pd)
+    ops = (
+        descr(d=d)
+        .extend({"r": "_row_number()"}, partition_by=["g"], order_by=["x"])
+        .natural_join(b=descr(e=e), on=["g"], jointype="left")
+        .project({"s": "x.sum()", "n": "_size()", "w": "w.max()"}, group_by=["g"])
+        .order_rows(["g"])
+    )
+    assert data_algebra.partitioned_eval.find_partition_key(ops) == ["g"]
+    expect = ops.eval({"d": d, "e": e})
+    model = data_algebra.pandas_model.PandasModel()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        res = model.eval_partitioned(
+            ops, data_map={"d": d, "e": e}, n_partitions=3, executor=executor
+        )
+    assert data_algebra.test_util.equivalent_frames(res, expect, check_row_order=True)
+    # default process pool
+    res = model.eval_partitioned(ops, data_map={"d": d, "e": e}, n_partitions=2)
+    assert data_algebra.test_util.equivalent_frames(res, expect, check_row_order=True)
+
+
+def test_partitioned_eval_falls_back():
+    pd = data_algebra.data_model.default_data_model().pd
+    d, e = _example_data(pd)
+    not_partitionable = [
+        descr(d=d).project({"s": "x.sum()"}),
+        descr(d=d).extend({"r": "_row_number()"}, order_by=["x"]),
+        descr(d=d).rename_columns({"h": "g"}).project({"s": "x.sum()"}, group_by=["h"]),
+        descr(d=d).order_rows(["x"], limit=3).project({"s": "x.sum()"}, group_by=["g"]),
+    ]
+    model = data_algebra.pandas_model.PandasModel()
+    for ops in not_partitionable:
+        assert data_algebra.partitioned_eval.find_partition_key(ops) is None
+        res = model.eval_partitioned(ops, data_map={"d": d}, n_partitions=3)
+        assert data_algebra.test_util.equivalent_frames(res, ops.eval({"d": d}))
+    ops = descr(d=d).project({"s": "x.sum()"}, group_by=["g"])
+    assert not data_algebra.partitioned_eval.key_is_consistent(ops, ["x"])
+    res = model.eval_partitioned(ops, data_map={"d": d}, key=["x"], n_partitions=3)
+    assert data_algebra.test_util.equivalent_frames(res, ops.eval({"d": d}))
+
+
+def test_partitioned_eval_rejects_ngroup():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {"k": [i % 5 for i in range(20)], "x": [float(i) for i in range(20)]}
+    )
+    ops = descr(d=d).extend(
+        {"g": "_ngroup()", "cs": "x.cumsum()"}, partition_by=["k"], order_by=["x"]
+    )
+    assert data_algebra.partitioned_eval.find_partition_key(ops) is None
+    assert not data_algebra.partitioned_eval.key_is_consistent(ops, ["k"])
+    assert data_algebra.partitioned_eval.key_is_consistent(
+        descr(d=d).extend({"cs": "x.cumsum()"}, partition_by=["k"], order_by=["x"]),
+        ["k"],
+    )
+    model = data_algebra.pandas_model.PandasModel()
+    expect = ops.eval({"d": d})
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        res = model.eval_partitioned(
+            ops, data_map={"d": d}, key=["k"], n_partitions=3, executor=executor
+        )
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+
+
+def test_partitioned_eval_rejects_whole_column_functions():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "k": [i % 5 for i in range(20)],
+            "a": [i % 4 for i in range(20)],
+            "b": [(i + 1) % 4 for i in range(20)],
+        }
+    )
+    ops = descr(d=d).extend({"c": "a.co_equalizer(b)"})
+    assert not data_algebra.partitioned_eval.key_is_consistent(ops, ["k"])
+    model = data_algebra.pandas_model.PandasModel()
+    expect = ops.eval({"d": d})
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        res = model.eval_partitioned(
+            ops, data_map={"d": d}, key=["k"], n_partitions=3, executor=executor
+        )
+    assert data_algebra.test_util.equivalent_frames(res, expect, check_row_order=True)
+    # user functions may also look at the whole column
+    ops = descr(d=d).extend({"z": "a.sqrt()"}).project({"s": "z.sum()"}, group_by=["k"])
+    assert data_algebra.partitioned_eval.key_is_consistent(ops, ["k"])
+    assert not data_algebra.partitioned_eval.key_is_consistent(
+        ops, ["k"], excluded_fn_names=["sqrt"]
+    )
+
+
+def test_partitioned_eval_user_functions():
+    pd = data_algebra.data_model.default_data_model().pd
+    d, e = _example_data(pd)
+    ops = descr(d=d).extend({"z": "x.sqrt()"}).project({"s": "z.sum()"}, group_by=["g"])
+    model = data_algebra.pandas_model.PandasModel()
+    model.user_fun_map["sqrt"] = lambda x: x + 100.0
+    expect = ops.eval({"d": d}, data_model=model)
+    assert list(expect["s"]) != list(ops.eval({"d": d})["s"])
+    # user functions are used, whether partitions run in threads or other processes
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        res = model.eval_partitioned(
+            ops, data_map={"d": d}, n_partitions=3, executor=executor
+        )
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    res = model.eval_partitioned(ops, data_map={"d": d}, n_partitions=2)
+    assert data_algebra.test_util.equivalent_frames(res, expect)
@@ -756,3 +756,74 @@ def test_polars_minimum_1_issue():
         res = ops.transform(d)
         assert isinstance(res, pl.DataFrame)
         assert np.max(np.abs(np.array(res['xl'] - expect['xl']))) < 1e-8
+
+
+def test_polars_column_pruning():
+    if have_polars:
+        d = pl.DataFrame({f"c{i}": [i, i + 1, i + 2] for i in range(10)})
+        ops = (
+            data_algebra.descr(d=d)
+                .extend({"y": "c1 + c2", "unused": "c3 * 2"})
+                .rename_columns({"z": "y", "w": "c4"})
+                .select_rows("c5 > 0")
+                .order_rows(["c6"], limit=2)
+                .select_columns(["z", "w"])
+        )
+        res = ops.transform(d)
+        expect = pl.DataFrame({"z": [3, 5], "w": [4, 5]})
+        assert data_algebra.test_util.equivalent_frames(res, expect)
+        res_pandas = ops.transform(d.to_pandas())
+        assert data_algebra.test_util.equivalent_frames(res_pandas, expect.to_pandas())
+
+
+def test_polars_table_is_keyed_by_columns_hashed():
+    if have_polars:
+        d = pl.DataFrame(
+            {"a": ["x", "x", "y", None, None], "b": [1, 2, 1, None, 3], "c": [1] * 5}
+        )
+        local_model = data_algebra.data_model.lookup_data_model_for_dataframe(d)
+        assert local_model.table_is_keyed_by_columns(d, column_names=["a", "b"])
+        assert not local_model.table_is_keyed_by_columns(d, column_names=["a", "c"])
+        d2 = pl.concat([d, d[0:1]])
+        assert not local_model.table_is_keyed_by_columns(d2, column_names=["a", "b"])
+        # unlike Pandas, Polars groups missing keys together, so they are duplicates
+        d3 = pl.concat([d, d[3:4]])
+        assert not local_model.table_is_keyed_by_columns(d3, column_names=["a", "b"])
+        d4 = pl.DataFrame({"a": [float("nan"), float("nan"), 1.0]})
+        assert not local_model.table_is_keyed_by_columns(d4, column_names=["a"])
+        d5 = pl.DataFrame({"a": [float("nan"), None, 1.0]})
+        assert local_model.table_is_keyed_by_columns(d5, column_names=["a"])
+
+
+def test_polars_table_is_keyed_by_columns_hash_collisions(monkeypatch):
+    if have_polars:
+        local_model = data_algebra.polars_model.PolarsModel()
+        # every row hashes the same, so the exact check decides
+        monkeypatch.setattr(
+            pl.DataFrame,
+            "hash_rows",
+            lambda self, *args, **kwargs: pl.Series([0] * self.shape[0], dtype=pl.UInt64),
+        )
+        d = pl.DataFrame({"a": ["x", "x", "y"], "b": [1, 2, 1]})
+        assert local_model.table_is_keyed_by_columns(d, column_names=["a", "b"])
+        assert not local_model.table_is_keyed_by_columns(d, column_names=["a"])
+
+
+def test_polars_trusted_keys_skip_record_key_check():
+    if have_polars:
+        control_table = pl.DataFrame({"k": ["x", "y"], "v": ["vx", "vy"]})
+        record_spec = data_algebra.cdata.RecordSpecification(
+            control_table, control_table_keys=["k"], record_keys=["id"]
+        )
+        mp_to_blocks = data_algebra.cdata.RecordMap(blocks_out=record_spec)
+        d = pl.DataFrame({"id": [1, 1], "vx": [1, 2], "vy": [3, 4]})
+        with pytest.raises(ValueError):
+            mp_to_blocks.transform(d)
+        trusting_model = data_algebra.polars_model.PolarsModel(use_trusted_keys=True)
+        res = mp_to_blocks.transform(d, local_data_model=trusting_model)
+        assert res.shape == (4, 3)
+        # on keyed data the checked and trusted paths agree
+        d_keyed = pl.DataFrame({"id": [1, 2], "vx": [1, 2], "vy": [3, 4]})
+        expect = mp_to_blocks.transform(d_keyed)
+        res = mp_to_blocks.transform(d_keyed, local_data_model=trusting_model)
+        assert data_algebra.test_util.equivalent_frames(res, expect)
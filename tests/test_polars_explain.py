@@ -0,0 +1,46 @@
+
+import data_algebra
+from data_algebra.data_ops import descr
+
+have_polars = False
+try:
+    import polars as pl
+    import data_algebra.polars_model
+
+    have_polars = True
+except ModuleNotFoundError:
+    pass
+
+
+def test_polars_explain():
+    if not have_polars:
+        return
+    d = pl.DataFrame({"g": ["a", "b", "a"], "x": [1.0, 2.0, 3.0], "z": [0, 0, 0]})
+    r = pl.DataFrame({"g": ["a", "b"], "w": [1, 2]})
+    ops = (
+        descr(d=d)
+        .extend({"y": "x + 1"})
+        .select_rows("y > 2")
+        .natural_join(b=descr(r=r), on=["g"], jointype="left")
+        .project({"s": "y.sum()"}, group_by=["g"])
+        .order_rows(["g"])
+    )
+    model = data_algebra.polars_model.PolarsModel()
+    report = model.explain(ops, data_map={"d": d, "r": r})
+    optimized, steps = report.split("steps:\n")
+    assert optimized.startswith("optimized plan:\n")
+    # unused column z is not read (projection pushdown)
+    assert "PROJECT 2/3 COLUMNS" in optimized
+    assert 'SORT BY [col("g")]  -- [6]' in optimized
+    assert "AGGREGATE  -- [5]" in optimized
+    assert "LEFT JOIN:  -- [4]" in optimized
+    steps = steps.split("\n[")
+    assert len(steps) == 7
+    assert steps[3].startswith("3] [2].select_rows('y > 2')")
+    assert "FILTER" in steps[3]
+    assert "JOIN" not in steps[3]
+    assert "LEFT JOIN" in steps[4]
+    assert "FILTER" not in steps[4]
+    report = model.explain(ops, data_map={"d": d, "r": r}, profile=True)
+    assert "polars profile (microseconds):" in report
+    assert "sort(g)" in report
@@ -0,0 +1,73 @@
+
+import data_algebra
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+have_polars = False
+try:
+    import polars as pl
+    import data_algebra.polars_model
+
+    have_polars = True
+except ModuleNotFoundError:
+    pass
+
+
+def test_polars_ordered_window_keeps_row_order():
+    if not have_polars:
+        return
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "g": ["a", "b", "a", "b", "a", "a"],
+            "o": [3, 1, 2, 5, 1, 1],
+            "x": [1.0, 2.0, 3.0, 4.0, 5.0, 6.0],
+            "s": ["p", "q", "r", "s", "t", "u"],
+        }
+    )
+    for order_by, reverse in [(["o"], []), (["o"], ["o"]), (["o", "x"], ["o"])]:
+        ops = descr(d=d).extend(
+            {
+                "cs": "x.cumsum()",
+                "sh": "s.shift()",
+                "rn": "_row_number()",
+                "fi": "x.first()",
+            },
+            partition_by=["g"],
+            order_by=order_by,
+            reverse=reverse,
+        )
+        expect = ops.transform(d)
+        for use_lazy_eval in [True, False]:
+            res = data_algebra.polars_model.PolarsModel(
+                use_lazy_eval=use_lazy_eval
+            ).eval(ops, data_map={"d": pl.DataFrame(d)})
+            assert data_algebra.test_util.equivalent_frames(
+                res.to_pandas(), expect, check_row_order=True
+            )
+
+
+def test_polars_extend_stays_lazy():
+    if not have_polars:
+        return
+    d = pl.DataFrame(
+        {
+            "g": ["a", "b", "a", "b", "a"],
+            "o": [3, 1, 2, 5, 1],
+            "x": [1.0, 2.0, 3.0, 4.0, 5.0],
+        }
+    )
+    ops = descr(d=d).extend(
+        {"cs": "x.cumsum()", "u": "_uniform()", "ng": "_ngroup()"},
+        partition_by=["g"],
+        order_by=["o", "x"],
+        reverse=["o"],
+    )
+    model = data_algebra.polars_model.PolarsModel()
+    res = model._extend_step(ops, data_map={"d": d.lazy()}, eval_state=None)
+    assert isinstance(res, pl.LazyFrame)
+    assert "SORT" not in res.explain()
+    res = res.collect()
+    assert list(res["cs"]) == [1.0, 6.0, 4.0, 4.0, 9.0]
+    assert list(res["ng"]) == [0, 1, 0, 1, 0]
+    assert all([(u >= 0) and (u <= 1) for u in res["u"]])
@@ -0,0 +1,89 @@
+
+import data_algebra
+import data_algebra.eval_state
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+have_polars = False
+try:
+    import polars as pl
+    import data_algebra.polars_model
+
+    have_polars = True
+except ModuleNotFoundError:
+    pass
+
+
+def test_polars_shared_node_planned_once():
+    if not have_polars:
+        return
+    d = pl.DataFrame({"g": ["a", "b", "a"], "x": [1.0, 2.0, 3.0]})
+    ops = descr(d=d)
+    for i in range(10):
+        ops = ops.extend({"x": f"x + {i}"})
+        ops = ops.natural_join(
+            b=ops.select_columns(["g", "x"])
+            .rename_columns({"y": "x"})
+            .project({"y": "y.max()"}, group_by=["g"]),
+            on=["g"],
+            jointype="left",
+        ).drop_columns(["y"])
+    model = data_algebra.polars_model.PolarsModel()
+    n_extends = [0]
+    extend_step = model._method_dispatch_table["ExtendNode"]
+
+    def counting_extend_step(**kwargs):
+        n_extends[0] = n_extends[0] + 1
+        return extend_step(**kwargs)
+
+    model._method_dispatch_table["ExtendNode"] = counting_extend_step
+    res = model.eval(ops, data_map={"d": d})
+    assert n_extends[0] == 10
+    assert list(res["x"]) == [46.0, 47.0, 48.0]
+
+
+def test_polars_shared_node_cached():
+    if not have_polars:
+        return
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"g": ["a", "b", "a"], "x": [1.0, 2.0, 3.0]})
+    base = descr(d=d).extend({"x": "x + 1"}).select_rows("x > 2")
+    ops = base.concat_rows(b=base.extend({"x": "x * 2"}))
+    model = data_algebra.polars_model.PolarsModel()
+    plan = model._compose_polars_ops(
+        ops,
+        data_map={"d": pl.DataFrame(d)},
+        eval_state=data_algebra.eval_state.EvalState(ops),
+    )
+    assert "CACHE" in plan.explain()
+    expect = pd.DataFrame(
+        {
+            "g": ["b", "a", "b", "a"],
+            "x": [3.0, 4.0, 6.0, 8.0],
+            "source_name": ["a", "a", "b", "b"],
+        }
+    )
+    data_algebra.test_util.check_transform(ops=ops, data=d, expect=expect)
+
+
+def test_polars_shared_node_cached_when_streaming(tmp_path):
+    if not have_polars:
+        return
+    d = pl.DataFrame({"g": ["a", "b", "a"], "x": [1.0, 2.0, 3.0]})
+    base = descr(d=d).extend({"x": "x + 1"}).select_rows("x > 2")
+    ops = base.concat_rows(b=base.extend({"x": "x * 2"}))
+    model = data_algebra.polars_model.PolarsModel()
+    # without common sub-plan elimination the shared node is only computed once if cached
+    eval_state = data_algebra.eval_state.EvalState(ops)
+    plan = model._compose_polars_ops(ops, data_map={"d": d}, eval_state=eval_state)
+    assert "CACHE" not in plan.explain(comm_subplan_elim=False)
+    eval_state = data_algebra.eval_state.EvalState(ops)
+    eval_state.cache_shared = True
+    plan = model._compose_polars_ops(ops, data_map={"d": d}, eval_state=eval_state)
+    assert "CACHE" in plan.explain(comm_subplan_elim=False)
+    expect = model.eval(ops, data_map={"d": d})
+    res = model.eval(ops, data_map={"d": d}, streaming=True)
+    assert res.frame_equal(expect)
+    streamed = model.sink(ops, data_map={"d": d}, path=tmp_path / "res.parquet")
+    assert not streamed
+    assert pl.read_parquet(tmp_path / "res.parquet").frame_equal(expect)
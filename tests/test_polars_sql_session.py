@@ -0,0 +1,68 @@
+
+import pytest
+
+import data_algebra
+from data_algebra.data_ops import descr
+
+have_polars = False
+try:
+    import polars as pl
+    import data_algebra.polars_model
+
+    have_polars = True
+except ModuleNotFoundError:
+    pass
+
+
+def test_polars_sql_session_reuse(tmp_path):
+    if not have_polars:
+        return
+    d = pl.DataFrame({"g": ["a", "b", "a"], "x": [1, 2, 3]})
+    r = pl.DataFrame({"g": ["a", "b"], "w": [10, 20]})
+    session = data_algebra.polars_model.PolarsSQLSession()
+    assert session.register_many({"d": d, "r": r}) == ["d", "r"]
+    # unchanged tables are not registered again
+    assert session.register_many({"d": d, "r": r}) == []
+    assert session.tables() == ["d", "r"]
+    for i in range(3):
+        ops = descr(d=d).select_rows(f"x > {i}")
+        res = session.execute(ops, data_map={"d": d})
+        assert isinstance(res, pl.DataFrame)
+    assert list(res["x"]) == [3]
+    ops = descr(d=d).project({"s": "x.sum()"}, group_by=["g"])
+    for i in range(2):
+        res = session.execute(ops).sort("g")
+        assert list(res["s"]) == [4, 2]
+    # SQL text generated once per distinct operator DAG
+    assert session.misses == 4
+    assert session.hits == 1
+    # a new frame under the same name is picked up
+    d2 = pl.DataFrame({"g": ["b"], "x": [7]})
+    assert session.register("d", d2)
+    res = session.execute(ops)
+    assert list(res["s"]) == [7]
+    # file sources are scanned lazily
+    r.write_parquet(tmp_path / "r.parquet")
+    assert session.register("r", tmp_path / "r.parquet")
+    assert not session.register("r", tmp_path / "r.parquet")
+    res = session.execute('SELECT SUM("w") AS "w" FROM "r"')
+    assert list(res["w"]) == [30]
+    session.unregister("r")
+    assert session.tables() == ["d"]
+    # the model's SQL evaluation only sees the tables of each call
+    model = data_algebra.polars_model.PolarsModel()
+    res = model.eval_as_sql(ops, data_map={"d": d}).sort("g")
+    assert list(res["s"]) == [4, 2]
+    with pytest.raises(pl.ComputeError):
+        model.eval_as_sql(ops, data_map={})
+    assert model.sql_session.tables() == []
+    assert model.sql_session.misses == 1
+    # tables registered in the session are hidden from, and kept through, isolated queries
+    model.sql_session.register("r", r)
+    with pytest.raises(pl.ComputeError):
+        model.eval_as_sql('SELECT * FROM "r"', data_map={"d": d})
+    res = model.eval_as_sql(ops, data_map={"d": d2})
+    assert list(res["s"]) == [7]
+    assert model.sql_session.tables() == ["r"]
+    res = model.sql_session.execute('SELECT SUM("w") AS "w" FROM "r"')
+    assert list(res["w"]) == [30]
@@ -0,0 +1,89 @@
+
+import os
+
+import data_algebra
+import data_algebra.test_util
+from data_algebra.data_ops import TableDescription
+
+have_polars = False
+try:
+    import polars as pl
+    import data_algebra.polars_model
+
+    have_polars = True
+except ModuleNotFoundError:
+    pass
+
+
+def test_polars_scan_sources_and_streaming(tmp_path):
+    if not have_polars:
+        return
+    os.makedirs(tmp_path / "parts")
+    for i in range(3):
+        pl.DataFrame(
+            {"g": ["a", "b", "a"], "x": [1.0 + i, 2.0, 3.0], "y": [0, 0, 0]}
+        ).write_parquet(tmp_path / "parts" / f"p{i}.parquet")
+    pl.DataFrame({"g": ["a", "b"], "z": [1.0, 2.0]}).write_csv(tmp_path / "z.csv")
+    ops = (
+        TableDescription(table_name="d", column_names=["g", "x", "y"])
+        .select_rows("x > 1")
+        .extend({"x2": "x * 2"})
+        .natural_join(
+            b=TableDescription(table_name="z", column_names=["g", "z"]),
+            on=["g"],
+            jointype="left",
+        )
+        .project({"s": "x2.sum()", "z": "z.max()"}, group_by=["g"])
+        .order_rows(["g"])
+    )
+    expect = pl.DataFrame({"g": ["a", "b"], "s": [28.0, 12.0], "z": [1.0, 2.0]})
+    data_map = {"d": str(tmp_path / "parts"), "z": tmp_path / "z.csv"}
+    for use_lazy_eval in [True, False]:
+        model = data_algebra.polars_model.PolarsModel(use_lazy_eval=use_lazy_eval)
+        res = model.eval(ops, data_map=data_map)
+        assert data_algebra.test_util.equivalent_frames(
+            res.to_pandas(), expect.to_pandas()
+        )
+    model = data_algebra.polars_model.PolarsModel()
+    res = model.eval(ops, data_map=data_map, streaming=True)
+    assert res.frame_equal(expect)
+    # scans are accepted as lazy frames
+    data_map = {
+        "d": pl.scan_parquet(str(tmp_path / "parts" / "*.parquet")),
+        "z": pl.scan_csv(tmp_path / "z.csv"),
+    }
+    res = model.eval(ops, data_map=data_map, streaming=True)
+    assert res.frame_equal(expect)
+
+
+def test_polars_sink(tmp_path):
+    if not have_polars:
+        return
+    d = pl.DataFrame({"g": ["a", "b", "a", "b"], "x": [1.0, 2.0, 3.0, 4.0]})
+    d.write_parquet(tmp_path / "d.parquet")
+    model = data_algebra.polars_model.PolarsModel()
+    ops = (
+        TableDescription(table_name="d", column_names=["g", "x"])
+        .select_rows("x > 1")
+        .extend({"x2": "x * 2"})
+    )
+    streamed = model.sink(
+        ops, data_map={"d": tmp_path / "d.parquet"}, path=tmp_path / "res.parquet"
+    )
+    assert streamed
+    res = pl.read_parquet(tmp_path / "res.parquet")
+    assert res.frame_equal(model.eval(ops, data_map={"d": d}))
+    streamed = model.sink(
+        ops, data_map={"d": tmp_path / "d.parquet"}, path=tmp_path / "res.csv"
+    )
+    assert streamed
+    res = pl.read_csv(tmp_path / "res.csv")
+    assert res.frame_equal(model.eval(ops, data_map={"d": d}))
+    # windowed steps do not stream, the result is still written
+    ops = TableDescription(table_name="d", column_names=["g", "x"]).extend(
+        {"c": "x.cumsum()"}, partition_by=["g"], order_by=["x"]
+    )
+    streamed = model.sink(ops, data_map={"d": d}, path=tmp_path / "res.arrow")
+    assert not streamed
+    res = pl.read_ipc(tmp_path / "res.arrow", memory_map=False)
+    assert list(res["c"]) == [1.0, 2.0, 4.0, 6.0]
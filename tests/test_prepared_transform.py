@@ -0,0 +1,141 @@
+
+import pytest
+
+import data_algebra
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def _example_ops(d):
+    return (
+        descr(d=d)
+        .extend({"x1": "a * b + c", "x2": "(a / b).log()", "flag": "a > 1"})
+        .extend({"score": "x1 * 0.3 + x2 * 0.7"})
+        .select_rows("score > 0")
+        .extend({"z": "score.where(flag, 0.0)", "t": "s.coalesce('none')"})
+        .select_columns(["a", "score", "z", "t"])
+    )
+
+
+def test_prepared_transform():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "a": [1.5, 0.5, 2.0],
+            "b": [2.0, 1.0, 4.0],
+            "c": [3, -4, 5],
+            "s": ["x", None, "y"],
+        }
+    )
+    ops = _example_ops(d)
+    prepared = ops.prepare()
+    for i in range(2):
+        res = prepared.transform(d)
+        assert data_algebra.test_util.equivalent_frames(res, ops.transform(d))
+    records = d.to_dict("records")
+    res = prepared.transform_records(records)
+    assert data_algebra.test_util.equivalent_frames(res, ops.transform(d))
+    res = prepared.transform_records([])
+    assert list(res.columns) == ["a", "score", "z", "t"]
+    assert res.shape[0] == 0
+    for i in range(d.shape[0]):
+        res = prepared.transform_record(records[i])
+        expect = ops.transform(d.iloc[[i], :])
+        assert data_algebra.test_util.equivalent_frames(res, expect)
+    # inputs are checked
+    with pytest.raises(ValueError):
+        prepared.transform_record({"a": 1.0, "b": 2.0, "c": 3})
+    strict_prepared = ops.prepare(strict=True)
+    with pytest.raises(ValueError):
+        strict_prepared.transform_record({"a": 1.0, "b": 2.0, "c": 3, "s": "x", "q": 1})
+    with pytest.raises(ValueError):
+        descr(d=d).natural_join(b=descr(e=d), on=["a"], jointype="inner").prepare()
+
+
+def test_prepared_transform_skips_eval():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "a": [1.5, 0.5, 2.0],
+            "b": [2.0, 1.0, 4.0],
+            "c": [3, -4, 5],
+            "s": ["x", None, "y"],
+        }
+    )
+    ops = _example_ops(d)
+    expect = ops.transform(d)
+    model = data_algebra.pandas_model.PandasModel()
+    prepared = ops.prepare(data_model=model)
+
+    def failing_eval(*args, **kwargs):
+        raise AssertionError("eval() called")
+
+    # row-local pipelines run as one compiled function, not through eval()
+    model.eval = failing_eval
+    assert data_algebra.test_util.equivalent_frames(prepared.transform(d), expect)
+    res = prepared.transform_records(d.to_dict("records"))
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+
+
+def test_prepared_transform_matches_transform():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "k": [1, 2, 3, 4],
+            "x": [1.0, None, 3.0, -4.0],
+            "b": [True, False, True, True],
+            "s": ["a", "b", None, "d"],
+            "n": pd.array([1, None, 3, 4], dtype="Int64"),
+        },
+        index=[10, 11, 12, 13],
+    )
+    ops_list = [
+        # the dropped row (k == 2) has no mapped value, so would make w a float column
+        descr(d=d).select_rows("k != 2").extend({"w": "k.mapv({1: 10, 3: 30, 4: 40})"}),
+        descr(d=d)
+        .extend({"y": "x.is_null()", "c": "1", "t": "s.coalesce('z')"})
+        .rename_columns({"kk": "k"})
+        .drop_columns(["b"]),
+        descr(d=d).extend({"m": "n + 1", "q": "x * k + x * k"}).select_rows("b"),
+        descr(d=d).select_rows("k > 10").extend({"y": "x + 1"}),
+        # not row-local, so evaluated by eval()
+        descr(d=d).extend({"r": "x.cumsum()"}, order_by=["k"]),
+    ]
+    for ops in ops_list:
+        prepared = ops.prepare()
+        expect = ops.transform(d)
+        res = prepared.transform(d)
+        assert data_algebra.test_util.equivalent_frames(res, expect)
+        assert list(res.dtypes) == list(expect.dtypes)
+        records = d.to_dict("records")
+        res = prepared.transform_records(records)
+        expect = ops.transform(pd.DataFrame(records))
+        assert data_algebra.test_util.equivalent_frames(res, expect)
+        assert list(res.dtypes) == list(expect.dtypes)
+        for record in records:
+            res = prepared.transform_record(record)
+            expect = ops.transform(pd.DataFrame([record]))
+            assert data_algebra.test_util.equivalent_frames(res, expect)
+            assert list(res.dtypes) == list(expect.dtypes)
+
+
+def test_prepared_transform_windowed_extend():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"g": ["a", "b", "a", "b", "a"], "x": [3.0, 1.0, 2.0, 5.0, 4.0]})
+    ops = (
+        descr(d=d)
+        .extend({"y": "x * 2"})
+        .extend(
+            {"n": "_size()", "r": "_row_number()", "c": "x.cumsum()"},
+            partition_by=["g"],
+            order_by=["x"],
+        )
+        .extend({"k": "_ngroup()"}, partition_by=["g"])
+        .order_rows(["g", "x"])
+    )
+    expect = ops.transform(d)
+    prepared = ops.prepare()
+    res = prepared.transform(d)
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    assert list(res["r"]) == [1, 2, 3, 1, 2]
@@ -67,3 +67,33 @@ def test_project_catch_nonagg():
 
     with pytest.raises(ValueError):
         ops = describe_table(d, "d").project({"y": "y"}, group_by=["c", "g"])
+
+
+def test_project_single_agg_many_aggregates():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {"g": ["a", "b", "a", "b", "c"], "y": [1, 2, 3, 4, 5], "z": [0.5, 1.0, 1.5, 2.0, 2.5]}
+    )
+    ops = describe_table(d, "d").project(
+        {
+            "func": "y.sum()",
+            "y_max": "y.max()",
+            "z_mean": "z.mean()",
+            "z_min": "z.min()",
+            "n": "_size()",
+            "ones": "(1).sum()",
+        },
+        group_by=["g"],
+    )
+    expect = pd.DataFrame(
+        {
+            "g": ["a", "b", "c"],
+            "func": [4, 6, 5],
+            "y_max": [3, 4, 5],
+            "z_mean": [1.0, 1.5, 2.5],
+            "z_min": [0.5, 1.0, 2.5],
+            "n": [2, 2, 1],
+            "ones": [2, 2, 1],
+        }
+    )
+    data_algebra.test_util.check_transform(ops=ops, data=d, expect=expect)
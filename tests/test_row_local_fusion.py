@@ -0,0 +1,127 @@
+
+import pytest
+
+import data_algebra
+import data_algebra.eval_state
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def test_row_local_fusion():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "x": [1.0, -2.0, 3.0, 4.0, -5.0],
+            "y": [10, 20, 30, 40, 50],
+            "unused": ["a", "b", "c", "d", "e"],
+        }
+    )
+    ops = (
+        descr(d=d)
+        .extend({"z": "x * y", "w": "y - 1"})
+        .select_rows("z > -50")
+        .rename_columns({"xx": "x"})
+        .drop_columns(["unused"])
+        .extend({"r": "z / w"})
+        .select_rows("y < 50")
+        .select_columns(["xx", "z", "r"])
+    )
+    model = data_algebra.pandas_model.PandasModel()
+    step_calls = []
+    for node_name in ["ExtendNode", "SelectRowsNode", "SelectColumnsNode"]:
+        orig_step = model._method_dispatch_table[node_name]
+
+        def counting_step(op, *, orig_step=orig_step, **kwargs):
+            step_calls.append(op.node_name)
+            return orig_step(op, **kwargs)
+
+        model._method_dispatch_table[node_name] = counting_step
+    res = ops.transform(d, data_model=model)
+    assert len(step_calls) == 0
+    expect = pd.DataFrame(
+        {
+            "xx": [1.0, -2.0, 3.0, 4.0],
+            "z": [10.0, -40.0, 90.0, 160.0],
+            "r": [10.0 / 9.0, -40.0 / 19.0, 90.0 / 29.0, 160.0 / 39.0],
+        }
+    )
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    data_algebra.test_util.check_transform(ops=ops, data=d, expect=expect)
+
+
+def test_row_local_fusion_falls_back_to_steps():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {"k": pd.array([True, False, True], dtype="boolean"), "v": [1, 2, 3]}
+    )
+    # a selection that is not a plain boolean column can not be fused
+    ops = descr(d=d).extend({"w": "v + 1"}).select_rows("k")
+    model = data_algebra.pandas_model.PandasModel()
+    eval_state = data_algebra.eval_state.EvalState(ops)
+    res = model.eval(ops, data_map={"d": d}, eval_state=eval_state)
+    assert id(ops) in eval_state.not_fused
+    assert list(res["v"]) == [1, 3]
+    assert list(res["w"]) == [2, 4]
+
+
+def test_row_local_fusion_selects_before_later_steps():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"k": [1, 2, 3], "v": [1, "not a number", 3]})
+    # v + 1 can only be evaluated on the rows the selection keeps
+    ops = descr(d=d).select_rows("k != 2").extend({"w": "v + 1"})
+    model = data_algebra.pandas_model.PandasModel()
+    eval_state = data_algebra.eval_state.EvalState(ops)
+    res = model.eval(ops, data_map={"d": d}, eval_state=eval_state)
+    assert id(ops) not in eval_state.not_fused
+    assert list(res["k"]) == [1, 3]
+    assert list(res["w"]) == [2, 4]
+    # the dropped row (k == 2) has no mapped value, so would make w a float column
+    d = pd.DataFrame({"k": [1, 2, 3]})
+    ops = (
+        descr(d=d)
+        .select_rows("k != 2")
+        .extend({"w": "k.mapv({1: 10, 3: 30})"})
+        .select_columns(["k", "w"])
+    )
+    eval_state = data_algebra.eval_state.EvalState(ops)
+    res = model.eval(ops, data_map={"d": d}, eval_state=eval_state)
+    assert len(eval_state.not_fused) == 0
+    expect = pd.DataFrame({"k": [1, 3], "w": [10, 30]})
+    assert res["w"].dtype == expect["w"].dtype
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+
+
+def test_row_local_fusion_raises_other_errors():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"k": [1, 2, 3]})
+    ops = descr(d=d).select_rows("k != 2").extend({"w": "k.sqrt()"})
+    model = data_algebra.pandas_model.PandasModel()
+    calls = []
+
+    def failing_fn(x):
+        calls.append(x)
+        raise RuntimeError("failing user function")
+
+    model.user_fun_map["sqrt"] = failing_fn
+    with pytest.raises(RuntimeError):
+        model.eval(ops, data_map={"d": d})
+    # reported from the fused evaluation, not re-run step by step
+    assert len(calls) == 1
+
+
+def test_row_local_fusion_skips_whole_column_functions():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"keep": [True, False, True], "a": [1, 2, 3], "b": [1, 3, 3]})
+    ops = descr(d=d).select_rows("keep").extend({"c": "a.co_equalizer(b)"})
+    expect = pd.DataFrame({"keep": [True, True], "a": [1, 3], "b": [1, 3], "c": [1, 3]})
+    assert not data_algebra.eval_state.is_row_local_step(ops)
+    assert data_algebra.eval_state.is_row_local_step(ops.sources[0])
+    assert data_algebra.test_util.equivalent_frames(ops.transform(d), expect)
+    assert data_algebra.test_util.equivalent_frames(ops.eval({"d": d}), expect)
+    # user functions are not assumed to be row-local
+    ops = descr(d=d).select_rows("keep").extend({"z": "a.sqrt()"})
+    model = data_algebra.pandas_model.PandasModel()
+    model.user_fun_map["sqrt"] = lambda x: x - x.min()
+    res = model.eval(ops, data_map={"d": d})
+    assert list(res["z"]) == [0, 2]
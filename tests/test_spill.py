@@ -0,0 +1,92 @@
+
+import os
+
+import numpy
+
+import data_algebra
+import data_algebra.eval_state
+import data_algebra.pandas_model
+import data_algebra.spill
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def test_spill_intermediates(tmp_path):
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "g": ["a", "b", "a", "c", "b"],
+            "x": [1.0, 2.0, 3.0, 4.0, 5.0],
+            "o": pd.Series([1, "z", 3, 4, 5], dtype=object),
+        }
+    )
+    base = descr(d=d).extend({"y": "x * 2"})
+    totals = base.project({"t": "y.sum()"}, group_by=["g"])
+    ops = (
+        base.natural_join(b=totals, on=["g"], jointype="left")
+        .concat_rows(b=base.extend({"t": 0.0}))
+        .extend({"share": "y / t"})
+    )
+    expect = ops.eval({"d": d})
+    model = data_algebra.pandas_model.PandasModel(
+        spill_budget_bytes=1, spill_directory=str(tmp_path)
+    )
+    eval_state = data_algebra.eval_state.EvalState(ops)
+    res = model.eval(ops, data_map={"d": d}, eval_state=eval_state)
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    assert isinstance(eval_state.results, data_algebra.spill.SpillingResults)
+    assert eval_state.results.n_spilled > 0
+    # spill files are removed
+    assert len(os.listdir(tmp_path)) == 0
+    # a large budget never spills
+    model = data_algebra.pandas_model.PandasModel(spill_budget_bytes=2**30)
+    eval_state = data_algebra.eval_state.EvalState(ops)
+    res = model.eval(ops, data_map={"d": d}, eval_state=eval_state)
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    assert eval_state.results.n_spilled == 0
+
+
+def test_spill_frame_round_trip(tmp_path):
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"s": ["x", None], "v": [1.5, 2.0], "o": [1, None]})
+    path = data_algebra.spill.write_frame(d, str(tmp_path / "f"))
+    assert data_algebra.test_util.equivalent_frames(
+        data_algebra.spill.read_frame(path), d
+    )
+    d_obj = pd.DataFrame({"o": pd.Series([1, 2], dtype=object)})
+    path = data_algebra.spill.write_frame(d_obj, str(tmp_path / "g"))
+    assert data_algebra.spill.read_frame(path)["o"].dtype == object
+
+
+def test_spill_furthest_next_use_first(tmp_path):
+    pd = data_algebra.data_model.default_data_model().pd
+    next_use = {"soon": 3, "later": 9, "latest": 20, "put_back": -1}
+    results = data_algebra.spill.SpillingResults(
+        max_bytes=25,
+        frame_bytes=lambda v: v.shape[0],
+        directory=str(tmp_path),
+        next_use=lambda k: next_use.get(k, 0),
+    )
+    results["soon"] = pd.DataFrame({"x": range(10)})
+    results["latest"] = pd.DataFrame({"x": range(10)})
+    results["later"] = pd.DataFrame({"x": range(10)})
+    assert results.n_spilled == 1
+    assert "latest" in results._spilled.keys()
+    # with no room at all, results about to be taken still stay in memory
+    results["put_back"] = pd.DataFrame({"x": range(10)})
+    results.max_bytes = 1
+    results["now"] = pd.DataFrame({"x": range(10)})
+    assert set(results._in_memory.keys()) == {"now", "put_back"}
+    assert results.n_spilled == 3
+    assert list(results["latest"]["x"]) == list(range(10))
+    results.close()
+
+
+def test_spill_keeps_missing_values_in_object_columns(tmp_path):
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"s": pd.Series(["x", numpy.nan, None], dtype=object)})
+    path = data_algebra.spill.write_frame(d, str(tmp_path / "f"))
+    back = data_algebra.spill.read_frame(path)
+    assert back["s"][0] == "x"
+    assert isinstance(back["s"][1], float) and numpy.isnan(back["s"][1])
+    assert back["s"][2] is None
@@ -1,4 +1,10 @@
+import pytest
+
 import data_algebra
+import data_algebra.cdata
+import data_algebra.pandas_model
+import data_algebra.test_util
+import data_algebra.util
 
 
 def test_table_is_keyed_by_columns():
@@ -11,3 +17,75 @@ def test_table_is_keyed_by_columns():
     assert local_model.table_is_keyed_by_columns(d, column_names=["a", "b"])
 
     assert not local_model.table_is_keyed_by_columns(d, column_names=["a"])
+
+
+def test_table_is_keyed_by_columns_hashed():
+    local_model = data_algebra.data_model.default_data_model()
+    pd = local_model.pd
+    d = pd.DataFrame(
+        {
+            "a": ["x", "x", "y", None, None],
+            "b": [1.0, 2.0, 1.0, float("nan"), 3.0],
+            "c": [1, 1, 1, 1, 1],
+        }
+    )
+    assert local_model.table_is_keyed_by_columns(d, column_names=["a", "b"])
+    assert local_model.table_is_keyed_by_columns(d.iloc[[0, 2, 3], :], column_names="a")
+    assert not local_model.table_is_keyed_by_columns(d, column_names=["a", "c"])
+    d2 = pd.concat([d, d.iloc[[0], :]], ignore_index=True)
+    assert not local_model.table_is_keyed_by_columns(d2, column_names=["a", "b"])
+    # as with groupby(), rows with missing (None or NaN) keys are not counted
+    d3 = pd.concat([d, d.iloc[[3, 4], :]], ignore_index=True)
+    assert local_model.table_is_keyed_by_columns(d3, column_names=["a", "b"])
+    assert local_model.table_is_keyed_by_columns(d3, column_names=["b"]) == (
+        d3.groupby(["b"]).size().max() <= 1
+    )
+    d4 = pd.DataFrame({"a": [float("nan"), float("nan"), 1.0]})
+    assert local_model.table_is_keyed_by_columns(d4, column_names=["a"])
+
+
+def test_table_is_keyed_by_columns_hash_collisions(monkeypatch):
+    local_model = data_algebra.data_model.default_data_model()
+    pd = local_model.pd
+    # every row hashes the same, so the exact check decides
+    monkeypatch.setattr(
+        pd.util,
+        "hash_pandas_object",
+        lambda obj, index=False: pd.Series([0] * obj.shape[0], dtype="uint64"),
+    )
+    d = pd.DataFrame({"a": ["x", "x", "y"], "b": [1, 2, 1]})
+    assert local_model.table_is_keyed_by_columns(d, column_names=["a", "b"])
+    assert not local_model.table_is_keyed_by_columns(d, column_names=["a"])
+
+
+def test_trusted_keys_skip_record_key_check():
+    pd = data_algebra.data_model.default_data_model().pd
+    control_table = pd.DataFrame({"k": ["x", "y"], "v": ["vx", "vy"]})
+    record_spec = data_algebra.cdata.RecordSpecification(
+        control_table, control_table_keys=["k"], record_keys=["id"]
+    )
+    mp_to_blocks = data_algebra.cdata.RecordMap(blocks_out=record_spec)
+    d = pd.DataFrame({"id": [1, 1], "vx": [1, 2], "vy": [3, 4]})
+    with pytest.raises(ValueError):
+        mp_to_blocks.transform(d)
+    trusting_model = data_algebra.pandas_model.PandasModel(use_trusted_keys=True)
+    res = mp_to_blocks.transform(d, local_data_model=trusting_model)
+    assert res.shape == (4, 3)
+    # on keyed data the checked and trusted paths agree
+    d_keyed = pd.DataFrame({"id": [1, 2], "vx": [1, 2], "vy": [3, 4]})
+    expect = mp_to_blocks.transform(d_keyed)
+    res = mp_to_blocks.transform(d_keyed, local_data_model=trusting_model)
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+
+
+def test_first_repeated_hash_stops_early():
+    hashed = []
+
+    def hash_rows(start, end):
+        hashed.append((start, end))
+        return [i % 5 for i in range(start, end)]
+
+    assert data_algebra.util.first_repeated_hash(20, hash_rows, chunk_size=3) == 6
+    assert hashed == [(0, 3), (3, 6)]
+    assert data_algebra.util.first_repeated_hash(5, hash_rows, chunk_size=3) is None
+    assert data_algebra.util.first_repeated_hash(0, hash_rows) is None
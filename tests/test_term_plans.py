@@ -0,0 +1,85 @@
+
+import gc
+
+import numpy
+
+import data_algebra
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def test_term_plans_match_walker():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "a": [1.5, -2.0, numpy.nan, 4.0],
+            "b": [1, 0, 3, -4],
+            "f": [True, False, True, False],
+            "s": ["x", "y", None, "x"],
+            "n": pd.array([1, None, 3, 4], dtype="Int64"),
+        }
+    )
+    ops = descr(d=d).extend(
+        {
+            "score": "(a - b) / (b + 1)",
+            "flag": "((a > 0.5) or f) and (b != 3)",
+            "m": "(a * b + 1).exp() - a.abs().sqrt() + b.sign()",
+            "w": "f.where(b, 7)",
+            "ie": "f.if_else(a, 0.0)",
+            "c": "s.coalesce('z')",
+            "e": "s == 'x'",
+            "nn": "n + 1",
+            "k": "3 + 4",
+        }
+    )
+    model = data_algebra.pandas_model.PandasModel()
+    for k, opk in ops.ops.items():
+        res = model._act_on_term(opk, d)
+        expect = opk.act_on(d, expr_walker=model)
+        if isinstance(expect, int):
+            assert res == expect
+        else:
+            res = pd.Series(res)
+            expect = pd.Series(expect)
+            assert res.dtype == expect.dtype
+            assert res.equals(expect)
+    # plans are reused, and only numeric columns are evaluated as numpy arrays
+    assert model._term_plan(ops.ops["score"]) is model._term_plan(ops.ops["score"])
+    assert model._term_plan(ops.ops["m"]).array_fn is not None
+    assert model._term_plan(ops.ops["ie"]).array_fn is None
+    res = ops.transform(d, data_model=model)
+    expect = ops.transform(d)
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+
+
+def test_term_plans_follow_user_functions_and_collection():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"a": [1.0, 4.0]})
+    ops = descr(d=d).extend({"z": "a.sqrt()"})
+    model = data_algebra.pandas_model.PandasModel()
+    assert list(ops.transform(d, data_model=model)["z"]) == [1.0, 2.0]
+    model.user_fun_map["sqrt"] = lambda x: x + 100.0
+    assert list(ops.transform(d, data_model=model)["z"]) == [101.0, 104.0]
+    n_plans = len(model._term_plans)
+    assert n_plans > 0
+    del ops
+    gc.collect()
+    assert len(model._term_plans) < n_plans
+
+
+def test_term_plans_integer_division_by_zero():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"x": [3, 4, 5], "y": [0, 2, 0]})
+    ops = descr(d=d).extend({"fd": "x // y", "md": "x % y", "nd": "x %/% y"})
+    expect = pd.DataFrame(
+        {
+            "x": [3, 4, 5],
+            "y": [0, 2, 0],
+            "fd": [numpy.inf, 2.0, numpy.inf],
+            "md": [numpy.nan, 0.0, numpy.nan],
+            "nd": [numpy.inf, 2.0, numpy.inf],
+        }
+    )
+    assert data_algebra.test_util.equivalent_frames(ops.transform(d), expect)
+    assert data_algebra.test_util.equivalent_frames(ops.eval({"d": d}), expect)
@@ -0,0 +1,76 @@
+
+import numpy
+
+import data_algebra
+import data_algebra.pandas_model
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def test_top_k_matches_full_sort():
+    pd = data_algebra.data_model.default_data_model().pd
+    rng = numpy.random.default_rng(2023)
+    n = 500
+    x = rng.integers(0, 20, size=n).astype(float)
+    x[rng.integers(0, n, size=30)] = numpy.nan
+    d = pd.DataFrame(
+        {
+            "x": x,
+            "y": rng.integers(0, 3, size=n),
+            "n": pd.array(rng.integers(0, 5, size=n), dtype="Int64"),
+            "t": pd.to_datetime("2020-01-01")
+            + pd.to_timedelta(rng.integers(0, 50, size=n), unit="D"),
+            "s": [str(v) for v in rng.integers(0, 10, size=n)],
+            "id": range(n),
+        }
+    )
+    model = data_algebra.pandas_model.PandasModel()
+    for columns, reverse in [
+        (["x"], []),
+        (["x"], ["x"]),
+        (["x", "y"], ["x"]),
+        (["y", "x"], ["x"]),
+        (["n", "id"], []),
+        (["t"], ["t"]),
+        (["s", "id"], ["s"]),
+    ]:
+        for limit in [1, 7, 20, 490]:
+            ops = descr(d=d).order_rows(columns, reverse=reverse, limit=limit)
+            res = model.eval(ops, data_map={"d": d})
+            ascending = [c not in reverse for c in columns]
+            expect = (
+                d.sort_values(columns, ascending=ascending, kind="stable")
+                .head(limit)
+                .reset_index(drop=True)
+            )
+            assert res.shape[0] == limit
+            assert data_algebra.test_util.equivalent_frames(
+                res, expect, check_row_order=True
+            )
+    # few non-null values, so nulls reach the top k
+    d_sparse = pd.DataFrame({"x": [numpy.nan] * 40 + [1.0, 2.0], "id": range(42)})
+    ops = descr(d=d_sparse).order_rows(["x"], limit=4)
+    res = model.eval(ops, data_map={"d": d_sparse})
+    assert list(res["id"]) == [40, 41, 0, 1]
+
+
+def test_top_k_polars_eager():
+    have_polars = False
+    try:
+        import polars as pl
+        import data_algebra.polars_model
+
+        have_polars = True
+    except ModuleNotFoundError:
+        pass
+    if not have_polars:
+        return
+    d = pl.DataFrame({"x": [(i * 7) % 13 for i in range(100)], "id": range(100)})
+    ops = descr(d=d).order_rows(["x", "id"], reverse=["x"], limit=5)
+    lazy_res = data_algebra.polars_model.PolarsModel().eval(ops, data_map={"d": d})
+    eager_res = data_algebra.polars_model.PolarsModel(use_lazy_eval=False).eval(
+        ops, data_map={"d": d}
+    )
+    assert lazy_res.frame_equal(eager_res)
+    assert list(eager_res["x"]) == [12] * 5
+    assert list(eager_res["id"]) == [11, 24, 37, 50, 63]
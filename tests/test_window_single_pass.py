@@ -0,0 +1,70 @@
+
+import numpy
+
+import data_algebra
+import data_algebra.test_util
+from data_algebra.data_ops import descr
+
+
+def test_window_single_pass_unsorted_input():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame(
+        {
+            "g": ["b", "a", "b", "a", "b", "c"],
+            "o": [3, 2, 1, 1, 2, 1],
+            "x": [30, 20, 10, 10, 20, 5],
+            "y": [0.5, 2.0, 1.5, 1.0, 0.25, 4.0],
+        }
+    )
+    ops = descr(d=d).extend(
+        {
+            "rn": "_row_number()",
+            "cs": "x.cumsum()",
+            "cmax": "y.cummax()",
+            "prev_x": "x.shift()",
+            "next_y": "y.shift(-1)",
+        },
+        partition_by=["g"],
+        order_by=["o"],
+        reverse=["o"],
+    )
+    res = ops.transform(d)
+    expect = pd.DataFrame(
+        {
+            "g": ["b", "a", "b", "a", "b", "c"],
+            "o": [3, 2, 1, 1, 2, 1],
+            "x": [30, 20, 10, 10, 20, 5],
+            "y": [0.5, 2.0, 1.5, 1.0, 0.25, 4.0],
+            "rn": [1, 1, 3, 2, 2, 1],
+            "cs": [30, 20, 60, 30, 50, 5],
+            "cmax": [0.5, 2.0, 1.5, 2.0, 0.5, 4.0],
+            "prev_x": [numpy.nan, numpy.nan, 20.0, 20.0, 30.0, numpy.nan],
+            "next_y": [0.25, 1.0, numpy.nan, numpy.nan, 1.5, numpy.nan],
+        }
+    )
+    assert data_algebra.test_util.equivalent_frames(res, expect)
+    data_algebra.test_util.check_transform(ops=ops, data=d, expect=expect)
+    # group numbers follow sorted partition keys, whatever the row order
+    res_ngroup = (
+        descr(d=d)
+        .extend({"ng": "_ngroup()"}, partition_by=["g"], order_by=["o"])
+        .transform(d)
+    )
+    assert list(res_ngroup["ng"]) == [1, 0, 1, 0, 1, 2]
+
+
+def test_window_single_pass_missing_partition_key():
+    pd = data_algebra.data_model.default_data_model().pd
+    d = pd.DataFrame({"g": ["a", None, "a", "b"], "o": [1, 2, 3, 4], "x": [1, 2, 3, 4]})
+    ops = descr(d=d).extend({"cs": "x.cumsum()"}, partition_by=["g"], order_by=["o"])
+    res = ops.transform(d)
+    # Pandas groupby does not form a group for the missing key
+    expect = pd.DataFrame(
+        {
+            "g": ["a", None, "a", "b"],
+            "o": [1, 2, 3, 4],
+            "x": [1, 2, 3, 4],
+            "cs": [1.0, numpy.nan, 4.0, 4.0],
+        }
+    )
+    assert data_algebra.test_util.equivalent_frames(res, expect)